@@ -0,0 +1,8 @@
+"""Шахматный движок без зависимостей от pygame"""
+
+from engine.bitboard import (
+    WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING,
+    COLOR_NAMES, COLOR_CODES, PIECE_NAMES, PIECE_CODES, START_BOARD,
+    Position, encode_move, move_from, move_to, move_name, move_promotion, square_name,
+)
+from engine.game import Game
@@ -0,0 +1,214 @@
+"""Пакетный анализ позиций из файлов FEN/EPD любого размера.
+
+    python -m engine.analyse позиции.epd [-o results.jsonl] [--nodes N]
+        [--movetime S] [--depth N] [--workers N] [--hash МБ]
+
+Входной файл (или - для stdin) читается построчно и не загружается целиком:
+в работе одновременно не больше нескольких позиций на процесс пула, а
+следующая строка читается, только когда готов результат одной из них. Позиции
+анализируются в процессах пула с бюджетом на позицию (по умолчанию
+--movetime 1 с), а результаты пишутся строками JSON по мере готовности -
+поэтому порядок строк на выходе может отличаться от входа, номер строки
+входа есть в каждом результате.
+
+Строка - FEN (счетчики ходов не обязательны) или EPD: первые четыре поля -
+позиция, дальше операции через ';'. Из операций берутся id и bm/am (лучший
+и избегаемый ход в SAN): по ним результат отмечается решенным или нет, а в
+конце печатается, сколько задач решено. Пустые строки и строки с #
+пропускаются, неверные попадают в результаты с полем error.
+"""
+
+import argparse
+import json
+import multiprocessing
+import queue
+import signal
+import sys
+import time
+
+from engine.bitboard import Position, move_name
+from engine.search import MAX_PLY, Searcher
+from engine.uci import format_score
+
+# Позиций в работе на один процесс пула: больше - лишняя память, меньше - простои
+IN_FLIGHT_PER_WORKER = 4
+PROGRESS_EVERY = 100
+
+
+def parse_epd(line):
+    """Строка FEN/EPD -> (FEN, операции). Операции - словарь имя -> строка"""
+    fields = line.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError(f"Неверный FEN: {line}")
+    fen = ' '.join(fields[:4])
+    operations = {}
+    rest = fields[4] if len(fields) > 4 else ''
+    if rest[:1].isdigit():
+        # Обычный FEN со счетчиками ходов, а не операции EPD
+        rest = ''
+    for operation in rest.split(';'):
+        name, _, value = operation.strip().partition(' ')
+        if name:
+            operations[name] = value.strip().strip('"')
+    return fen, operations
+
+
+def _san_moves(position, text):
+    moves = set()
+    for san in text.split():
+        move = position.parse_san(san) or position.parse_move(san)
+        if move is not None:
+            moves.add(move)
+    return moves
+
+
+# Поиск процесса пула живет между позициями
+_searcher = None
+_limits = None
+
+
+def _init_worker(hash_mb, limits):
+    global _searcher, _limits
+    # Ctrl+C обрабатывает главный процесс, он и останавливает пул
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _searcher = Searcher(hash_mb)
+    _limits = limits
+
+
+def analyse_line(task):
+    """Анализ одной строки в процессе пула: словарь результата"""
+    number, line = task
+    result = {'line': number}
+    try:
+        fen, operations = parse_epd(line)
+        position = Position.from_fen(fen)
+        # Те же проверки, что при загрузке позиции в партию
+        position.validate()
+    except (ValueError, IndexError) as e:
+        result['error'] = f"Неверная позиция: {e}"
+        return result
+    result['fen'] = fen
+    if 'id' in operations:
+        result['id'] = operations['id']
+    if not position.legal_moves():
+        result['error'] = "Нет легальных ходов"
+        return result
+    # Позиции независимы: старые записи таблицы только мешают
+    _searcher.tt.clear()
+    _searcher.ordering.clear()
+    found = _searcher.search(position, **_limits)
+    move = found['move']
+    if move is None:
+        move = position.legal_moves()[0]
+    result.update({
+        'move': move_name(move), 'score': format_score(found['score']),
+        'depth': found['depth'], 'nodes': found['nodes'], 'time': round(found['time'], 3),
+        'pv': ' '.join(move_name(m) for m in found['pv']),
+    })
+    if 'bm' in operations or 'am' in operations:
+        solved = True
+        if 'bm' in operations:
+            solved = move in _san_moves(position, operations['bm'])
+        if 'am' in operations:
+            solved = solved and move not in _san_moves(position, operations['am'])
+        result['solved'] = solved
+    return result
+
+
+def _read_lines(stream):
+    """Непустые строки с номерами"""
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield number, line
+
+
+def run(stream, out, limits, workers=None, hash_mb=16):
+    """Анализирует строки stream и пишет результаты в out. Возвращает
+    число проанализированных позиций"""
+    workers = workers or multiprocessing.cpu_count()
+    window = workers * IN_FLIGHT_PER_WORKER
+    # Результаты приходят из потока пула; ждет их главный поток, поэтому
+    # Ctrl+C прерывает ожидание, а задания никогда не блокируют пул
+    results = queue.Queue()
+    in_flight = 0
+    stats = {'done': 0, 'errors': 0, 'solved': 0, 'tasks': 0, 'nodes': 0, 'time': 0.0}
+    start = time.perf_counter()
+    pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(hash_mb, limits))
+    try:
+        for number, line in _read_lines(stream):
+            while in_flight >= window:
+                _record(results.get(), out, stats, start)
+                in_flight -= 1
+            pool.apply_async(analyse_line, ((number, line),), callback=results.put,
+                             error_callback=lambda e, number=number: results.put(
+                                 {'line': number, 'error': f"Ошибка анализа: {e!r}"}))
+            in_flight += 1
+        while in_flight:
+            _record(results.get(), out, stats, start)
+            in_flight -= 1
+    except KeyboardInterrupt:
+        print("Анализ прерван", file=sys.stderr)
+    finally:
+        pool.terminate()
+        pool.join()
+
+    elapsed = time.perf_counter() - start
+    print(f"Позиций: {stats['done']}, ошибок: {stats['errors']}, {elapsed:.1f} с", file=sys.stderr)
+    if stats['tasks']:
+        print(f"Решено задач: {stats['solved']} из {stats['tasks']} ({stats['solved'] / stats['tasks']:.0%})",
+              file=sys.stderr)
+    if stats['time'] > 0:
+        print(f"Скорость поиска: {int(stats['nodes'] / stats['time'])} узлов/с на процесс", file=sys.stderr)
+    return stats['done']
+
+
+def _record(result, out, stats, start):
+    """Пишет результат и обновляет счетчики"""
+    out.write(json.dumps(result, ensure_ascii=False) + '\n')
+    out.flush()
+    stats['done'] += 1
+    if 'error' in result:
+        stats['errors'] += 1
+        return
+    stats['nodes'] += result['nodes']
+    stats['time'] += result['time']
+    if 'solved' in result:
+        stats['tasks'] += 1
+        stats['solved'] += result['solved']
+    if stats['done'] % PROGRESS_EVERY == 0:
+        print(f"Позиций: {stats['done']}, {stats['done'] / (time.perf_counter() - start):.1f} в секунду",
+              file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Анализ позиций из файла FEN/EPD")
+    parser.add_argument("input", help="файл FEN/EPD, - для stdin")
+    parser.add_argument("-o", "--output", help="файл результатов (JSON по строке), по умолчанию stdout")
+    parser.add_argument("--nodes", type=int, help="узлов на позицию")
+    parser.add_argument("--movetime", type=float, help="секунд на позицию (по умолчанию 1, если не задан другой бюджет)")
+    parser.add_argument("--depth", type=int, help="глубина на позицию")
+    parser.add_argument("--workers", type=int, default=None, help="процессов пула, по умолчанию - по числу ядер")
+    parser.add_argument("--hash", type=int, default=16, help="таблица транспозиций процесса, МБ")
+    args = parser.parse_args(argv)
+
+    limits = {'depth': min(args.depth or MAX_PLY, MAX_PLY)}
+    if args.nodes:
+        limits['nodes'] = args.nodes
+    if args.movetime or not (args.nodes or args.depth):
+        limits['movetime'] = args.movetime or 1.0
+
+    stream = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        run(stream, out, limits, args.workers, args.hash)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        if out is not sys.stdout:
+            out.close()
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
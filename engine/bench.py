@@ -0,0 +1,430 @@
+"""Бенчмарки движка.
+
+    python -m engine.bench movegen [--count N] [--repeats N]
+        генерация ходов: старый генератор на списках строк против битбордов
+    python -m engine.bench parallel [--depth N] [--workers 1,2,4,8]
+        время до глубины у параллельного поиска при разном числе процессов
+    python -m engine.bench ordering [--depth N]
+        размер дерева до глубины с сортировкой ходов и без нее
+    python -m engine.bench pruning [--depth N]
+        узлы до глубины с приемами выборочного поиска и без каждого из них
+    python -m engine.bench eval [--games N] [--repeats N]
+        сверка инкрементальной оценки с пересчетом с нуля и их скорость
+
+Старый генератор перенесен сюда, чтобы сравнивать и скорость, и сами списки
+ходов. Исправлены только две ошибки оригинала: пешка на последней горизонтали
+ходила за край доски, а атака пешкой проверялась с перевернутым направлением
+(король мог встать под пешку). Битборды с самого начала считают это правильно.
+Рокировок, взятий на проходе и превращений старый генератор не знал, при
+сверке они не учитываются. Полная проверка правил - engine.perft.
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from engine.bitboard import COLOR_NAMES, KING, PAWN, Position, START_BOARD, move_from, move_name, move_to
+from engine.evaluation import evaluate, evaluate_full
+from engine.parallel import ParallelSearcher, shutdown_pool
+from engine.search import Searcher
+
+
+class LegacyBoard:
+    """Генератор ходов в том виде, в каком он был в ChessGame"""
+
+    def __init__(self, board, current_player):
+        self.board = [row[:] for row in board]
+        self.current_player = current_player
+
+    def get_piece(self, row, col):
+        if 0 <= row < 8 and 0 <= col < 8:
+            return self.board[row][col]
+        return None
+
+    def find_king(self, color):
+        for row in range(8):
+            for col in range(8):
+                piece = self.get_piece(row, col)
+                if piece and piece == f"{color}_king":
+                    return (row, col)
+        return None
+
+    def is_square_attacked(self, row, col, attacker_color):
+        # Белая пешка бьет вверх, поэтому атакует клетку снизу (в оригинале знак был перепутан)
+        direction = 1 if attacker_color == 'white' else -1
+        for dc in [-1, 1]:
+            r, c = row + direction, col + dc
+            if 0 <= r < 8 and 0 <= c < 8:
+                piece = self.get_piece(r, c)
+                if piece and piece.startswith(attacker_color) and piece.endswith('pawn'):
+                    return True
+        knight_moves = [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
+        for dr, dc in knight_moves:
+            r, c = row + dr, col + dc
+            if 0 <= r < 8 and 0 <= c < 8:
+                piece = self.get_piece(r, c)
+                if piece and piece.startswith(attacker_color) and piece.endswith('knight'):
+                    return True
+        for dr, dc in [(1, 0), (-1, 0), (0, 1), (0, -1)]:
+            for i in range(1, 8):
+                r, c = row + i*dr, col + i*dc
+                if not (0 <= r < 8 and 0 <= c < 8):
+                    break
+                piece = self.get_piece(r, c)
+                if piece:
+                    if piece.startswith(attacker_color) and (piece.endswith('rook') or piece.endswith('queen')):
+                        return True
+                    break
+        for dr, dc in [(1, 1), (1, -1), (-1, 1), (-1, -1)]:
+            for i in range(1, 8):
+                r, c = row + i*dr, col + i*dc
+                if not (0 <= r < 8 and 0 <= c < 8):
+                    break
+                piece = self.get_piece(r, c)
+                if piece:
+                    if piece.startswith(attacker_color) and (piece.endswith('bishop') or piece.endswith('queen')):
+                        return True
+                    break
+        for dr in [-1, 0, 1]:
+            for dc in [-1, 0, 1]:
+                if dr == 0 and dc == 0:
+                    continue
+                r, c = row + dr, col + dc
+                if 0 <= r < 8 and 0 <= c < 8:
+                    piece = self.get_piece(r, c)
+                    if piece and piece.startswith(attacker_color) and piece.endswith('king'):
+                        return True
+        return False
+
+    def is_in_check(self, color):
+        king_pos = self.find_king(color)
+        if not king_pos:
+            return False
+        attacker_color = 'black' if color == 'white' else 'white'
+        return self.is_square_attacked(king_pos[0], king_pos[1], attacker_color)
+
+    def calculate_valid_moves(self, row, col):
+        moves = []
+        piece = self.get_piece(row, col)
+        if not piece:
+            return moves
+        piece_type = piece.split('_')[1]
+        if piece_type == 'pawn':
+            direction = -1 if self.current_player == 'white' else 1
+            # Пешка на последней горизонтали не ходит за край доски
+            if 0 <= row + direction < 8 and self.get_piece(row + direction, col) is None:
+                moves.append((row + direction, col))
+                if (self.current_player == 'white' and row == 6) or (self.current_player == 'black' and row == 1):
+                    if self.get_piece(row + 2*direction, col) is None:
+                        moves.append((row + 2*direction, col))
+            for dc in [-1, 1]:
+                r, c = row + direction, col + dc
+                if 0 <= r < 8 and 0 <= c < 8:
+                    target = self.get_piece(r, c)
+                    if target and not target.startswith(self.current_player):
+                        moves.append((r, c))
+        elif piece_type in ('rook', 'bishop', 'queen'):
+            directions = {
+                'rook': [(1, 0), (-1, 0), (0, 1), (0, -1)],
+                'bishop': [(1, 1), (1, -1), (-1, 1), (-1, -1)],
+                'queen': [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)],
+            }[piece_type]
+            for dr, dc in directions:
+                for i in range(1, 8):
+                    r, c = row + i*dr, col + i*dc
+                    if not (0 <= r < 8 and 0 <= c < 8):
+                        break
+                    target = self.get_piece(r, c)
+                    if target is None:
+                        moves.append((r, c))
+                    elif not target.startswith(self.current_player):
+                        moves.append((r, c))
+                        break
+                    else:
+                        break
+        elif piece_type == 'knight':
+            for dr, dc in [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]:
+                r, c = row + dr, col + dc
+                if 0 <= r < 8 and 0 <= c < 8:
+                    target = self.get_piece(r, c)
+                    if target is None or not target.startswith(self.current_player):
+                        moves.append((r, c))
+        elif piece_type == 'king':
+            for dr in [-1, 0, 1]:
+                for dc in [-1, 0, 1]:
+                    if dr == 0 and dc == 0:
+                        continue
+                    r, c = row + dr, col + dc
+                    if 0 <= r < 8 and 0 <= c < 8:
+                        target = self.get_piece(r, c)
+                        if target is None or not target.startswith(self.current_player):
+                            original_piece = self.get_piece(r, c)
+                            self.board[r][c] = piece
+                            self.board[row][col] = None
+                            if not self.is_in_check(self.current_player):
+                                moves.append((r, c))
+                            self.board[row][col] = piece
+                            self.board[r][c] = original_piece
+        valid_moves = []
+        for move_row, move_col in moves:
+            original_piece = self.get_piece(move_row, move_col)
+            self.board[move_row][move_col] = piece
+            self.board[row][col] = None
+            if not self.is_in_check(self.current_player):
+                valid_moves.append((move_row, move_col))
+            self.board[row][col] = piece
+            self.board[move_row][move_col] = original_piece
+        return valid_moves
+
+    def all_moves(self):
+        moves = []
+        for row in range(8):
+            for col in range(8):
+                piece = self.get_piece(row, col)
+                if piece and piece.startswith(self.current_player):
+                    for to in self.calculate_valid_moves(row, col):
+                        moves.append(((row, col), to))
+        return moves
+
+
+def sample_positions(count, seed=2812):
+    """Позиции из случайных партий от начальной расстановки"""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        position = Position(START_BOARD)
+        for _ in range(rng.randint(0, 80)):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            move = rng.choice(moves)
+            position.make_move(move)
+        positions.append(position)
+    return positions
+
+
+def bitboard_moves(position):
+    """Ходы битбордов в виде старого генератора: без рокировок и взятий на
+    проходе, которых он не знал, и с одним ходом на каждое превращение"""
+    moves = set()
+    for m in position.legal_moves():
+        frm, to = move_from(m), move_to(m)
+        piece = position.squares[frm] % 6
+        if piece == KING and abs(to - frm) == 2:
+            continue
+        if piece == PAWN and to == position.ep:
+            continue
+        moves.add((divmod(frm, 8), divmod(to, 8)))
+    return moves
+
+
+def run_movegen(count=200, repeats=3):
+    positions = sample_positions(count)
+    legacy = [LegacyBoard(p.to_board(), COLOR_NAMES[p.side]) for p in positions]
+
+    # Сначала сверяем списки ходов
+    for position, board in zip(positions, legacy):
+        if bitboard_moves(position) != set(board.all_moves()):
+            print("Списки ходов различаются в позиции:")
+            for row in position.to_board():
+                print(row)
+            return False
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for board in legacy:
+            board.all_moves()
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for position in positions:
+            position.legal_moves()
+    bitboard_time = time.perf_counter() - start
+
+    calls = count * repeats
+    print(f"Позиций: {count}, повторов: {repeats}, списки ходов совпадают")
+    print(f"Списки строк: {legacy_time:.3f} с ({legacy_time / calls * 1e6:.0f} мкс на позицию)")
+    print(f"Битборды:     {bitboard_time:.3f} с ({bitboard_time / calls * 1e6:.0f} мкс на позицию)")
+    print(f"Ускорение:    {legacy_time / bitboard_time:.1f}x")
+    return True
+
+
+def run_eval(games=50, repeats=20, seed=2812):
+    """Случайные партии с отменой ходов: после каждого хода и каждой отмены
+    инкрементальная оценка должна совпасть с пересчетом с нуля"""
+    rng = random.Random(seed)
+    checked = 0
+    for _ in range(games):
+        position = Position(START_BOARD)
+        for _ in range(rng.randint(20, 120)):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            # Пробуем несколько ходов с отменой, затем делаем один
+            for move in rng.sample(moves, min(3, len(moves))):
+                position.make_move(move)
+                checked += 1
+                if evaluate(position) != evaluate_full(position):
+                    print(f"Оценка разошлась после хода {move_name(move)}")
+                    return False
+                position.unmake_move()
+                checked += 1
+                if evaluate(position) != evaluate_full(position):
+                    print(f"Оценка разошлась после отмены {move_name(move)}")
+                    return False
+            position.make_move(rng.choice(moves))
+
+    positions = sample_positions(200, seed)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for position in positions:
+            evaluate(position)
+    incremental_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for position in positions:
+            evaluate_full(position)
+    full_time = time.perf_counter() - start
+
+    calls = len(positions) * repeats
+    print(f"Проверено позиций: {checked}, оценки совпадают")
+    print(f"Инкрементальная: {incremental_time / calls * 1e6:.2f} мкс на позицию")
+    print(f"С нуля:          {full_time / calls * 1e6:.2f} мкс на позицию")
+    print(f"Ускорение:       {full_time / incremental_time:.1f}x")
+    return True
+
+
+# Фиксированный набор позиций для замеров поиска: ходы от начальной расстановки
+SEARCH_POSITIONS = [
+    "",
+    "e2e4 e7e5 g1f3 b8c6 f1b5 a7a6 b5a4 g8f6",
+    "d2d4 g8f6 c2c4 e7e6 b1c3 f8b4 d1c2 d7d5",
+    "e2e4 c7c5 g1f3 d7d6 d2d4 c5d4 f3d4 g8f6 b1c3 a7a6",
+    "e2e4 e7e6 d2d4 d7d5 b1c3 f8b4 e4e5 c7c5 a2a3 b4c3 b2c3 g8e7",
+]
+
+
+def position_from_moves(moves):
+    position = Position(START_BOARD)
+    for text in moves.split():
+        move = position.parse_move(text)
+        if move is None:
+            raise ValueError(f"Нелегальный ход {text}")
+        position.make_move(move)
+    return position
+
+
+def run_parallel(depth=5, worker_counts=(1, 2, 4, 8)):
+    """Время до фиксированной глубины на наборе позиций при разном числе процессов"""
+    positions = [position_from_moves(moves) for moves in SEARCH_POSITIONS]
+    baseline = None
+    print(f"Глубина {depth}, позиций {len(positions)}")
+    for workers in worker_counts:
+        total_time = 0.0
+        total_nodes = 0
+        for position in positions:
+            # Новый поисковик на каждую позицию - без выигрыша от старой таблицы
+            searcher = Searcher() if workers == 1 else ParallelSearcher(workers)
+            result = searcher.search(position, depth=depth)
+            total_time += result['time']
+            total_nodes += result['nodes']
+        shutdown_pool()
+        if baseline is None:
+            baseline = total_time
+        print(f"процессов {workers}: {total_time:.2f} с, узлов {total_nodes}, "
+              f"{int(total_nodes / total_time)} узлов/с, ускорение {baseline / total_time:.2f}x")
+    return True
+
+
+def run_ordering(depth=5):
+    """Узлы до фиксированной глубины с сортировкой ходов и только с ходом из таблицы"""
+    positions = [position_from_moves(moves) for moves in SEARCH_POSITIONS]
+    print(f"Глубина {depth}, позиций {len(positions)}")
+    baseline = None
+    for use_ordering in (False, True):
+        total_time = 0.0
+        total_nodes = 0
+        cutoffs = 0
+        first_cutoffs = 0.0
+        for position in positions:
+            searcher = Searcher()
+            searcher.use_ordering = use_ordering
+            result = searcher.search(position, depth=depth)
+            total_time += result['time']
+            total_nodes += result['nodes']
+            stats = result['ordering']
+            cutoffs += stats['cutoffs']
+            first_cutoffs += stats['first_cutoff_rate'] * stats['cutoffs']
+        if baseline is None:
+            baseline = total_nodes
+        label = "сортировка" if use_ordering else "ход из таблицы"
+        print(f"{label:15} узлов {total_nodes:8} ({total_nodes / baseline:.0%}), {total_time:.2f} с, "
+              f"отсечений первым ходом {first_cutoffs / max(1, cutoffs):.0%}")
+    return True
+
+
+# Конфигурации для замера выборочного поиска: название -> выключенные флаги
+PRUNING_CONFIGS = [
+    ("все включены", ()),
+    ("без null-move", ('use_null_move',)),
+    ("без LMR", ('use_lmr',)),
+    ("без aspiration", ('use_aspiration',)),
+    ("все выключены", ('use_null_move', 'use_lmr', 'use_aspiration')),
+]
+
+
+def run_pruning(depth=6):
+    """Узлы и время до фиксированной глубины с каждым приемом и без него"""
+    positions = [position_from_moves(moves) for moves in SEARCH_POSITIONS]
+    print(f"Глубина {depth}, позиций {len(positions)}")
+    for label, disabled in PRUNING_CONFIGS:
+        total_time = 0.0
+        total_nodes = 0
+        moves = []
+        for position in positions:
+            searcher = Searcher()
+            for flag in disabled:
+                setattr(searcher, flag, False)
+            result = searcher.search(position, depth=depth)
+            total_time += result['time']
+            total_nodes += result['nodes']
+            moves.append(move_name(result['move']))
+        print(f"{label:15} узлов {total_nodes:8}, {total_time:6.2f} с, ходы {' '.join(moves)}")
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки движка")
+    commands = parser.add_subparsers(dest="command")
+    movegen = commands.add_parser("movegen", help="генерация ходов против старого генератора")
+    movegen.add_argument("--count", type=int, default=200)
+    movegen.add_argument("--repeats", type=int, default=3)
+    parallel = commands.add_parser("parallel", help="время до глубины при разном числе процессов")
+    parallel.add_argument("--depth", type=int, default=5)
+    parallel.add_argument("--workers", default="1,2,4,8")
+    ordering = commands.add_parser("ordering", help="размер дерева с сортировкой ходов и без нее")
+    ordering.add_argument("--depth", type=int, default=5)
+    pruning = commands.add_parser("pruning", help="узлы до глубины с выборочным поиском и без него")
+    pruning.add_argument("--depth", type=int, default=6)
+    evaluation = commands.add_parser("eval", help="сверка и скорость инкрементальной оценки")
+    evaluation.add_argument("--games", type=int, default=50)
+    evaluation.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.command == "parallel":
+        return run_parallel(args.depth, [int(w) for w in args.workers.split(",")])
+    if args.command == "eval":
+        return run_eval(args.games, args.repeats)
+    if args.command == "pruning":
+        return run_pruning(args.depth)
+    if args.command == "ordering":
+        return run_ordering(args.depth)
+    if args.command == "movegen":
+        return run_movegen(args.count, args.repeats)
+    return run_movegen()
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,966 @@
+"""Битбордовое представление позиции.
+
+Каждая из двенадцати фигур (цвет + тип) хранится как 64-битное множество
+клеток, плюс занятость по цветам и общая. Клетка кодируется как
+sq = row * 8 + col, где row 0 - восьмая горизонталь, ровно как в
+ChessGame.board, поэтому перевод координат - обычный divmod.
+
+Правила полные: рокировки, взятие на проходе и превращения. Права рокировки
+и клетка взятия на проходе - часть позиции и ее ключа Zobrist.
+"""
+
+import random
+
+from engine.psqt import PHASE_WEIGHTS, PSQT_EG, PSQT_MG
+
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+
+COLOR_NAMES = ('white', 'black')
+TYPE_NAMES = ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king')
+COLOR_CODES = {name: i for i, name in enumerate(COLOR_NAMES)}
+
+# Код фигуры = цвет * 6 + тип, имя - как в ChessGame.board
+PIECE_NAMES = tuple(f"{color}_{kind}" for color in COLOR_NAMES for kind in TYPE_NAMES)
+PIECE_CODES = {name: i for i, name in enumerate(PIECE_NAMES)}
+
+FULL = (1 << 64) - 1
+# Пешки на предпоследней горизонтали: следующим ходом они превращаются
+PROMOTION_FROM = (0xFF << 8, 0xFF << 48)
+# Превращения в порядке перебора: ферзь первым
+PROMOTIONS = (QUEEN, ROOK, BISHOP, KNIGHT)
+
+# Права рокировки - биты маски
+WHITE_OO, WHITE_OOO, BLACK_OO, BLACK_OOO = 1, 2, 4, 8
+# Рокировки по цвету: (клетка короля, куда он встает, право, клетки между
+# королем и ладьей). Ладья для каждой клетки назначения короля - в CASTLING_ROOKS
+CASTLING_MOVES = (
+    ((60, 62, WHITE_OO, (1 << 61) | (1 << 62)), (60, 58, WHITE_OOO, (1 << 57) | (1 << 58) | (1 << 59))),
+    ((4, 6, BLACK_OO, (1 << 5) | (1 << 6)), (4, 2, BLACK_OOO, (1 << 1) | (1 << 2) | (1 << 3))),
+)
+CASTLING_ROOKS = {62: (63, 61), 58: (56, 59), 6: (7, 5), 2: (0, 3)}
+# Какие права остаются после хода с клетки или на клетку (король, ладьи)
+CASTLING_MASK = [15] * 64
+CASTLING_MASK[60] = 15 & ~(WHITE_OO | WHITE_OOO)
+CASTLING_MASK[63] = 15 & ~WHITE_OO
+CASTLING_MASK[56] = 15 & ~WHITE_OOO
+CASTLING_MASK[4] = 15 & ~(BLACK_OO | BLACK_OOO)
+CASTLING_MASK[7] = 15 & ~BLACK_OO
+CASTLING_MASK[0] = 15 & ~BLACK_OOO
+CASTLING_LETTERS = 'KQkq'
+# Буквы фигур в алгебраической записи, по индексу типа; у пешки буквы нет
+SAN_PIECES = 'PNBRQK'
+
+START_BOARD = [
+    ['black_rook', 'black_knight', 'black_bishop', 'black_queen', 'black_king', 'black_bishop', 'black_knight', 'black_rook'],
+    ['black_pawn'] * 8,
+    [None] * 8,
+    [None] * 8,
+    [None] * 8,
+    [None] * 8,
+    ['white_pawn'] * 8,
+    ['white_rook', 'white_knight', 'white_bishop', 'white_queen', 'white_king', 'white_bishop', 'white_knight', 'white_rook']
+]
+
+
+def lsb(bb):
+    """Индекс младшего установленного бита"""
+    return (bb & -bb).bit_length() - 1
+
+
+def iter_bits(bb):
+    """Перебирает клетки множества"""
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def popcount(bb):
+    return bin(bb).count('1')
+
+
+def square_name(sq):
+    row, col = divmod(sq, 8)
+    return f"{chr(97 + col)}{8 - row}"
+
+
+# Ход - целое число: клетка откуда | клетка куда << 6 | тип превращения << 12.
+# Рокировка - ход короля на две клетки, взятие на проходе - ход пешки на
+# клетку Position.ep: отдельных флагов им не нужно
+def encode_move(frm, to, promotion=0):
+    return frm | (to << 6) | (promotion << 12)
+
+
+def move_from(move):
+    return move & 63
+
+
+def move_to(move):
+    return (move >> 6) & 63
+
+
+def move_promotion(move):
+    """Тип фигуры, в которую превращается пешка, или 0"""
+    return move >> 12
+
+
+def move_name(move):
+    name = square_name(move_from(move)) + square_name(move_to(move))
+    if move >> 12:
+        name += SAN_PIECES[move >> 12].lower()
+    return name
+
+
+# Предвычисленные таблицы атак
+def _step_table(deltas):
+    table = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        bb = 0
+        for dr, dc in deltas:
+            r, c = row + dr, col + dc
+            if 0 <= r < 8 and 0 <= c < 8:
+                bb |= 1 << (r * 8 + c)
+        table.append(bb)
+    return table
+
+
+KNIGHT_ATTACKS = _step_table([(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)])
+KING_ATTACKS = _step_table([(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc])
+# PAWN_ATTACKS[color][sq] - клетки, которые бьет пешка цвета color с клетки sq.
+# Белые ходят к нулевой строке, черные - к седьмой
+PAWN_ATTACKS = (_step_table([(-1, -1), (-1, 1)]), _step_table([(1, -1), (1, 1)]))
+
+
+def _ray_attacks(sq, occ, directions):
+    row, col = divmod(sq, 8)
+    bb = 0
+    for dr, dc in directions:
+        r, c = row + dr, col + dc
+        while 0 <= r < 8 and 0 <= c < 8:
+            bb |= 1 << (r * 8 + c)
+            if occ >> (r * 8 + c) & 1:
+                break
+            r += dr
+            c += dc
+    return bb
+
+
+def _line_tables(directions):
+    """Для каждой клетки: маска внутренних клеток линии и словарь
+    "блокеры на линии" -> атаки. Линия - пара противоположных направлений,
+    поэтому в словаре не больше 64 записей и таблицы строятся мгновенно."""
+    masks = []
+    tables = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        mask = 0
+        for dr, dc in directions:
+            r, c = row + dr, col + dc
+            # Крайняя клетка луча на результат не влияет
+            while 0 <= r + dr < 8 and 0 <= c + dc < 8:
+                mask |= 1 << (r * 8 + c)
+                r += dr
+                c += dc
+        table = {}
+        subset = 0
+        while True:
+            table[subset] = _ray_attacks(sq, subset, directions)
+            subset = (subset - mask) & mask
+            if not subset:
+                break
+        masks.append(mask)
+        tables.append(table)
+    return masks, tables
+
+
+_RANK_MASK, _RANK_ATT = _line_tables([(0, 1), (0, -1)])
+_FILE_MASK, _FILE_ATT = _line_tables([(1, 0), (-1, 0)])
+_DIAG_MASK, _DIAG_ATT = _line_tables([(1, 1), (-1, -1)])
+_ANTI_MASK, _ANTI_ATT = _line_tables([(1, -1), (-1, 1)])
+
+
+def rook_attacks(sq, occ):
+    return _RANK_ATT[sq][occ & _RANK_MASK[sq]] | _FILE_ATT[sq][occ & _FILE_MASK[sq]]
+
+
+def bishop_attacks(sq, occ):
+    return _DIAG_ATT[sq][occ & _DIAG_MASK[sq]] | _ANTI_ATT[sq][occ & _ANTI_MASK[sq]]
+
+
+def queen_attacks(sq, occ):
+    return rook_attacks(sq, occ) | bishop_attacks(sq, occ)
+
+
+def _between_table():
+    """BETWEEN[a][b] - клетки строго между a и b, если они на одной линии"""
+    table = [[0] * 64 for _ in range(64)]
+    for a in range(64):
+        row, col = divmod(a, 8)
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                if not (dr or dc):
+                    continue
+                ray = 0
+                r, c = row + dr, col + dc
+                while 0 <= r < 8 and 0 <= c < 8:
+                    table[a][r * 8 + c] = ray
+                    ray |= 1 << (r * 8 + c)
+                    r += dr
+                    c += dc
+    return table
+
+
+BETWEEN = _between_table()
+
+
+def _zobrist_keys():
+    """Случайные 64-битные ключи Zobrist. Seed фиксирован, чтобы ключи
+    не менялись между запусками и процессами."""
+    rng = random.Random(0x5A0B)
+    pieces = [[rng.getrandbits(64) for _ in range(64)] for _ in range(12)]
+    side = rng.getrandbits(64)
+    rights = [rng.getrandbits(64) for _ in range(4)]
+    # Ключ набора прав - xor ключей входящих в него прав
+    castling = []
+    for mask in range(16):
+        key = 0
+        for bit in range(4):
+            if mask >> bit & 1:
+                key ^= rights[bit]
+        castling.append(key)
+    # Взятие на проходе - по вертикали
+    ep = [rng.getrandbits(64) for _ in range(8)]
+    return pieces, side, castling, ep
+
+
+ZOBRIST_PIECES, ZOBRIST_SIDE, ZOBRIST_CASTLING, ZOBRIST_EP = _zobrist_keys()
+
+
+def piece_attacks(piece, sq, occ):
+    """Клетки, которые бьет фигура piece с клетки sq"""
+    color, kind = divmod(piece, 6)
+    if kind == PAWN:
+        return PAWN_ATTACKS[color][sq]
+    if kind == KNIGHT:
+        return KNIGHT_ATTACKS[sq]
+    if kind == BISHOP:
+        return bishop_attacks(sq, occ)
+    if kind == ROOK:
+        return rook_attacks(sq, occ)
+    if kind == QUEEN:
+        return queen_attacks(sq, occ)
+    return KING_ATTACKS[sq]
+
+
+class Position:
+    """Позиция: двенадцать битбордов фигур, занятость и сторона хода.
+
+    Кроме расстановки позиция ведет карты атак: для каждой клетки множество
+    клеток, которые бьет стоящая на ней фигура, и для каждой стороны число
+    атакующих на каждой клетке. Карты и клетки королей обновляются в
+    make_move/unmake_move, поэтому шах и безопасность хода короля - поиск
+    по таблице. Так же по ходу ведутся суммы таблиц положения фигур для
+    миттельшпиля и эндшпиля (psqt_mg, psqt_eg, с точки зрения белых) и стадия
+    партии phase - оценке на листе не нужно обходить доску. С debug=True после
+    каждого хода все это сверяется с полным пересчетом.
+
+    castling - маска прав рокировки (WHITE_OO...), ep - клетка, на которую
+    можно взять на проходе, или None. Если права не заданы, они выводятся
+    из расстановки: король и ладья на своих начальных клетках.
+    """
+
+    def __init__(self, board=None, side=WHITE, debug=False, castling=None, ep=None):
+        self.pieces = [0] * 12
+        self.occupied = [0, 0]
+        self.occ = 0
+        self.squares = [None] * 64
+        self.side = side
+        self.debug = debug
+        # Стек отмены: (ход, взятая фигура, прежняя клетка шаха, прежний ключ,
+        # прежние суммы таблиц и стадия, прежние права рокировки и клетка
+        # взятия на проходе)
+        self.history = []
+        if board is not None:
+            for row in range(8):
+                for col in range(8):
+                    name = board[row][col]
+                    if name:
+                        self._put(PIECE_CODES[name], row * 8 + col)
+        self.castling = self._infer_castling() if castling is None else castling
+        self.ep = ep
+        self._rebuild()
+
+    def _infer_castling(self):
+        rights = 0
+        for color, options in enumerate(CASTLING_MOVES):
+            for king_from, king_to, right, _ in options:
+                rook_from = CASTLING_ROOKS[king_to][0]
+                if (self.squares[king_from] == color * 6 + KING
+                        and self.squares[rook_from] == color * 6 + ROOK):
+                    rights |= right
+        return rights
+
+    def _rebuild(self):
+        """Полный пересчет производных данных после расстановки"""
+        self.king_squares = [self.king_square(WHITE), self.king_square(BLACK)]
+        self.attacks_from, self.attack_counts, self.attacked = self._compute_attacks()
+        # Цвет, за который посчитаны атаки клетки: при взятии он меняется
+        self._attack_owners = [piece // 6 if piece is not None else None for piece in self.squares]
+        self.check_square = self._find_check()
+        self.hash = self.compute_hash()
+        self.psqt_mg, self.psqt_eg, self.phase = self.compute_psqt()
+
+    @classmethod
+    def from_board(cls, board, current_player='white', debug=False):
+        return cls(board, COLOR_CODES[current_player], debug)
+
+    @classmethod
+    def from_fen(cls, fen, debug=False):
+        """Позиция из записи FEN; счетчики ходов не используются"""
+        fields = fen.split()
+        rows = fields[0].split('/') if fields else []
+        if len(rows) != 8:
+            raise ValueError(f"Неверный FEN: {fen}")
+        board = []
+        for text in rows:
+            row = []
+            for ch in text:
+                if ch.isdigit():
+                    row.extend([None] * int(ch))
+                elif ch.upper() in SAN_PIECES:
+                    color = 'white' if ch.isupper() else 'black'
+                    row.append(f"{color}_{TYPE_NAMES[SAN_PIECES.index(ch.upper())]}")
+                else:
+                    raise ValueError(f"Неверный FEN: {fen}")
+            if len(row) != 8:
+                raise ValueError(f"Неверный FEN: {fen}")
+            board.append(row)
+        side = BLACK if len(fields) > 1 and fields[1] == 'b' else WHITE
+        castling = 0
+        if len(fields) > 2:
+            for ch in fields[2]:
+                if ch in CASTLING_LETTERS:
+                    castling |= 1 << CASTLING_LETTERS.index(ch)
+        ep = None
+        if len(fields) > 3 and fields[3] != '-':
+            # Поле взятия на проходе - за пешкой соперника, которая только что
+            # сделала двойной ход: третья горизонталь при ходе черных, шестая - белых
+            text = fields[3]
+            if len(text) != 2 or text[0] not in 'abcdefgh' or text[1] != ('6' if side == WHITE else '3'):
+                raise ValueError(f"Неверное поле взятия на проходе в FEN: {fen}")
+            ep = (8 - int(text[1])) * 8 + ord(text[0]) - 97
+            pawn_sq = ep + 8 if side == WHITE else ep - 8
+            if board[ep >> 3][ep & 7] or board[pawn_sq >> 3][pawn_sq & 7] != f"{COLOR_NAMES[side ^ 1]}_pawn":
+                raise ValueError(f"Неверное поле взятия на проходе в FEN: {fen}")
+        return cls(board, side, debug, castling, ep)
+
+    def validate(self):
+        """Проверяет, что по позиции можно играть: у каждой стороны один
+        король, пешки не на крайних горизонталях, для каждого права рокировки
+        король и ладья на своих местах, король стороны, которая не ходит, не
+        под шахом. Ошибка - ValueError"""
+        for color in (WHITE, BLACK):
+            if popcount(self.pieces[color * 6 + KING]) != 1:
+                raise ValueError(f"У {'белых' if color == WHITE else 'черных'} должен быть ровно один король")
+        # Восьмая и первая горизонтали
+        if (self.pieces[PAWN] | self.pieces[6 + PAWN]) & (0xFF | (0xFF << 56)):
+            raise ValueError("Пешка на первой или последней горизонтали")
+        if self.castling & ~self._infer_castling():
+            raise ValueError("Право рокировки без короля или ладьи на исходных полях")
+        if self.in_check(self.side ^ 1):
+            raise ValueError("Король стороны, которая не ходит, под шахом")
+
+    def to_fen(self, halfmove=0, fullmove=1):
+        """Запись FEN; счетчики ходов позиция не хранит, их передает партия"""
+        rows = []
+        for row in range(8):
+            text = ''
+            empty = 0
+            for piece in self.squares[row * 8:row * 8 + 8]:
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    text += str(empty)
+                    empty = 0
+                letter = SAN_PIECES[piece % 6]
+                text += letter if piece < 6 else letter.lower()
+            if empty:
+                text += str(empty)
+            rows.append(text)
+        castling = ''.join(letter for i, letter in enumerate(CASTLING_LETTERS) if self.castling >> i & 1)
+        ep = square_name(self.ep) if self.ep is not None else '-'
+        side = 'w' if self.side == WHITE else 'b'
+        return f"{'/'.join(rows)} {side} {castling or '-'} {ep} {halfmove} {fullmove}"
+
+    def to_board(self):
+        """Представление в виде списка строк для отрисовки"""
+        squares = self.squares
+        return [[PIECE_NAMES[p] if p is not None else None for p in squares[row * 8:row * 8 + 8]]
+                for row in range(8)]
+
+    def copy(self):
+        other = Position.__new__(Position)
+        other.pieces = self.pieces[:]
+        other.occupied = self.occupied[:]
+        other.occ = self.occ
+        other.squares = self.squares[:]
+        other.side = self.side
+        other.castling = self.castling
+        other.ep = self.ep
+        other.debug = self.debug
+        other.history = self.history[:]
+        other.king_squares = self.king_squares[:]
+        other.attacks_from = self.attacks_from[:]
+        other.attack_counts = [self.attack_counts[0][:], self.attack_counts[1][:]]
+        other.attacked = self.attacked[:]
+        other._attack_owners = self._attack_owners[:]
+        other.check_square = self.check_square
+        other.hash = self.hash
+        other.psqt_mg = self.psqt_mg
+        other.psqt_eg = self.psqt_eg
+        other.phase = self.phase
+        return other
+
+    # _put/_remove - только для расстановки, карты атак они не трогают
+    def _put(self, piece, sq):
+        bit = 1 << sq
+        self.pieces[piece] |= bit
+        self.occupied[piece // 6] |= bit
+        self.occ |= bit
+        self.squares[sq] = piece
+
+    def _remove(self, sq):
+        piece = self.squares[sq]
+        if piece is not None:
+            mask = ~(1 << sq)
+            self.pieces[piece] &= mask
+            self.occupied[piece // 6] &= mask
+            self.occ &= mask
+            self.squares[sq] = None
+        return piece
+
+    def compute_hash(self):
+        """Ключ Zobrist с нуля; в make_move он обновляется по ходу"""
+        h = ZOBRIST_SIDE if self.side == BLACK else 0
+        for sq, piece in enumerate(self.squares):
+            if piece is not None:
+                h ^= ZOBRIST_PIECES[piece][sq]
+        h ^= ZOBRIST_CASTLING[self.castling]
+        if self.ep is not None:
+            h ^= ZOBRIST_EP[self.ep & 7]
+        return h
+
+    def compute_psqt(self):
+        """Суммы таблиц положения и стадия партии с нуля: (mg, eg, phase)"""
+        mg = eg = phase = 0
+        for sq, piece in enumerate(self.squares):
+            if piece is not None:
+                mg += PSQT_MG[piece][sq]
+                eg += PSQT_EG[piece][sq]
+                phase += PHASE_WEIGHTS[piece % 6]
+        return mg, eg, phase
+
+    def parse_move(self, text):
+        """Легальный ход по записи вида 'e2e4' или None"""
+        for move in self.legal_moves():
+            if move_name(move) == text:
+                return move
+        return None
+
+    def parse_san(self, text):
+        """Легальный ход по короткой алгебраической записи ('Nf3', 'exd5',
+        'Rad1', 'O-O', 'e8=Q') или None, если такого хода нет"""
+        text = text.rstrip('+#!?').replace('0', 'O')
+        if text in ('O-O', 'O-O-O'):
+            king = self.king_squares[self.side]
+            if king is None:
+                return None
+            to = king + 2 if text == 'O-O' else king - 2
+            for move in self.legal_moves_from(king):
+                if (move >> 6) & 63 == to:
+                    return move
+            return None
+        promotion = 0
+        if '=' in text:
+            text, letter = text.split('=', 1)
+            promotion = SAN_PIECES.find(letter[:1])
+            if promotion not in PROMOTIONS:
+                return None
+        if len(text) < 2:
+            return None
+        kind = SAN_PIECES.find(text[0]) if text[0] in SAN_PIECES else PAWN
+        body = text[1:] if kind != PAWN else text
+        dest = body[-2:]
+        hint = body[:-2].replace('x', '')
+        found = None
+        for move in self.legal_moves():
+            frm = move & 63
+            if (self.squares[frm] % 6 != kind or square_name((move >> 6) & 63) != dest
+                    or move >> 12 != promotion):
+                continue
+            name = square_name(frm)
+            if any(c not in name for c in hint):
+                continue
+            if found is not None:
+                # Неоднозначная запись
+                return None
+            found = move
+        return found
+
+    def key(self):
+        """Ключ позиции для словарей и таблицы транспозиций"""
+        return self.hash
+
+    def piece_at(self, sq):
+        return self.squares[sq]
+
+    def is_capture(self, move):
+        """Берет ли ход фигуру (включая взятие на проходе)"""
+        to = (move >> 6) & 63
+        return (self.squares[to] is not None
+                or (to == self.ep and self.squares[move & 63] % 6 == PAWN))
+
+    def king_square(self, color):
+        kings = self.pieces[color * 6 + KING]
+        return lsb(kings) if kings else None
+
+    def _compute_attacks(self):
+        """Карты атак с нуля: по фигуре на клетку, счетчики и множества по сторонам"""
+        attacks_from = [0] * 64
+        counts = [[0] * 64, [0] * 64]
+        attacked = [0, 0]
+        occ = self.occ
+        for sq in iter_bits(occ):
+            piece = self.squares[sq]
+            attacks = piece_attacks(piece, sq, occ)
+            attacks_from[sq] = attacks
+            color = piece // 6
+            attacked[color] |= attacks
+            color_counts = counts[color]
+            for target in iter_bits(attacks):
+                color_counts[target] += 1
+        return attacks_from, counts, attacked
+
+    def _update_attacks(self, changed, occ_min):
+        """Пересчитывает атаки фигур на клетках changed и дальнобойщиков,
+        чьи лучи проходят через эти клетки. occ_min - занятость, общая для
+        позиций до и после хода: с ней лучи не короче ни одного из двух
+        вариантов, так что ни одна задетая фигура не пропадет."""
+        pieces = self.pieces
+        diagonal = pieces[BISHOP] | pieces[QUEEN] | pieces[6 + BISHOP] | pieces[6 + QUEEN]
+        straight = pieces[ROOK] | pieces[QUEEN] | pieces[6 + ROOK] | pieces[6 + QUEEN]
+        affected = changed
+        for sq in iter_bits(changed):
+            affected |= (bishop_attacks(sq, occ_min) & diagonal) | (rook_attacks(sq, occ_min) & straight)
+
+        occ = self.occ
+        squares = self.squares
+        attacks_from = self.attacks_from
+        counts = self.attack_counts
+        attacked = self.attacked
+        # Старые атаки нужны с цветом прежнего владельца клетки, поэтому
+        # сначала снимаем старые, потом добавляем новые
+        owners = self._attack_owners
+        for sq in iter_bits(affected):
+            old = attacks_from[sq]
+            piece = squares[sq]
+            new = piece_attacks(piece, sq, occ) if piece is not None else 0
+            old_color = owners[sq]
+            new_color = piece // 6 if piece is not None else None
+            if old_color == new_color:
+                removed = old & ~new
+                added = new & ~old
+            else:
+                removed = old
+                added = new
+            if removed:
+                color_counts = counts[old_color]
+                while removed:
+                    low = removed & -removed
+                    target = low.bit_length() - 1
+                    removed ^= low
+                    color_counts[target] -= 1
+                    if not color_counts[target]:
+                        attacked[old_color] ^= low
+            if added:
+                color_counts = counts[new_color]
+                while added:
+                    low = added & -added
+                    target = low.bit_length() - 1
+                    added ^= low
+                    if not color_counts[target]:
+                        attacked[new_color] |= low
+                    color_counts[target] += 1
+            attacks_from[sq] = new
+            owners[sq] = new_color
+
+    def verify_attacks(self):
+        """Сверяет инкрементальные карты с полным пересчетом (режим отладки)"""
+        attacks_from, counts, attacked = self._compute_attacks()
+        assert self.attacks_from == attacks_from, "attacks_from разошлись с пересчетом"
+        assert self.attack_counts == counts, "счетчики атак разошлись с пересчетом"
+        assert self.attacked == attacked, "множества атак разошлись с пересчетом"
+        kings = [self.king_square(WHITE), self.king_square(BLACK)]
+        assert self.king_squares == kings, "клетки королей разошлись с доской"
+        assert self.check_square == self._find_check(), "клетка шаха разошлась с доской"
+        assert self.hash == self.compute_hash(), "ключ Zobrist разошелся с доской"
+        assert (self.psqt_mg, self.psqt_eg, self.phase) == self.compute_psqt(), "оценка разошлась с пересчетом"
+
+    def attackers_to(self, sq, color, occ=None):
+        """Множество фигур цвета color, атакующих клетку sq"""
+        if occ is None:
+            occ = self.occ
+        pieces = self.pieces
+        base = color * 6
+        return ((PAWN_ATTACKS[color ^ 1][sq] & pieces[base + PAWN])
+                | (KNIGHT_ATTACKS[sq] & pieces[base + KNIGHT])
+                | (KING_ATTACKS[sq] & pieces[base + KING])
+                | (bishop_attacks(sq, occ) & (pieces[base + BISHOP] | pieces[base + QUEEN]))
+                | (rook_attacks(sq, occ) & (pieces[base + ROOK] | pieces[base + QUEEN])))
+
+    def is_square_attacked(self, sq, color):
+        """Атакована ли клетка фигурами цвета color"""
+        return (self.attacked[color] >> sq) & 1 == 1
+
+    def attack_count(self, sq, color):
+        return self.attack_counts[color][sq]
+
+    def _find_check(self):
+        """Клетка короля стороны хода, если он под шахом"""
+        king = self.king_squares[self.side]
+        if king is not None and (self.attacked[self.side ^ 1] >> king) & 1:
+            return king
+        return None
+
+    def in_check(self, color=None):
+        if color is None or color == self.side:
+            return self.check_square is not None
+        king = self.king_squares[color]
+        if king is None:
+            return False
+        return self.is_square_attacked(king, color ^ 1)
+
+    def _targets(self, sq, piece):
+        """Псевдолегальные клетки назначения фигуры с клетки sq"""
+        color, kind = divmod(piece, 6)
+        own = self.occupied[color]
+        if kind == PAWN:
+            occ = self.occ
+            targets = PAWN_ATTACKS[color][sq] & self.occupied[color ^ 1]
+            step = sq - 8 if color == WHITE else sq + 8
+            if 0 <= step < 64 and not (occ >> step) & 1:
+                targets |= 1 << step
+                row = sq >> 3
+                if (color == WHITE and row == 6) or (color == BLACK and row == 1):
+                    double = step - 8 if color == WHITE else step + 8
+                    if not (occ >> double) & 1:
+                        targets |= 1 << double
+            return targets
+        if kind == KNIGHT:
+            return KNIGHT_ATTACKS[sq] & ~own
+        if kind == BISHOP:
+            return bishop_attacks(sq, self.occ) & ~own
+        if kind == ROOK:
+            return rook_attacks(sq, self.occ) & ~own
+        if kind == QUEEN:
+            return queen_attacks(sq, self.occ) & ~own
+        return KING_ATTACKS[sq] & ~own
+
+    def pins(self, color, king_sq):
+        """Абсолютно связанные фигуры цвета color: клетка -> луч от короля
+        до связывающей фигуры включительно, вдоль которого им можно ходить"""
+        pins = {}
+        pieces = self.pieces
+        base = (color ^ 1) * 6
+        queens = pieces[base + QUEEN]
+        snipers = ((rook_attacks(king_sq, 0) & (pieces[base + ROOK] | queens))
+                   | (bishop_attacks(king_sq, 0) & (pieces[base + BISHOP] | queens)))
+        occ = self.occ
+        own = self.occupied[color]
+        while snipers:
+            low = snipers & -snipers
+            snipers ^= low
+            between = BETWEEN[king_sq][low.bit_length() - 1]
+            blockers = between & occ
+            # Связка - ровно одна фигура между королем и дальнобойщиком, и она своя
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pins[blockers.bit_length() - 1] = between | low
+        return pins
+
+    def _generate(self, color, from_mask, to_mask=FULL):
+        """Легальные ходы фигур цвета color с клеток from_mask на клетки to_mask.
+        Шахующие и связанные фигуры находятся один раз на позицию, поэтому
+        ходы сразу получаются легальными, без пробного хода для каждого.
+        Взятие на проходе проверяется по клетке взятой пешки: оно попадает
+        в результат, если в to_mask есть она или клетка, куда встает пешка."""
+        moves = []
+        pieces = self.pieces
+        squares = self.squares
+        own = self.occupied[color] & from_mask
+        promoting = pieces[color * 6 + PAWN] & PROMOTION_FROM[color]
+        king = pieces[color * 6 + KING]
+        if not king:
+            # Без короля (учебные позиции) все псевдолегальные ходы легальны
+            for sq in iter_bits(own):
+                targets = self._targets(sq, squares[sq]) & to_mask
+                self._add_moves(moves, sq, targets, (promoting >> sq) & 1)
+            return moves
+
+        king_sq = self.king_squares[color]
+        them = color ^ 1
+        danger = self.attacked[them]
+        if (danger >> king_sq) & 1:
+            checkers = self.attackers_to(king_sq, them)
+        else:
+            checkers = 0
+
+        if own & king:
+            own ^= king
+            # Карта атак построена с королем на месте, а он заслоняет луч
+            # шахующего дальнобойщика: клетки за королем тоже под боем
+            sliders = checkers & ~(self.pieces[them * 6 + PAWN] | self.pieces[them * 6 + KNIGHT])
+            if sliders:
+                occ = self.occ ^ king
+                for sq in iter_bits(sliders):
+                    danger |= piece_attacks(self.squares[sq], sq, occ)
+            targets = KING_ATTACKS[king_sq] & ~self.occupied[color] & ~danger & to_mask
+            while targets:
+                low = targets & -targets
+                moves.append(king_sq | ((low.bit_length() - 1) << 6))
+                targets ^= low
+            if self.castling and not checkers:
+                occ = self.occ
+                for king_from, king_to, right, between in CASTLING_MOVES[color]:
+                    # Король не проходит через битые клетки и не встает на них
+                    if (self.castling & right and king_from == king_sq and not occ & between
+                            and not danger & (BETWEEN[king_from][king_to] | (1 << king_to))
+                            and (to_mask >> king_to) & 1):
+                        moves.append(king_from | (king_to << 6))
+
+        if checkers & (checkers - 1):
+            # Двойной шах: ходит только король
+            return moves
+        if checkers:
+            # Простой шах: взять шахующую фигуру или закрыться
+            evasions = BETWEEN[king_sq][checkers.bit_length() - 1] | checkers
+        else:
+            evasions = FULL
+        evasions &= to_mask
+        pins = self.pins(color, king_sq) if own else {}
+
+        while own:
+            low = own & -own
+            sq = low.bit_length() - 1
+            own ^= low
+            targets = self._targets(sq, squares[sq]) & evasions
+            ray = pins.get(sq)
+            if ray is not None:
+                targets &= ray
+            if low & promoting:
+                self._add_moves(moves, sq, targets, True)
+                continue
+            while targets:
+                low = targets & -targets
+                moves.append(sq | ((low.bit_length() - 1) << 6))
+                targets ^= low
+
+        if self.ep is not None:
+            self._add_en_passant(moves, color, from_mask, to_mask, king_sq)
+        return moves
+
+    def _add_moves(self, moves, sq, targets, promote):
+        for to in iter_bits(targets):
+            if promote:
+                for kind in PROMOTIONS:
+                    moves.append(sq | (to << 6) | (kind << 12))
+            else:
+                moves.append(sq | (to << 6))
+
+    def _add_en_passant(self, moves, color, from_mask, to_mask, king_sq):
+        """Взятия на проходе. Легальность проверяется прямо по доске после
+        хода: обе пешки уходят с горизонтали, и связку по ней через карту
+        связок не увидеть"""
+        ep = self.ep
+        captured_sq = ep + 8 if color == WHITE else ep - 8
+        if not (to_mask >> ep) & 1 and not (to_mask >> captured_sq) & 1:
+            return
+        pawns = PAWN_ATTACKS[color ^ 1][ep] & self.pieces[color * 6 + PAWN] & from_mask
+        for sq in iter_bits(pawns):
+            occ = (self.occ ^ (1 << sq) ^ (1 << captured_sq)) | (1 << ep)
+            if not self.attackers_to(king_sq, color ^ 1, occ) & occ:
+                moves.append(sq | (ep << 6))
+
+    def legal_moves_from(self, sq):
+        """Легальные ходы фигуры с клетки sq"""
+        piece = self.squares[sq]
+        if piece is None:
+            return []
+        return self._generate(piece // 6, 1 << sq)
+
+    def legal_moves(self, color=None):
+        """Все легальные ходы стороны color (по умолчанию - стороны хода)"""
+        if color is None:
+            color = self.side
+        return self._generate(color, FULL)
+
+    def legal_captures(self):
+        """Легальные взятия и превращения в ферзя стороны хода"""
+        side = self.side
+        moves = self._generate(side, FULL, self.occupied[side ^ 1])
+        pawns = self.pieces[side * 6 + PAWN] & PROMOTION_FROM[side]
+        if pawns:
+            moves += self._generate(side, pawns, FULL & ~self.occ)
+            moves = [move for move in moves if move >> 12 in (0, QUEEN)]
+        return moves
+
+    def has_legal_moves(self, color=None):
+        return bool(self.legal_moves(color))
+
+    def make_move(self, move):
+        """Делает ход на месте и кладет запись для отмены в стек.
+        Никаких копий доски: меняются только битборды и список клеток."""
+        frm = move & 63
+        to = (move >> 6) & 63
+        promotion = move >> 12
+        squares = self.squares
+        pieces = self.pieces
+        occupied = self.occupied
+        piece = squares[frm]
+        color = piece // 6
+        kind = piece % 6
+        captured = squares[to]
+        captured_sq = to
+        if kind == PAWN and to == self.ep:
+            # Взятие на проходе: пешка стоит позади клетки хода
+            captured_sq = to + 8 if color == WHITE else to - 8
+            captured = squares[captured_sq]
+        self.history.append((move, captured, self.check_square, self.hash,
+                             self.psqt_mg, self.psqt_eg, self.phase, self.castling, self.ep))
+
+        from_bit = 1 << frm
+        to_bit = 1 << to
+        changed = from_bit | to_bit
+        placed = color * 6 + promotion if promotion else piece
+        h = self.hash ^ ZOBRIST_SIDE ^ ZOBRIST_PIECES[piece][frm] ^ ZOBRIST_PIECES[placed][to]
+        self.psqt_mg += PSQT_MG[placed][to] - PSQT_MG[piece][frm]
+        self.psqt_eg += PSQT_EG[placed][to] - PSQT_EG[piece][frm]
+        if promotion:
+            self.phase += PHASE_WEIGHTS[promotion]
+        if captured is not None:
+            captured_bit = 1 << captured_sq
+            pieces[captured] ^= captured_bit
+            occupied[captured // 6] ^= captured_bit
+            h ^= ZOBRIST_PIECES[captured][captured_sq]
+            self.psqt_mg -= PSQT_MG[captured][captured_sq]
+            self.psqt_eg -= PSQT_EG[captured][captured_sq]
+            self.phase -= PHASE_WEIGHTS[captured % 6]
+            if captured_sq != to:
+                squares[captured_sq] = None
+                changed |= captured_bit
+        pieces[piece] ^= from_bit
+        pieces[placed] ^= to_bit
+        occupied[color] ^= from_bit | to_bit
+        squares[frm] = None
+        squares[to] = placed
+        if kind == KING:
+            self.king_squares[color] = to
+            if to - frm == 2 or frm - to == 2:
+                # Рокировка: ладья перепрыгивает через короля
+                rook_from, rook_to = CASTLING_ROOKS[to]
+                rook = color * 6 + ROOK
+                rook_bits = (1 << rook_from) | (1 << rook_to)
+                pieces[rook] ^= rook_bits
+                occupied[color] ^= rook_bits
+                squares[rook_from] = None
+                squares[rook_to] = rook
+                h ^= ZOBRIST_PIECES[rook][rook_from] ^ ZOBRIST_PIECES[rook][rook_to]
+                self.psqt_mg += PSQT_MG[rook][rook_to] - PSQT_MG[rook][rook_from]
+                self.psqt_eg += PSQT_EG[rook][rook_to] - PSQT_EG[rook][rook_from]
+                changed |= rook_bits
+
+        castling = self.castling & CASTLING_MASK[frm] & CASTLING_MASK[to]
+        if castling != self.castling:
+            h ^= ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_CASTLING[castling]
+            self.castling = castling
+        if self.ep is not None:
+            h ^= ZOBRIST_EP[self.ep & 7]
+            self.ep = None
+        if kind == PAWN and (to - frm == 16 or frm - to == 16):
+            self.ep = (frm + to) >> 1
+            h ^= ZOBRIST_EP[self.ep & 7]
+        self.hash = h
+        self.occ = occupied[0] | occupied[1]
+
+        self._update_attacks(changed, self.occ & ~changed)
+        self.side ^= 1
+        self.check_square = self._find_check()
+        if self.debug:
+            self.verify_attacks()
+
+    def make_null_move(self):
+        """Пропуск хода для null-move pruning: меняется только сторона хода
+        (и пропадает взятие на проходе). Отменяется тем же unmake_move.
+        Под шахом не вызывается."""
+        self.history.append((None, None, self.check_square, self.hash,
+                             self.psqt_mg, self.psqt_eg, self.phase, self.castling, self.ep))
+        self.hash ^= ZOBRIST_SIDE
+        if self.ep is not None:
+            self.hash ^= ZOBRIST_EP[self.ep & 7]
+            self.ep = None
+        self.side ^= 1
+        self.check_square = None
+
+    def unmake_move(self):
+        """Отменяет последний ход из стека"""
+        (move, captured, check_square, self.hash, self.psqt_mg, self.psqt_eg, self.phase,
+         self.castling, self.ep) = self.history.pop()
+        if move is None:
+            self.side ^= 1
+            self.check_square = check_square
+            return
+        frm = move & 63
+        to = (move >> 6) & 63
+        squares = self.squares
+        pieces = self.pieces
+        occupied = self.occupied
+        placed = squares[to]
+        color = placed // 6
+        piece = color * 6 + PAWN if move >> 12 else placed
+
+        from_bit = 1 << frm
+        to_bit = 1 << to
+        changed = from_bit | to_bit
+        pieces[placed] ^= to_bit
+        pieces[piece] ^= from_bit
+        occupied[color] ^= from_bit | to_bit
+        squares[frm] = piece
+        squares[to] = None
+        if captured is not None:
+            captured_sq = to
+            if piece % 6 == PAWN and to == self.ep:
+                captured_sq = to + 8 if color == WHITE else to - 8
+                changed |= 1 << captured_sq
+            pieces[captured] ^= 1 << captured_sq
+            occupied[captured // 6] ^= 1 << captured_sq
+            squares[captured_sq] = captured
+        if piece % 6 == KING:
+            self.king_squares[color] = frm
+            if to - frm == 2 or frm - to == 2:
+                rook_from, rook_to = CASTLING_ROOKS[to]
+                rook = color * 6 + ROOK
+                rook_bits = (1 << rook_from) | (1 << rook_to)
+                pieces[rook] ^= rook_bits
+                occupied[color] ^= rook_bits
+                squares[rook_to] = None
+                squares[rook_from] = rook
+                changed |= rook_bits
+        self.occ = occupied[0] | occupied[1]
+
+        self._update_attacks(changed, self.occ & ~changed)
+        self.side ^= 1
+        self.check_square = check_square
+        if self.debug:
+            self.verify_attacks()
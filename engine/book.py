@@ -0,0 +1,247 @@
+"""Дебютная книга в двоичном формате по образцу Polyglot.
+
+Файл - отсортированные по ключу записи по 16 байт, big-endian:
+    ключ Zobrist позиции (8 байт), ход (2), вес (2), резерв (4)
+Ключ - Position.hash, ход - тот же 16-битный ход, что у движка, поэтому
+файлы настоящего Polyglot сюда не подходят, но устройство то же.
+
+Книга открывается через mmap и ищется двоичным поиском прямо в файле, в
+память целиком не читается. Построить книгу из партий:
+
+    python -m engine.book build партии/ -o book.bin [--max-ply 24] [--min-games 2]
+    python -m engine.book show book.bin [e2e4 e7e5 ...]
+"""
+
+import argparse
+import mmap
+import os
+import random
+import re
+import struct
+import sys
+import time
+
+from engine.bitboard import Position, START_BOARD, move_name
+
+ENTRY = struct.Struct('>QHHI')
+KEY = struct.Struct('>Q')
+MAX_WEIGHT = 0xFFFF
+
+
+class OpeningBook:
+    """Дебютная книга только для чтения"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self.entries = size // ENTRY.size
+        # mmap пустого файла создать нельзя
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _first(self, key):
+        """Номер первой записи с ключом не меньше key"""
+        lo, hi = 0, self.entries
+        data = self._map
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if KEY.unpack_from(data, mid * ENTRY.size)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def probe(self, key):
+        """Ходы книги для позиции с ключом key: список (ход, вес)"""
+        if self._map is None:
+            return []
+        moves = []
+        index = self._first(key)
+        while index < self.entries:
+            entry_key, move, weight, _ = ENTRY.unpack_from(self._map, index * ENTRY.size)
+            if entry_key != key:
+                break
+            moves.append((move, weight))
+            index += 1
+        return moves
+
+    def choose(self, position, rng=random):
+        """Случайный ход книги с вероятностью по весу или None.
+        Ходы, нелегальные в позиции (коллизия ключей), пропускаются."""
+        candidates = self.probe(position.hash)
+        if not candidates:
+            return None
+        legal = set(position.legal_moves())
+        candidates = [(move, weight) for move, weight in candidates if move in legal and weight > 0]
+        if not candidates:
+            return None
+        pick = rng.randrange(sum(weight for _, weight in candidates))
+        for move, weight in candidates:
+            pick -= weight
+            if pick < 0:
+                return move
+        return candidates[-1][0]
+
+
+_books = {}
+
+
+def get_book(path):
+    """Книга, открытая один раз на процесс, или None, если файла нет"""
+    if path not in _books:
+        _books[path] = OpeningBook(path) if os.path.exists(path) else None
+    return _books[path]
+
+
+# Разбор PGN: комментарии, варианты, номера ходов и оценки ходов отбрасываются
+_PGN_COMMENTS = re.compile(r'\{[^}]*\}|;[^\n]*')
+_PGN_NOISE = re.compile(r'\$\d+|\d+\.(\.\.)?')
+_RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+
+
+def _strip_variations(text):
+    depth = 0
+    out = []
+    for ch in text:
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth = max(0, depth - 1)
+        elif depth == 0:
+            out.append(ch)
+    return ''.join(out)
+
+
+def read_pgn(path):
+    """Партии из файла PGN по одной: (заголовки, список ходов в записи SAN)"""
+    headers = {}
+    movetext = []
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('['):
+                if movetext:
+                    yield headers, _san_tokens('\n'.join(movetext))
+                    headers, movetext = {}, []
+                match = re.match(r'\[(\w+)\s+"(.*)"\]', line)
+                if match:
+                    headers[match.group(1)] = match.group(2)
+            elif line:
+                movetext.append(line)
+    if movetext:
+        # Строки склеиваются через перевод строки: комментарий ; - до конца строки
+        yield headers, _san_tokens('\n'.join(movetext))
+
+
+def _san_tokens(text):
+    # Сначала комментарии: скобка внутри комментария - не начало варианта
+    text = _strip_variations(_PGN_COMMENTS.sub(' ', text))
+    text = _PGN_NOISE.sub(' ', text)
+    return [token for token in text.split() if token not in _RESULTS]
+
+
+def pgn_files(paths):
+    """Файлы .pgn из списка файлов и каталогов"""
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith('.pgn'):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def build_book(paths, out_path, max_ply=24, min_games=1):
+    """Собирает книгу из партий PGN. Вес хода - очки стороны, которая его
+    сделала: 2 за победу, 1 за ничью (как в Polyglot). Возвращает статистику."""
+    # (ключ, ход) -> [партий, очков]
+    counts = {}
+    games = skipped = 0
+    for path in pgn_files(paths):
+        for headers, tokens in read_pgn(path):
+            if headers.get('SetUp') == '1' or 'FEN' in headers:
+                # Партии не из начальной позиции
+                skipped += 1
+                continue
+            result = headers.get('Result', '*')
+            points = {'1-0': (2, 0), '0-1': (0, 2)}.get(result, (1, 1))
+            games += 1
+            position = Position(START_BOARD)
+            for san in tokens[:max_ply]:
+                move = position.parse_san(san)
+                if move is None:
+                    # Ход, которого генератор не знает, или ошибка в записи
+                    break
+                entry = counts.setdefault((position.hash, move), [0, 0])
+                entry[0] += 1
+                entry[1] += points[position.side]
+                position.make_move(move)
+
+    entries = [(key, move, points) for (key, move), (played, points) in counts.items()
+               if played >= min_games and points > 0]
+    top = max((points for _, _, points in entries), default=0)
+    scale = max(1, -(-top // MAX_WEIGHT))
+    entries.sort()
+    with open(out_path, 'wb') as f:
+        for key, move, points in entries:
+            f.write(ENTRY.pack(key, move, max(1, points // scale), 0))
+    return {'games': games, 'skipped': skipped, 'entries': len(entries)}
+
+
+def _position_after(moves):
+    position = Position(START_BOARD)
+    for text in moves:
+        move = position.parse_move(text)
+        if move is None:
+            raise ValueError(f"Нелегальный ход {text}")
+        position.make_move(move)
+    return position
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Дебютная книга")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="собрать книгу из файлов или каталогов PGN")
+    build.add_argument("pgn", nargs="+")
+    build.add_argument("-o", "--output", default="book.bin")
+    build.add_argument("--max-ply", type=int, default=24)
+    build.add_argument("--min-games", type=int, default=1)
+    show = commands.add_parser("show", help="ходы книги в позиции после ходов вида e2e4")
+    show.add_argument("book")
+    show.add_argument("moves", nargs="*")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        stats = build_book(args.pgn, args.output, args.max_ply, args.min_games)
+        print(f"Партий: {stats['games']}, пропущено: {stats['skipped']}, записей: {stats['entries']}")
+        return True
+
+    position = _position_after(args.moves)
+    with OpeningBook(args.book) as book:
+        moves = book.probe(position.hash)
+        total = sum(weight for _, weight in moves) or 1
+        for move, weight in sorted(moves, key=lambda m: -m[1]):
+            print(f"{move_name(move)}  вес {weight:5}  {weight / total:.0%}")
+        repeats = 10000
+        start = time.perf_counter()
+        for _ in range(repeats):
+            book.probe(position.hash)
+        elapsed = time.perf_counter() - start
+        print(f"Записей в книге: {book.entries}, поиск: {elapsed / repeats * 1e6:.1f} мкс")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
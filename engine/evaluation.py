@@ -0,0 +1,52 @@
+"""Оценка позиции: материал и таблицы положения фигур с плавным переходом
+от миттельшпиля к эндшпилю по стадии партии.
+
+Суммы таблиц и стадию ведет сама Position в make_move/unmake_move, поэтому
+evaluate() не обходит доску. evaluate_full() считает то же самое с нуля и
+нужна для сверки.
+"""
+
+from engine.bitboard import BISHOP, BLACK, WHITE
+from engine.psqt import PHASE_WEIGHTS, PIECE_VALUES, PSQT_EG, PSQT_MG, TOTAL_PHASE
+
+# Пара слонов - единственный позиционный член сверх таблиц
+BISHOP_PAIR = 30
+
+
+def _blend(mg, eg, phase):
+    phase = min(phase, TOTAL_PHASE)
+    return (mg * phase + eg * (TOTAL_PHASE - phase)) // TOTAL_PHASE
+
+
+def _positional(position):
+    """Позиционные члены с точки зрения белых"""
+    score = 0
+    pieces = position.pieces
+    white_bishops = pieces[WHITE * 6 + BISHOP]
+    black_bishops = pieces[BLACK * 6 + BISHOP]
+    if white_bishops & (white_bishops - 1):
+        score += BISHOP_PAIR
+    if black_bishops & (black_bishops - 1):
+        score -= BISHOP_PAIR
+    return score
+
+
+def evaluate(position):
+    """Оценка в сантипешках с точки зрения стороны, которая ходит"""
+    score = _blend(position.psqt_mg, position.psqt_eg, position.phase) + _positional(position)
+    return score if position.side == WHITE else -score
+
+
+def evaluate_full(position):
+    """То же, что evaluate(), но с обходом всех фигур - для сверки"""
+    mg = eg = phase = 0
+    for piece, bb in enumerate(position.pieces):
+        while bb:
+            low = bb & -bb
+            sq = low.bit_length() - 1
+            mg += PSQT_MG[piece][sq]
+            eg += PSQT_EG[piece][sq]
+            phase += PHASE_WEIGHTS[piece % 6]
+            bb ^= low
+    score = _blend(mg, eg, phase) + _positional(position)
+    return score if position.side == WHITE else -score
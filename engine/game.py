@@ -0,0 +1,197 @@
+"""Партия без интерфейса: позиция, ходы по клеткам доски, запись партии
+и конец игры.
+
+Окно, выбор фигуры, анимация, таймер и бот - в ChessGame (main.py), которая
+строится поверх этого класса. Здесь нет pygame, поэтому правила можно
+использовать на сервере и в процессах-воркерах.
+"""
+
+from datetime import datetime
+
+from engine.bitboard import (COLOR_CODES, COLOR_NAMES, QUEEN, Position, START_BOARD,
+                             encode_move, move_from, move_to)
+
+
+class Game:
+    """Правила и состояние партии. Клетки - (строка, столбец), строка 0 -
+    восьмая горизонталь, как в списке board.
+
+    tablebases - эндшпильные таблицы (engine.tablebase), по которым партия
+    без материала для мата заканчивается ничьей; без них - только мат и пат.
+    fen - начальная позиция в записи FEN вместо обычной расстановки.
+    """
+
+    def __init__(self, debug=False, tablebases=None, fen=None):
+        # Позиция хранится в битбордах, а список строк - только вид для отрисовки.
+        # debug=True сверяет карты атак с полным пересчетом после каждого хода
+        self.debug = debug
+        self.tablebases = tablebases
+        # Ходы текущей позиции: (ключ позиции, {клетка откуда: [(строка, столбец), ...]})
+        self.move_table = None
+        if fen:
+            self.load_fen(fen)
+        else:
+            self._start(Position(START_BOARD, debug=debug))
+
+    def _start(self, position, halfmove=0, fullmove=1):
+        self.position = position
+        self.board = position.to_board()
+        self.game_over = False
+        self.winner = None
+        self.draw_reason = None  # 'пат' или 'недостаточно материала'
+        self.move_history = []
+        self.check_position = None  # Позиция короля под шахом
+        # Счетчики для FEN: полуходы без взятий и ходов пешкой, номер хода
+        self.halfmove_clock = halfmove
+        self.fullmove_number = fullmove
+        self._update_status()
+
+    def load_fen(self, fen):
+        """Начинает партию с позиции в записи FEN. Неверная запись - ValueError,
+        текущая партия тогда не меняется"""
+        position = Position.from_fen(fen, debug=self.debug)
+        try:
+            position.validate()
+        except ValueError as e:
+            raise ValueError(f"{e}: {fen}")
+        fields = fen.split()
+        try:
+            halfmove = int(fields[4]) if len(fields) > 4 else 0
+            fullmove = int(fields[5]) if len(fields) > 5 else 1
+        except ValueError:
+            raise ValueError(f"Неверный FEN: {fen}")
+        self._start(position, halfmove, max(1, fullmove))
+
+    def to_fen(self):
+        """Текущая позиция в записи FEN со счетчиками ходов"""
+        return self.position.to_fen(self.halfmove_clock, self.fullmove_number)
+
+    @property
+    def current_player(self):
+        # Очередь хода хранит позиция, чтобы она не расходилась с доской
+        return COLOR_NAMES[self.position.side]
+
+    def get_piece(self, row, col):
+        if 0 <= row < 8 and 0 <= col < 8:
+            return self.board[row][col]
+        return None
+
+    def find_king(self, color):
+        """Находит позицию короля указанного цвета"""
+        sq = self.position.king_squares[COLOR_CODES[color]]
+        if sq is None:
+            return None
+        return divmod(sq, 8)
+
+    def is_square_attacked(self, row, col, attacker_color):
+        """Проверяет, атакована ли клетка фигурами указанного цвета"""
+        return self.position.is_square_attacked(row * 8 + col, COLOR_CODES[attacker_color])
+
+    def is_in_check(self, color):
+        """Проверяет, находится ли король указанного цвета под шахом"""
+        return self.position.in_check(COLOR_CODES[color])
+
+    def legal_move_table(self):
+        """Все легальные ходы текущей позиции, сгруппированные по клетке откуда.
+        Считаются один раз на позицию; хранится только таблица текущей позиции,
+        поэтому кэш не растет за партию"""
+        key = self.position.key()
+        if self.move_table is None or self.move_table[0] != key:
+            table = {}
+            for move in self.position.legal_moves():
+                target = divmod(move_to(move), 8)
+                targets = table.setdefault(move_from(move), [])
+                # Четыре превращения - одна клетка на доске
+                if target not in targets:
+                    targets.append(target)
+            self.move_table = (key, table)
+        return self.move_table[1]
+
+    def has_legal_moves(self, color):
+        if color == self.current_player:
+            return bool(self.legal_move_table())
+        return self.position.has_legal_moves(COLOR_CODES[color])
+
+    def is_checkmate(self, color):
+        """Проверяет, является ли позиция матом для указанного цвета"""
+        # Мат - шах, от которого нет ни одного легального хода
+        return self.is_in_check(color) and not self.has_legal_moves(color)
+
+    def is_stalemate(self, color):
+        """Проверяет, является ли позиция патом для указанного цвета"""
+        # Пат - нет легальных ходов, но и шаха нет
+        return not self.is_in_check(color) and not self.has_legal_moves(color)
+
+    def calculate_valid_moves(self, row, col):
+        piece = self.get_piece(row, col)
+        if piece and piece.startswith(self.current_player):
+            return self.legal_move_table().get(row * 8 + col, [])
+        # Фигуры стороны, которая сейчас не ходит, в таблицу не попадают
+        return [divmod(move_to(move), 8) for move in self.position.legal_moves_from(row * 8 + col)]
+
+    def _en_passant_victim(self, piece, to_row, to_col):
+        """Пешка, которую бьют на проходе: стоит рядом с ходящей, а не на
+        клетке, куда та идет"""
+        if piece.endswith('pawn') and self.position.ep == to_row * 8 + to_col:
+            return self.get_piece(to_row + 1 if piece.startswith('white') else to_row - 1, to_col)
+        return None
+
+    def play(self, from_row, from_col, to_row, to_col, promotion=QUEEN):
+        """Делает ход, если он легален, и проверяет конец партии. Пешка на
+        последней горизонтали превращается в promotion (тип фигуры).
+        Возвращает запись хода или None; после конца партии ходы не принимаются"""
+        if self.game_over:
+            return None
+        piece = self.get_piece(from_row, from_col)
+        if not piece or (to_row, to_col) not in self.legal_move_table().get(from_row * 8 + from_col, []):
+            return None
+
+        # Запись хода в историю
+        move_info = {
+            'piece': piece,
+            'from': (from_row, from_col),
+            'to': (to_row, to_col),
+            'captured': self.get_piece(to_row, to_col) or self._en_passant_victim(piece, to_row, to_col),
+            'player': self.current_player,
+            'time': datetime.now().strftime("%H:%M:%S")
+        }
+        self.move_history.append(move_info)
+
+        # Фактическое перемещение фигуры (ход передается сопернику)
+        if not piece.endswith('pawn') or to_row not in (0, 7):
+            promotion = 0
+        move = encode_move(from_row * 8 + from_col, to_row * 8 + to_col, promotion)
+        if piece.endswith('pawn') or self.position.is_capture(move):
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if self.current_player == 'black':
+            self.fullmove_number += 1
+        self.position.make_move(move)
+        self.board = self.position.to_board()
+        self._update_status()
+        return move_info
+
+    def _update_status(self):
+        """Шах, мат, пат и ничья по материалу для стороны, которая ходит"""
+        player = self.current_player
+        opponent = 'black' if player == 'white' else 'white'
+
+        # Клетку короля под шахом позиция считает сама при ходе
+        check_square = self.position.check_square
+        self.check_position = divmod(check_square, 8) if check_square is not None else None
+
+        # Проверяем мат
+        if self.is_checkmate(player):
+            self.game_over = True
+            self.winner = opponent
+        # Проверяем пат
+        elif self.is_stalemate(player):
+            self.game_over = True
+            self.winner = None  # Ничья
+            self.draw_reason = 'пат'
+        # Мат невозможен ни одной стороне (голые короли, король с легкой фигурой)
+        elif self.tablebases and self.tablebases.is_dead(self.position):
+            self.game_over = True
+            self.winner = None
+            self.draw_reason = 'недостаточно материала'
@@ -0,0 +1,126 @@
+"""Порядок ходов для альфа-бета поиска.
+
+Чем раньше в узле встречается ход, дающий отсечение, тем меньше дерево.
+Ходы сортируются по баллам:
+    ход из таблицы транспозиций
+    взятия по MVV-LVA: самая ценная жертва, затем самый дешевый нападающий
+    ходы-убийцы - тихие ходы, давшие отсечение на той же глубине от корня
+    остальные тихие ходы по таблице истории (откуда, куда)
+Превращения сортируются вместе со взятиями.
+"""
+
+from engine.bitboard import PAWN
+
+TT_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 24
+KILLER_SCORE = 1 << 20
+# История делится пополам, когда счетчик доходит до предела, чтобы не
+# догнать убийц и взятия
+HISTORY_LIMIT = KILLER_SCORE - 1
+
+# Стоимость фигур только для сортировки: пешка, конь, слон, ладья, ферзь, король
+ORDER_VALUES = (1, 3, 3, 5, 9, 20)
+
+
+class MoveOrderer:
+    """Баллы ходов, ходы-убийцы, таблица истории и статистика отсечений"""
+
+    KILLERS = 2
+
+    def __init__(self, max_ply=64):
+        self.max_ply = max_ply
+        self.killers = [[None] * self.KILLERS for _ in range(max_ply + 1)]
+        self.history = [0] * (64 * 64)
+        self.reset_stats()
+
+    def clear(self):
+        """Новая партия: забываем убийц и историю"""
+        self.killers = [[None] * self.KILLERS for _ in range(self.max_ply + 1)]
+        self.history = [0] * (64 * 64)
+
+    def new_search(self):
+        """Новый поиск: убийцы относятся к старому дереву, историю старим"""
+        for killers in self.killers:
+            for i in range(self.KILLERS):
+                killers[i] = None
+        self.history = [value >> 3 for value in self.history]
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.nodes = 0
+        self.cutoffs = 0
+        self.first_cutoffs = 0
+        self.cutoff_index_sum = 0
+        self.tt_move_cutoffs = 0
+        self.capture_cutoffs = 0
+        self.killer_cutoffs = 0
+        self.quiet_cutoffs = 0
+
+    def order(self, position, moves, ply, tt_move=None):
+        """Сортирует список ходов на месте, лучшие первыми"""
+        self.nodes += 1
+        squares = position.squares
+        killers = self.killers[ply]
+        history = self.history
+        scores = {}
+        for move in moves:
+            if move == tt_move:
+                scores[move] = TT_MOVE_SCORE
+                continue
+            victim = squares[(move >> 6) & 63]
+            if victim is not None:
+                scores[move] = (CAPTURE_SCORE + ORDER_VALUES[victim % 6] * 64
+                                - ORDER_VALUES[squares[move & 63] % 6])
+            elif move >> 12:
+                # Тихое превращение - как взятие фигуры, в которую превращаемся
+                scores[move] = CAPTURE_SCORE + ORDER_VALUES[move >> 12] * 64 - ORDER_VALUES[PAWN]
+            elif position.ep is not None and position.is_capture(move):
+                # Взятие на проходе: пешка берет пешку
+                scores[move] = CAPTURE_SCORE + ORDER_VALUES[PAWN] * 64 - ORDER_VALUES[PAWN]
+            elif move in killers:
+                scores[move] = KILLER_SCORE - killers.index(move)
+            else:
+                scores[move] = history[move & 0xFFF]
+        moves.sort(key=scores.__getitem__, reverse=True)
+        return moves
+
+    def cutoff(self, position, move, ply, depth, index, tt_move=None):
+        """Ход move дал отсечение; index - его номер в порядке перебора.
+        position - позиция до хода"""
+        self.cutoffs += 1
+        self.cutoff_index_sum += index
+        if index == 0:
+            self.first_cutoffs += 1
+        capture = move >> 12 or position.is_capture(move)
+        killers = self.killers[ply]
+        if move == tt_move:
+            self.tt_move_cutoffs += 1
+        elif capture:
+            self.capture_cutoffs += 1
+        elif move in killers:
+            self.killer_cutoffs += 1
+        else:
+            self.quiet_cutoffs += 1
+        if capture:
+            return
+        if move not in killers:
+            killers.pop()
+            killers.insert(0, move)
+        history = self.history
+        key = move & 0xFFF
+        history[key] += depth * depth
+        if history[key] > HISTORY_LIMIT:
+            self.history = [value >> 1 for value in history]
+
+    def stats(self):
+        cutoffs = self.cutoffs or 1
+        return {
+            'nodes': self.nodes,
+            'cutoffs': self.cutoffs,
+            'first_cutoff_rate': self.first_cutoffs / cutoffs,
+            'average_cutoff_index': self.cutoff_index_sum / cutoffs,
+            'tt_move_cutoffs': self.tt_move_cutoffs,
+            'capture_cutoffs': self.capture_cutoffs,
+            'killer_cutoffs': self.killer_cutoffs,
+            'quiet_cutoffs': self.quiet_cutoffs,
+        }
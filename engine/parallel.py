@@ -0,0 +1,161 @@
+"""Параллельный поиск на пуле процессов с разделением корневых ходов.
+
+На каждой итерации первый (лучший по прошлой итерации) корневой ход
+считается в главном процессе полным окном, а остальные раздаются пулу с
+нулевым окном вокруг полученной оценки; ход, который окно пробил,
+пересчитывается тем же процессом полным окном. У каждого процесса своя
+таблица транспозиций, которая живет между заданиями.
+"""
+
+import atexit
+import multiprocessing
+import signal
+import time
+
+from engine.search import INFINITY, SearchAborted, Searcher
+from engine.transposition import EXACT, LOWER
+
+# Глубина, начиная с которой итерацию выгодно раздавать процессам
+PARALLEL_MIN_DEPTH = 3
+
+_pool = None
+_pool_size = 0
+_stop_event = None
+
+# Состояние внутри процесса пула
+_worker_searcher = None
+_worker_stop = None
+_worker_search_id = None
+
+
+def _init_worker(stop_event, hash_mb):
+    global _worker_searcher, _worker_stop
+    # После fork процесс наследует обработчики родителя: SDL перехватывает
+    # SIGTERM, и terminate() пула не смог бы завершить процесс. Ctrl+C
+    # обрабатывает только главный процесс.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_searcher = Searcher(hash_mb)
+    _worker_stop = stop_event
+
+
+def _search_task(search_id, position, move, depth, alpha, beta, movetime, nodes):
+    """Задание процесса пула: (оценка, pv, узлы); оценка None - прервано"""
+    global _worker_search_id
+    searcher = _worker_searcher
+    if search_id != _worker_search_id:
+        _worker_search_id = search_id
+        searcher.tt.new_search()
+        searcher.ordering.new_search()
+    searcher.set_limits(nodes, movetime, _worker_stop)
+    try:
+        score, pv = searcher.search_move(position, move, depth, alpha, beta)
+    except SearchAborted:
+        return None, [], searcher.nodes
+    return score, pv, searcher.nodes
+
+
+def get_pool(workers, hash_mb=16):
+    """Общий на весь процесс пул: создается один раз и переиспользуется"""
+    global _pool, _pool_size, _stop_event
+    if _pool is not None and _pool_size == workers:
+        return _pool
+    shutdown_pool()
+    _stop_event = multiprocessing.Event()
+    _pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(_stop_event, hash_mb))
+    _pool_size = workers
+    return _pool
+
+
+def shutdown_pool():
+    global _pool, _pool_size
+    if _pool is not None:
+        _pool.terminate()
+        _pool.join()
+        _pool = None
+        _pool_size = 0
+
+
+atexit.register(shutdown_pool)
+
+
+class ParallelSearcher(Searcher):
+    """Тот же интерфейс, что у Searcher, но корневые ходы считает пул процессов.
+    workers - число процессов пула"""
+
+    def __init__(self, workers=2, hash_mb=16):
+        super().__init__(hash_mb)
+        self.workers = workers
+        self.hash_mb = hash_mb
+        self._search_id = 0
+
+    def search(self, position, *args, **kwargs):
+        # Номер поиска нужен процессам, чтобы вовремя сменить поколение таблицы
+        self._search_id += 1
+        return super().search(position, *args, **kwargs)
+
+    def _remaining(self, tasks=1):
+        """Остаток бюджета для каждого из tasks заданий: (секунды, узлы).
+        Время у заданий общее, а узлы делятся поровну, чтобы вместе они не
+        вышли за лимит"""
+        movetime = None
+        if self.deadline is not None:
+            movetime = max(0.001, self.deadline - time.perf_counter())
+        nodes = None
+        if self.node_limit is not None:
+            nodes = max(1, (self.node_limit - self.nodes) // tasks)
+        return movetime, nodes
+
+    def _search_root(self, position, moves, depth, alpha=-INFINITY, beta=INFINITY):
+        if depth < PARALLEL_MIN_DEPTH or len(moves) < 2 or self.workers < 2:
+            return super()._search_root(position, moves, depth, alpha, beta)
+
+        pool = get_pool(self.workers, self.hash_mb)
+        _stop_event.clear()
+        alpha_start = alpha
+        self._pv[0] = []
+
+        # Первый ход - полным окном здесь, чтобы получить границу для остальных
+        position.make_move(moves[0])
+        best = -self._negamax(position, depth - 1, -beta, -alpha, 1)
+        position.unmake_move()
+        best_pv = [moves[0]] + self._pv[1]
+        if best >= beta:
+            self._pv[0] = best_pv
+            self.tt.store(position.hash, depth, best, LOWER, moves[0])
+            return best
+        alpha = max(alpha, best)
+
+        movetime, nodes = self._remaining(len(moves) - 1)
+        pending = [pool.apply_async(_search_task, (self._search_id, position, move, depth, alpha, beta, movetime, nodes))
+                   for move in moves[1:]]
+        results = []
+        aborted = False
+        while pending:
+            task = pending[0]
+            task.wait(0.01)
+            if not task.ready():
+                try:
+                    self._check_limits()
+                except SearchAborted:
+                    # Останавливаем процессы и дожидаемся их, чтобы пул был свободен
+                    _stop_event.set()
+                    aborted = True
+                continue
+            pending.pop(0)
+            score, pv, nodes_done = task.get()
+            self.nodes += nodes_done
+            if score is None:
+                aborted = True
+            else:
+                results.append((score, pv))
+        if aborted:
+            raise SearchAborted()
+
+        for score, pv in results:
+            if score > best:
+                best, best_pv = score, pv
+        if best > alpha_start:
+            self._pv[0] = best_pv
+            self.tt.store(position.hash, depth, best, LOWER if best >= beta else EXACT, best_pv[0])
+        return best
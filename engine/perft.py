@@ -0,0 +1,124 @@
+"""Perft: число позиций в дереве всех легальных ходов до заданной глубины.
+
+Счет сверяется с общеизвестными значениями для набора позиций, где
+встречаются все правила: рокировки, взятия на проходе, превращения, связки
+и шахи. Любое расхождение - ошибка генератора ходов или make/unmake, поэтому
+это проверка для каждой оптимизации генератора.
+
+    python -m engine.perft suite [--depth N] [--only kiwipete ...] [--debug]
+        набор позиций до глубины N (по умолчанию 3), проверка и узлов/с
+    python -m engine.perft divide "FEN" глубина
+        число позиций после каждого хода - чтобы найти, где счет разошелся
+
+С --debug каждый ход сверяет инкрементальные карты атак, ключ и оценку
+с полным пересчетом (медленно).
+"""
+
+import argparse
+import sys
+import time
+
+from engine.bitboard import Position, move_name
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+# Позиции и число узлов на глубинах 1, 2, 3...
+SUITE = (
+    ('start', START_FEN,
+     (20, 400, 8902, 197281, 4865609, 119060324)),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     (48, 2039, 97862, 4085603, 193690690)),
+    ('position3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+     (14, 191, 2812, 43238, 674624, 11030083)),
+    ('position4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     (6, 264, 9467, 422333, 15833292)),
+    ('position5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+     (44, 1486, 62379, 2103487, 89941194)),
+    ('position6', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+     (46, 2079, 89890, 3894594, 164075551)),
+)
+
+
+def perft(position, depth):
+    """Число позиций на глубине depth. Последний уровень не делает ходов:
+    легальных ходов ровно столько, сколько позиций за ними"""
+    moves = position.legal_moves()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for move in moves:
+        position.make_move(move)
+        nodes += perft(position, depth - 1)
+        position.unmake_move()
+    return nodes
+
+
+def divide(position, depth):
+    """Список (ход, число позиций после него)"""
+    result = []
+    for move in position.legal_moves():
+        position.make_move(move)
+        result.append((move, perft(position, depth - 1)))
+        position.unmake_move()
+    return result
+
+
+def run_suite(depth=3, only=None, debug=False):
+    """Набор позиций до глубины depth (или до последней известной).
+    Возвращает True, если все числа совпали"""
+    ok = True
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, expected in SUITE:
+        if only and name not in only:
+            continue
+        position = Position.from_fen(fen, debug=debug)
+        key = position.hash
+        for current in range(1, min(depth, len(expected)) + 1):
+            start = time.perf_counter()
+            nodes = perft(position, current)
+            elapsed = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += elapsed
+            good = nodes == expected[current - 1]
+            ok = ok and good
+            nps = int(nodes / elapsed) if elapsed > 0 else 0
+            status = "ok" if good else f"ОШИБКА, ожидалось {expected[current - 1]}"
+            print(f"{name:10} глубина {current}: {nodes:>10} узлов, {elapsed:7.2f} с, {nps:>8} узлов/с  {status}")
+        if position.hash != key:
+            print(f"{name}: позиция не вернулась к исходной после perft")
+            ok = False
+    if total_time > 0:
+        print(f"Всего: {total_nodes} узлов, {total_time:.2f} с, {int(total_nodes / total_time)} узлов/с")
+    print("Все числа совпали" if ok else "Есть расхождения")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft - проверка генератора ходов")
+    commands = parser.add_subparsers(dest="command", required=True)
+    suite = commands.add_parser("suite", help="набор известных позиций со сверкой")
+    suite.add_argument("--depth", type=int, default=3)
+    suite.add_argument("--only", nargs="*", help="названия позиций: " + ", ".join(name for name, _, _ in SUITE))
+    suite.add_argument("--debug", action="store_true", help="сверять карты атак после каждого хода")
+    divide_cmd = commands.add_parser("divide", help="число позиций после каждого хода")
+    divide_cmd.add_argument("fen")
+    divide_cmd.add_argument("depth", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "suite":
+        return run_suite(args.depth, args.only, args.debug)
+
+    position = Position.from_fen(args.fen)
+    start = time.perf_counter()
+    result = divide(position, args.depth)
+    elapsed = time.perf_counter() - start
+    for move, nodes in sorted(result, key=lambda item: move_name(item[0])):
+        print(f"{move_name(move)}: {nodes}")
+    total = sum(nodes for _, nodes in result)
+    print(f"Ходов: {len(result)}, позиций: {total}, {elapsed:.2f} с")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,171 @@
+"""Таблицы положения фигур для миттельшпиля и эндшпиля.
+
+Таблицы записаны с точки зрения белых в том же порядке клеток, что и доска
+(первая строка - восьмая горизонталь). Для черных клетка отражается: sq ^ 56.
+
+Модуль ничего не импортирует из движка: его читает и Position (счетчики
+оценки ведутся в make_move/unmake_move), и evaluation.
+"""
+
+# Пешка, конь, слон, ладья, ферзь, король
+PIECE_VALUES = (100, 320, 330, 500, 900, 0)
+PIECE_VALUES_EG = (120, 300, 320, 520, 940, 0)
+
+# Вклад фигур в стадию партии: 24 - все фигуры на доске, 0 - только пешки
+PHASE_WEIGHTS = (0, 1, 1, 2, 4, 0)
+TOTAL_PHASE = 24
+
+PAWN_MG = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     10,  10,  20,  30,  30,  20,  10,  10,
+      5,   5,  10,  25,  25,  10,   5,   5,
+      0,   0,   0,  20,  20,   0,   0,   0,
+      5,  -5, -10,   0,   0, -10,  -5,   5,
+      5,  10,  10, -20, -20,  10,  10,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+)
+
+# В эндшпиле проходная пешка тем ценнее, чем ближе к превращению
+PAWN_EG = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+     90,  90,  90,  90,  90,  90,  90,  90,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     30,  30,  30,  30,  30,  30,  30,  30,
+     15,  15,  15,  15,  15,  15,  15,  15,
+      5,   5,   5,   5,   5,   5,   5,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+      0,   0,   0,   0,   0,   0,   0,   0,
+)
+
+KNIGHT_MG = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+
+KNIGHT_EG = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+
+BISHOP_MG = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+)
+
+BISHOP_EG = (
+    -15, -10, -10, -10, -10, -10, -10, -15,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -15, -10, -10, -10, -10, -10, -10, -15,
+)
+
+ROOK_MG = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+      5,  10,  10,  10,  10,  10,  10,   5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+      0,   0,   0,   5,   5,   0,   0,   0,
+)
+
+ROOK_EG = (
+      5,   5,   5,   5,   5,   5,   5,   5,
+     10,  10,  10,  10,  10,  10,  10,  10,
+      0,   0,   0,   0,   0,   0,   0,   0,
+      0,   0,   0,   0,   0,   0,   0,   0,
+      0,   0,   0,   0,   0,   0,   0,   0,
+      0,   0,   0,   0,   0,   0,   0,   0,
+      0,   0,   0,   0,   0,   0,   0,   0,
+      0,   0,   0,   0,   0,   0,   0,   0,
+)
+
+QUEEN_MG = (
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+     -5,   0,   5,   5,   5,   5,   0,  -5,
+      0,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+)
+
+QUEEN_EG = (
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+    -10,   5,  10,  10,  10,  10,   5, -10,
+     -5,   5,  10,  15,  15,  10,   5,  -5,
+     -5,   5,  10,  15,  15,  10,   5,  -5,
+    -10,   5,  10,  10,  10,  10,   5, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+)
+
+# В миттельшпиле король прячется за пешками
+KING_MG = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+     20,  20,   0,   0,   0,   0,  20,  20,
+     20,  30,  10,   0,   0,  10,  30,  20,
+)
+
+# В эндшпиле король идет в центр
+KING_EG = (
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10,   0,   0, -10, -20, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -30,   0,   0,   0,   0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+)
+
+_MG_TABLES = (PAWN_MG, KNIGHT_MG, BISHOP_MG, ROOK_MG, QUEEN_MG, KING_MG)
+_EG_TABLES = (PAWN_EG, KNIGHT_EG, BISHOP_EG, ROOK_EG, QUEEN_EG, KING_EG)
+
+
+def _signed_tables(values, tables):
+    """[piece][sq] - материал плюс бонус за клетку, со знаком с точки зрения белых"""
+    result = []
+    for piece in range(12):
+        color, kind = divmod(piece, 6)
+        sign = 1 if color == 0 else -1
+        result.append(tuple(
+            sign * (values[kind] + tables[kind][sq if color == 0 else sq ^ 56])
+            for sq in range(64)
+        ))
+    return result
+
+
+PSQT_MG = _signed_tables(PIECE_VALUES, _MG_TABLES)
+PSQT_EG = _signed_tables(PIECE_VALUES_EG, _EG_TABLES)
@@ -0,0 +1,449 @@
+"""Поиск хода: негамакс с альфа-бета отсечением и итеративным углублением.
+
+Поиск работает прямо на переданной позиции через make_move/unmake_move и
+возвращает ее в исходное состояние, даже если был прерван по бюджету.
+На листьях основного поиска продолжается поиск взятий (quiescence), чтобы
+оценка не бралась посреди размена.
+
+Выборочный поиск, каждый прием отключается флагом Searcher:
+    use_null_move   - пропуск хода: если даже после него противнику не
+                      поднять оценку ниже beta, узел отсекается на меньшей
+                      глубине; не применяется под шахом и без фигур кроме пешек
+    use_lmr         - поздние тихие ходы сначала считаются на глубину меньше
+                      и пересчитываются полностью, только если улучшили alpha
+    use_aspiration  - корень ищется узким окном вокруг прошлой оценки,
+                      окно расширяется при выходе оценки за его границы
+
+Если Searcher.tablebases задан (engine.tablebase.Tablebases), позиции с
+малым числом фигур берутся из эндшпильных таблиц вместо поиска.
+"""
+
+import time
+
+from engine.bitboard import KING, PAWN, popcount
+from engine.evaluation import PIECE_VALUES, evaluate
+from engine.ordering import MoveOrderer
+from engine.see import see
+from engine.transposition import EXACT, LOWER, UPPER, TranspositionTable
+
+INFINITY = 100000
+MATE = 50000
+MAX_PLY = 64
+# Запас для delta pruning: взятие, которое даже с этим запасом не поднимает
+# оценку до alpha, в поиске взятий не рассматривается
+DELTA_MARGIN = 200
+
+# Сокращение глубины при пропуске хода и минимальная глубина для него
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_MIN_DEPTH = 3
+# Сокращаются тихие ходы начиная с этого номера в порядке перебора
+LMR_MIN_INDEX = 3
+LMR_MIN_DEPTH = 3
+# Полуширина окна на корне в сантипешках; растет вдвое при каждом промахе
+ASPIRATION_WINDOW = 50
+ASPIRATION_MIN_DEPTH = 3
+
+# Выигрыш по таблицам: ниже оценок мата, чтобы не путаться с ними в таблице
+# перестановок, и чем ближе мат, тем выше
+TABLEBASE_WIN = MATE - 2 * MAX_PLY
+
+# Уровни сложности бота: глубина, бюджет узлов и времени (секунды) на ход
+DIFFICULTY_LEVELS = {
+    'easy': {'depth': 2, 'nodes': 2000, 'movetime': 0.5},
+    'medium': {'depth': 4, 'nodes': 40000, 'movetime': 2.0},
+    'hard': {'depth': MAX_PLY, 'nodes': 400000, 'movetime': 5.0},
+}
+
+
+class SearchAborted(Exception):
+    """Кончился бюджет узлов или времени"""
+
+
+def capture_gain(squares, move):
+    """Материал, который приносит взятие или превращение. Пустая клетка
+    хода без превращения - взятие на проходе"""
+    victim = squares[(move >> 6) & 63]
+    gain = PIECE_VALUES[victim % 6] if victim is not None else PIECE_VALUES[PAWN]
+    if move >> 12:
+        gain += PIECE_VALUES[move >> 12] - PIECE_VALUES[PAWN]
+        if victim is None:
+            gain -= PIECE_VALUES[PAWN]
+    return gain
+
+
+def score_to_tt(score, ply):
+    """Оценки мата в таблице хранятся от текущего узла, а не от корня"""
+    if score >= MATE - MAX_PLY:
+        return score + ply
+    if score <= -MATE + MAX_PLY:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    if score >= MATE - MAX_PLY:
+        return score - ply
+    if score <= -MATE + MAX_PLY:
+        return score + ply
+    return score
+
+
+class Searcher:
+    """Итеративное углубление поверх негамакса.
+
+    search() возвращает словарь с лучшим ходом, оценкой, достигнутой
+    глубиной, числом узлов и скоростью, чтобы подбирать бюджеты под железо,
+    а также статистику таблицы транспозиций и порядка ходов.
+
+    use_ordering=False оставляет только ход из таблицы первым - для замеров,
+    насколько сортировка ходов уменьшает дерево. Так же выключаются приемы
+    выборочного поиска (use_null_move, use_lmr, use_aspiration).
+    """
+
+    CHECK_EVERY = 256
+
+    def __init__(self, hash_mb=16):
+        self.tt = TranspositionTable(hash_mb)
+        self.ordering = MoveOrderer(MAX_PLY)
+        self.use_ordering = True
+        self.use_null_move = True
+        self.use_lmr = True
+        self.use_aspiration = True
+        self.tablebases = None
+        self.tb_hits = 0
+        self.reset_pruning_stats()
+        self.nodes = 0
+        self.qnodes = 0
+        self.node_limit = None
+        self.deadline = None
+        self.stop_event = None
+        self._can_stop = False
+        self._next_check = 0
+        self._pv = [[] for _ in range(MAX_PLY + 1)]
+
+    def search(self, position, depth=MAX_PLY, nodes=None, movetime=None, info=None, stop=None):
+        """Ищет лучший ход для стороны, которая ходит в position.
+        info(result) вызывается после каждой завершенной итерации;
+        stop - threading.Event, по которому поиск прерывается снаружи."""
+        start = time.perf_counter()
+        self.set_limits(nodes, movetime, stop)
+        self._can_stop = False
+        self.tt.new_search()
+        self.tt.reset_stats()
+        self.ordering.new_search()
+        self.reset_pruning_stats()
+        self.tb_hits = 0
+        base = len(position.history)
+
+        result = {'move': None, 'score': 0, 'depth': 0, 'nodes': 0, 'time': 0.0, 'nps': 0, 'pv': [], 'qnodes': 0, 'tt': {}, 'ordering': {}, 'pruning': {}, 'tbhits': 0}
+        root_moves = position.legal_moves()
+        if not root_moves:
+            return result
+        if self.use_ordering:
+            self.ordering.order(position, root_moves, 0)
+
+        score = 0
+        for current_depth in range(1, min(depth, MAX_PLY) + 1):
+            try:
+                if (self.use_aspiration and current_depth >= ASPIRATION_MIN_DEPTH
+                        and abs(score) < MATE - MAX_PLY):
+                    score = self._aspiration(position, root_moves, current_depth, score)
+                else:
+                    score = self._search_root(position, root_moves, current_depth)
+            except SearchAborted:
+                # Возвращаем позицию к корню: незавершенные ходы остались в стеке
+                while len(position.history) > base:
+                    position.unmake_move()
+                break
+            pv = self._pv[0][:]
+            # Лучший ход прошлой итерации первым - так отсечения случаются раньше
+            root_moves.remove(pv[0])
+            root_moves.insert(0, pv[0])
+
+            elapsed = time.perf_counter() - start
+            result.update({
+                'move': pv[0], 'score': score, 'depth': current_depth, 'pv': pv,
+                'nodes': self.nodes, 'time': elapsed,
+                'nps': int(self.nodes / elapsed) if elapsed > 0 else 0,
+            })
+            if info:
+                info(result)
+            self._can_stop = True
+            if abs(score) >= MATE - MAX_PLY:
+                break
+            if self.deadline and time.perf_counter() >= self.deadline:
+                break
+
+        elapsed = time.perf_counter() - start
+        result['nodes'] = self.nodes
+        result['qnodes'] = self.qnodes
+        result['time'] = elapsed
+        result['nps'] = int(self.nodes / elapsed) if elapsed > 0 else 0
+        result['tt'] = self.tt.stats()
+        result['ordering'] = self.ordering.stats()
+        result['pruning'] = self.pruning_stats()
+        result['tbhits'] = self.tb_hits
+        return result
+
+    def reset_pruning_stats(self):
+        self.null_tries = 0
+        self.null_cutoffs = 0
+        self.lmr_reductions = 0
+        self.lmr_researches = 0
+        self.aspiration_researches = 0
+
+    def pruning_stats(self):
+        return {
+            'null_tries': self.null_tries,
+            'null_cutoffs': self.null_cutoffs,
+            'lmr_reductions': self.lmr_reductions,
+            'lmr_researches': self.lmr_researches,
+            'aspiration_researches': self.aspiration_researches,
+        }
+
+    def set_limits(self, nodes=None, movetime=None, stop=None):
+        """Обнуляет счетчик узлов и задает бюджет поиска"""
+        self.nodes = 0
+        self.qnodes = 0
+        self.node_limit = nodes
+        self.deadline = time.perf_counter() + movetime if movetime else None
+        self.stop_event = stop
+        self._can_stop = True
+        self._next_check = self._check_step()
+
+    def ponderhit(self, nodes=None, movetime=None, started=None):
+        """Задает бюджет поиску, который уже идет без него (раздумья в ходе
+        соперника). Время отсчитывается от started, по умолчанию - от сейчас"""
+        if started is None:
+            started = time.perf_counter()
+        self.node_limit = nodes
+        self.deadline = started + movetime if movetime else None
+
+    def search_move(self, position, move, depth, alpha, beta=INFINITY):
+        """Оценка одного корневого хода: сначала нулевым окном вокруг alpha,
+        при превышении - полным окном. Возвращает (оценка, pv).
+        Бюджет задается set_limits(); при его исчерпании - SearchAborted."""
+        base = len(position.history)
+        position.make_move(move)
+        try:
+            if alpha > -INFINITY:
+                score = -self._negamax(position, depth - 1, -alpha - 1, -alpha, 1)
+                if alpha < score < beta:
+                    score = -self._negamax(position, depth - 1, -beta, -alpha, 1)
+            else:
+                score = -self._negamax(position, depth - 1, -beta, INFINITY, 1)
+        except SearchAborted:
+            while len(position.history) > base:
+                position.unmake_move()
+            raise
+        position.unmake_move()
+        return score, [move] + self._pv[1]
+
+    def _check_step(self):
+        """Через сколько узлов снова проверять бюджет: не дальше его конца,
+        иначе маленький бюджет (доля задания в пуле) заметно превышается"""
+        left = self.node_limit - self.nodes if self.node_limit is not None else 0
+        return left if 0 < left < self.CHECK_EVERY else self.CHECK_EVERY
+
+    def _check_limits(self):
+        self._next_check = self.nodes + self._check_step()
+        if self.stop_event is not None and self.stop_event.is_set():
+            # Отмена снаружи прерывает даже первую итерацию
+            raise SearchAborted()
+        if not self._can_stop:
+            # Первая итерация доигрывается всегда, иначе не будет хода
+            return
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchAborted()
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchAborted()
+
+    def _aspiration(self, position, moves, depth, guess):
+        """Корень узким окном вокруг guess; при промахе окно расширяется
+        в сторону промаха, пока оценка не попадет внутрь"""
+        delta = ASPIRATION_WINDOW
+        alpha = max(-INFINITY, guess - delta)
+        beta = min(INFINITY, guess + delta)
+        while True:
+            score = self._search_root(position, moves, depth, alpha, beta)
+            if score <= alpha and alpha > -INFINITY:
+                alpha = max(-INFINITY, score - delta)
+            elif score >= beta and beta < INFINITY:
+                beta = min(INFINITY, score + delta)
+            else:
+                return score
+            self.aspiration_researches += 1
+            delta *= 2
+
+    def _search_root(self, position, moves, depth, alpha=-INFINITY, beta=INFINITY):
+        alpha_start = alpha
+        best = -INFINITY
+        pv = self._pv
+        pv[0] = []
+        for move in moves:
+            position.make_move(move)
+            score = -self._negamax(position, depth - 1, -beta, -alpha, 1)
+            position.unmake_move()
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    pv[0] = [move] + pv[1]
+                    if alpha >= beta:
+                        break
+        if best >= beta:
+            self.tt.store(position.hash, depth, score_to_tt(best, 0), LOWER, pv[0][0])
+        elif best > alpha_start:
+            self.tt.store(position.hash, depth, score_to_tt(best, 0), EXACT, pv[0][0])
+        return best
+
+    def _negamax(self, position, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes >= self._next_check:
+            self._check_limits()
+        pv = self._pv
+        pv[ply] = []
+        if depth <= 0:
+            return self._quiesce(position, alpha, beta, ply)
+        if ply >= MAX_PLY:
+            return evaluate(position)
+        tablebases = self.tablebases
+        if tablebases is not None and popcount(position.occ) <= tablebases.max_pieces:
+            found = tablebases.probe(position)
+            if found is not None:
+                self.tb_hits += 1
+                outcome, dtm = found
+                return outcome * (TABLEBASE_WIN - dtm) if outcome else 0
+
+        key = position.hash
+        entry = self.tt.probe(key)
+        tt_move = None
+        if entry is not None:
+            tt_depth, tt_score, tt_flag, tt_move = entry
+            if tt_depth >= depth:
+                tt_score = score_from_tt(tt_score, ply)
+                if (tt_flag == EXACT
+                        or (tt_flag == LOWER and tt_score >= beta)
+                        or (tt_flag == UPPER and tt_score <= alpha)):
+                    return tt_score
+
+        in_check = position.check_square is not None
+        if (self.use_null_move and not in_check and depth >= NULL_MOVE_MIN_DEPTH
+                and beta < MATE - MAX_PLY and position.history[-1][0] is not None
+                and self._has_pieces(position)):
+            # Пропуск хода: если и так не опуститься ниже beta, ход тем более найдется
+            self.null_tries += 1
+            position.make_null_move()
+            score = -self._negamax(position, depth - 1 - NULL_MOVE_REDUCTION, -beta, -beta + 1, ply + 1)
+            position.unmake_move()
+            if score >= beta:
+                self.null_cutoffs += 1
+                return beta
+
+        moves = position.legal_moves()
+        if not moves:
+            # Мат (чем ближе, тем хуже) или пат
+            return -MATE + ply if in_check else 0
+        if self.use_ordering:
+            self.ordering.order(position, moves, ply, tt_move)
+        elif tt_move is not None and tt_move in moves:
+            # Лучший ход из таблицы - первым
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+
+        alpha_start = alpha
+        best = -INFINITY
+        best_move = None
+        killers = self.ordering.killers[ply]
+        reduce = self.use_lmr and depth >= LMR_MIN_DEPTH and not in_check
+        for index, move in enumerate(moves):
+            quiet = not move >> 12 and not position.is_capture(move)
+            position.make_move(move)
+            if (reduce and index >= LMR_MIN_INDEX and quiet and move not in killers
+                    and position.check_square is None):
+                # Поздний тихий ход: сначала на глубину меньше нулевым окном
+                self.lmr_reductions += 1
+                score = -self._negamax(position, depth - 2, -alpha - 1, -alpha, ply + 1)
+                if score > alpha:
+                    self.lmr_researches += 1
+                    score = -self._negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            else:
+                score = -self._negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            position.unmake_move()
+            if score > best:
+                best = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    pv[ply] = [move] + pv[ply + 1]
+                    if alpha >= beta:
+                        self.ordering.cutoff(position, move, ply, depth, index, tt_move)
+                        break
+
+        if best >= beta:
+            flag = LOWER
+        elif best > alpha_start:
+            flag = EXACT
+        else:
+            flag = UPPER
+            best_move = None
+        self.tt.store(key, depth, score_to_tt(best, ply), flag, best_move)
+        return best
+
+    def _has_pieces(self, position):
+        """Есть ли у стороны хода фигуры кроме пешек и короля: в пешечных
+        окончаниях цугцванг обычен, и пропуск хода врет"""
+        base = position.side * 6
+        pieces = position.pieces
+        return position.occupied[position.side] != pieces[base + PAWN] | pieces[base + KING]
+
+    def _quiesce(self, position, alpha, beta, ply):
+        """Поиск только взятий и превращений в ферзя, пока позиция не успокоится.
+        Под шахом перебираются все ответы, иначе мат остался бы незамеченным."""
+        self.nodes += 1
+        self.qnodes += 1
+        if self.nodes >= self._next_check:
+            self._check_limits()
+        self._pv[ply] = []
+        in_check = position.check_square is not None
+        if ply >= MAX_PLY:
+            return evaluate(position)
+
+        if in_check:
+            moves = position.legal_moves()
+            if not moves:
+                return -MATE + ply
+            best = -INFINITY
+        else:
+            best = evaluate(position)
+            if best >= beta:
+                return best
+            if best > alpha:
+                alpha = best
+            moves = position.legal_captures()
+            if not moves:
+                return best
+        squares = position.squares
+        # MVV-LVA: самая ценная жертва, затем самый дешевый нападающий
+        moves.sort(key=lambda m: capture_gain(squares, m) - PIECE_VALUES[squares[m & 63] % 6] // 100,
+                   reverse=True)
+
+        stand_pat = best
+        for move in moves:
+            if not in_check:
+                # Delta pruning: даже выигрыш фигуры с запасом не дотягивает до alpha
+                if stand_pat + capture_gain(squares, move) + DELTA_MARGIN <= alpha:
+                    continue
+                # Заведомо проигрывающие взятия не смотрим
+                if see(position, move) < 0:
+                    continue
+            position.make_move(move)
+            score = -self._quiesce(position, -beta, -alpha, ply + 1)
+            position.unmake_move()
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best
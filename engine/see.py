@@ -0,0 +1,58 @@
+"""Статическая оценка размена (SEE).
+
+Считает, чем закончится серия взятий на одной клетке, если обе стороны бьют
+самой дешевой фигурой и могут остановиться, когда продолжать невыгодно.
+Атакующие берутся из Position.attackers_to с занятостью, из которой уже
+убраны побившие фигуры, поэтому дальнобойщики за ними (рентген) включаются
+в размен сами. Связки не учитываются - это обычное упрощение SEE.
+"""
+
+from engine.bitboard import KING, PAWN
+from engine.evaluation import PIECE_VALUES
+
+# Король в размене стоит дороже всего: бить им можно только последним
+SEE_VALUES = PIECE_VALUES[:KING] + (20000,)
+
+
+def see(position, move):
+    """Итог размена на клетке хода для стороны, которая его делает, в сантипешках"""
+    frm = move & 63
+    to = (move >> 6) & 63
+    squares = position.squares
+    pieces = position.pieces
+    target = squares[to]
+    attacker = squares[frm]
+
+    gain = [SEE_VALUES[target % 6] if target is not None else 0]
+    on_square = SEE_VALUES[attacker % 6]
+    occ = position.occ ^ (1 << frm)
+    if target is None and attacker % 6 == PAWN and to == position.ep:
+        # Взятие на проходе: пешка исчезает с соседней клетки
+        gain[0] = SEE_VALUES[PAWN]
+        occ ^= 1 << (to + 8 if attacker < 6 else to - 8)
+    promotion = move >> 12
+    if promotion:
+        gain[0] += SEE_VALUES[promotion] - SEE_VALUES[PAWN]
+        on_square = SEE_VALUES[promotion]
+    side = (attacker // 6) ^ 1
+    while True:
+        attackers = position.attackers_to(to, side, occ) & occ
+        if not attackers:
+            break
+        base = side * 6
+        for kind in range(6):
+            candidates = attackers & pieces[base + kind]
+            if candidates:
+                break
+        if kind == KING and position.attackers_to(to, side ^ 1, occ) & occ:
+            # Королем под бой не бьют
+            break
+        gain.append(on_square - gain[-1])
+        on_square = SEE_VALUES[kind]
+        occ ^= candidates & -candidates
+        side ^= 1
+
+    # Каждая сторона выбирает: бить дальше или остановиться
+    for i in range(len(gain) - 1, 0, -1):
+        gain[i - 1] = -max(-gain[i - 1], gain[i])
+    return gain[0]
@@ -0,0 +1,629 @@
+"""Эндшпильные таблицы для 3-4 фигур, построенные ретроградным анализом.
+
+Таблица - исход каждой позиции одного соотношения материала (например,
+KQK или KRKN) для обеих сторон хода: выигрыш, ничья или проигрыш и число
+полуходов до мата (DTM). Строится от матов назад: позиции, из которых
+можно пойти в проигрыш соперника, выиграны; позиции, из которых все ходы
+ведут в выигрыш соперника, проиграны. Взятия переходят в таблицу с меньшим
+материалом, поэтому она строится раньше.
+
+Позиции без пешек симметричны: белый король приводится поворотами и
+отражениями в треугольник a1-d1-d4 (10 клеток), так что в таблице
+2 * 10 * 64^(n-1) записей. С пешками остается только отражение слева
+направо: король приводится на вертикали a-d (32 клетки), записей
+2 * 32 * 64^(n-1). Пешки бывают только у одной стороны - тогда взятие на
+проходе невозможно. Превращения, как и взятия, ведут в таблицы без пешки.
+Каждая запись - байт:
+    0    ничья
+    255  невозможная позиция
+    d+1  мат через d полуходов: при нечетном d выигрывает сторона хода,
+         при четном - проигрывает
+
+Файл - 16 байт заголовка и записи подряд. Открывается через mmap, поиск -
+вычисление индекса и чтение одного байта.
+
+    python -m engine.tablebase build [KQK KRK KPK ...] [-o каталог]
+    python -m engine.tablebase probe каталог [e2e4 ...]
+
+Три фигуры строятся за секунды, четыре - минуты.
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+from engine.bitboard import (BISHOP, BLACK, COLOR_CODES, KING, KNIGHT, PAWN, PROMOTIONS, WHITE, Position, iter_bits,
+                             move_name, piece_attacks, popcount)
+
+MAGIC = b'CTB1'
+HEADER = struct.Struct('<4s8sBBH')
+HEADER_SIZE = 16
+EXTENSION = '.ctb'
+
+DRAW_VALUE = 0
+INVALID = 255
+WIN, DRAW, LOSS = 1, 0, -1
+
+# Буквы фигур в названии таблицы, по типу
+_LETTERS = 'PNBRQK'
+# Порядок фигур в названии: сначала король, дальше по убыванию ценности
+_NAME_ORDER = 'KQRBNP'
+
+DEFAULT_TABLES = ('KQK', 'KRK', 'KBK', 'KNK', 'KPK')
+
+
+def _transforms():
+    """Восемь симметрий доски как таблицы перестановки клеток"""
+    result = []
+    for transpose in (False, True):
+        for flip_row in (False, True):
+            for flip_col in (False, True):
+                table = []
+                for sq in range(64):
+                    row, col = divmod(sq, 8)
+                    if transpose:
+                        row, col = col, row
+                    if flip_row:
+                        row = 7 - row
+                    if flip_col:
+                        col = 7 - col
+                    table.append(row * 8 + col)
+                result.append(tuple(table))
+    return result
+
+
+TRANSFORMS = _transforms()
+# Треугольник a1-d1-d4: горизонталь не выше вертикали, обе не дальше четвертой
+TRIANGLE = [sq for sq in range(64) if (sq & 7) <= 3 and 7 - (sq >> 3) <= (sq & 7)]
+TRIANGLE_INDEX = {sq: i for i, sq in enumerate(TRIANGLE)}
+# Для каждой клетки белого короля - симметрии, переводящие его в треугольник.
+# Король на диагонали a1-d4 остается в треугольнике и после отражения
+# относительно нее, тогда симметрий две и берется та, что дает меньший индекс.
+KING_TRANSFORMS = [[t for t in TRANSFORMS if t[sq] in TRIANGLE_INDEX] for sq in range(64)]
+# С пешками: вертикали a-d и одно отражение слева направо
+HALF = [sq for sq in range(64) if (sq & 7) <= 3]
+HALF_INDEX = {sq: i for i, sq in enumerate(HALF)}
+MIRROR = tuple((sq & 56) | (7 - (sq & 7)) for sq in range(64))
+PAWN_KING_TRANSFORMS = [[TRANSFORMS[0] if (sq & 7) <= 3 else MIRROR] for sq in range(64)]
+
+
+def parse_name(name):
+    """'KQKR' -> коды фигур: белый король, черный король, белые, черные"""
+    name = name.upper()
+    second = name.find('K', 1)
+    if not name.startswith('K') or second < 0:
+        raise ValueError(f"Неверное название таблицы {name}")
+    white, black = name[1:second], name[second + 1:]
+    if 'P' in white and 'P' in black:
+        raise ValueError("Пешки у обеих сторон не поддерживаются: таблицы не учитывают взятие на проходе")
+    codes = [WHITE * 6 + KING, BLACK * 6 + KING]
+    codes += [WHITE * 6 + _LETTERS.index(letter) for letter in white]
+    codes += [BLACK * 6 + _LETTERS.index(letter) for letter in black]
+    return codes
+
+
+def material_name(codes):
+    """Название таблицы по набору фигур"""
+    sides = []
+    for color in (WHITE, BLACK):
+        letters = sorted((_LETTERS[code % 6] for code in codes if code // 6 == color),
+                         key=_NAME_ORDER.index)
+        sides.append(''.join(letters))
+    return sides[0] + sides[1]
+
+
+def _flip(codes, squares, side):
+    """Меняет цвета местами: та же позиция глазами другой стороны"""
+    return ([code - 6 if code >= 6 else code + 6 for code in codes],
+            [sq ^ 56 for sq in squares], side ^ 1)
+
+
+class Table:
+    """Одна таблица: коды фигур и байты исходов (bytearray или mmap файла,
+    тогда записи начинаются с offset). decisive - есть ли в ней хоть один мат"""
+
+    def __init__(self, name, data, decisive=True, offset=0):
+        self.name = name
+        self.codes = parse_name(name)
+        self.data = data
+        self.offset = offset
+        self.decisive = decisive
+        if any(code % 6 == PAWN for code in self.codes):
+            self.kings, self.king_index, self.transforms = HALF, HALF_INDEX, PAWN_KING_TRANSFORMS
+        else:
+            self.kings, self.king_index, self.transforms = TRIANGLE, TRIANGLE_INDEX, KING_TRANSFORMS
+        self.size = 2 * len(self.kings) * 64 ** (len(self.codes) - 1)
+
+    def index(self, side, squares):
+        """Индекс позиции; squares - клетки фигур в порядке self.codes"""
+        best = None
+        kings = len(self.kings)
+        for transform in self.transforms[squares[0]]:
+            index = side * kings + self.king_index[transform[squares[0]]]
+            for sq in squares[1:]:
+                index = index * 64 + transform[sq]
+            if best is None or index < best:
+                best = index
+        return best
+
+    def decode(self, index):
+        squares = []
+        for _ in range(len(self.codes) - 1):
+            index, sq = divmod(index, 64)
+            squares.append(sq)
+        side, king = divmod(index, len(self.kings))
+        squares.append(self.kings[king])
+        squares.reverse()
+        return side, squares
+
+    def value(self, side, squares):
+        return self.data[self.offset + self.index(side, squares)]
+
+
+def decode_value(value):
+    """Байт таблицы -> (исход для стороны хода, полуходов до мата)"""
+    if value == DRAW_VALUE or value == INVALID:
+        return DRAW, None
+    dtm = value - 1
+    return (WIN if dtm % 2 else LOSS), dtm
+
+
+class Tablebases:
+    """Набор таблиц с поиском по позиции"""
+
+    def __init__(self, directory=None):
+        self.tables = {}
+        self._files = []
+        self.max_pieces = 2
+        if directory and os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if name.endswith(EXTENSION):
+                    self._open(os.path.join(directory, name))
+
+    def _open(self, path):
+        f = open(path, 'rb')
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, name, _, decisive, _ = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            data.close()
+            f.close()
+            raise ValueError(f"{path}: не файл таблицы")
+        name = name.rstrip(b'\0').decode()
+        self._files.append((f, data))
+        self.add(Table(name, data, bool(decisive), HEADER_SIZE))
+
+    def add(self, table):
+        self.tables[table.name] = table
+        self.max_pieces = max(self.max_pieces, len(table.codes))
+
+    def close(self):
+        self.tables = {}
+        for f, data in self._files:
+            data.close()
+            f.close()
+        self._files = []
+
+    def _find(self, codes, squares):
+        """Таблица для фигур codes и признак, что цвета в ней обратные"""
+        table = self.tables.get(material_name(codes))
+        if table is not None:
+            return table, False
+        codes = _flip(codes, squares, 0)[0]
+        return self.tables.get(material_name(codes)), True
+
+    def _lookup(self, codes, squares, side):
+        """Байт исхода для фигур codes на клетках squares или None, если
+        такой таблицы нет. Порядок фигур любой."""
+        if len(codes) == 2:
+            return DRAW_VALUE
+        table, flipped = self._find(codes, squares)
+        if table is None:
+            return None
+        if flipped:
+            codes, squares, side = _flip(codes, squares, side)
+        # Раскладываем клетки в порядке кодов таблицы
+        by_code = {}
+        for code, sq in zip(codes, squares):
+            by_code.setdefault(code, []).append(sq)
+        ordered = [by_code[code].pop() for code in table.codes]
+        return table.value(side, ordered)
+
+    def _material(self, position):
+        """Коды и клетки фигур позиции или None, если таблиц для нее быть не может"""
+        if popcount(position.occ) > self.max_pieces:
+            return None
+        codes = []
+        squares = []
+        for code, bb in enumerate(position.pieces):
+            for sq in iter_bits(bb):
+                codes.append(code)
+                squares.append(sq)
+        return codes, squares
+
+    def probe_value(self, position):
+        """Байт исхода для позиции или None"""
+        material = self._material(position)
+        if material is None:
+            return None
+        return self._lookup(material[0], material[1], position.side)
+
+    def probe(self, position):
+        """(исход для стороны хода, полуходов до мата) или None"""
+        value = self.probe_value(position)
+        if value is None or value == INVALID:
+            return None
+        return decode_value(value)
+
+    def is_dead(self, position):
+        """Мертвая позиция: материал, при котором мат невозможен ни одной
+        стороне, - голые короли, король с конем или слоном против короля,
+        слоны по одному на одноцветных полях. По таблицам этого не узнать:
+        в KBKB с разноцветными слонами выигрышей нет, но мат возможен"""
+        codes = [code for code, bb in enumerate(position.pieces) for _ in iter_bits(bb)
+                 if code % 6 != KING]
+        if len(codes) <= 1:
+            return all(code % 6 in (KNIGHT, BISHOP) for code in codes)
+        if sorted(codes) != [BISHOP, 6 + BISHOP]:
+            return False
+        # Цвет поля слона - четность суммы горизонтали и вертикали
+        colors = {(sq >> 3) + (sq & 7) & 1
+                  for sq in iter_bits(position.pieces[BISHOP] | position.pieces[6 + BISHOP])}
+        return len(colors) == 1
+
+    def best_move(self, position):
+        """Лучший по таблицам ход: самый быстрый мат, ничья, самое долгое
+        сопротивление. (ход, исход, полуходов до мата) или None"""
+        if self._material(position) is None:
+            return None
+        best = None
+        best_key = None
+        for move in position.legal_moves():
+            position.make_move(move)
+            value = self.probe_value(position)
+            position.unmake_move()
+            if value is None or value == INVALID:
+                return None
+            result, dtm = decode_value(value)
+            # Исход для нас - обратный исходу соперника после хода
+            if result == LOSS:
+                key = (2, -dtm)
+            elif result == DRAW:
+                key = (1, 0)
+            else:
+                key = (0, dtm)
+            if best_key is None or key > best_key:
+                best_key = key
+                best = (move, -result, dtm + 1 if dtm is not None else None)
+        return best
+
+
+_tablebases = {}
+
+
+def get_tablebases(directory):
+    """Таблицы из каталога, открытые один раз на процесс; None, если их нет"""
+    if directory not in _tablebases:
+        tablebases = Tablebases(directory)
+        _tablebases[directory] = tablebases if tablebases.tables else None
+    return _tablebases[directory]
+
+
+# Построение
+
+
+def _attacked(sq, color, codes, squares, occ, skip=-1):
+    """Бьет ли клетку sq какая-нибудь фигура цвета color (кроме номера skip)"""
+    for i, code in enumerate(codes):
+        if i != skip and code // 6 == color and (piece_attacks(code, squares[i], occ) >> sq) & 1:
+            return True
+    return False
+
+
+def _legal_moves(codes, squares, side):
+    """Легальные ходы: (номер фигуры, клетка, номер взятой фигуры или -1,
+    тип фигуры превращения или 0)"""
+    occ = 0
+    own = 0
+    for i, sq in enumerate(squares):
+        occ |= 1 << sq
+        if codes[i] // 6 == side:
+            own |= 1 << sq
+    them = side ^ 1
+    king = 0 if side == WHITE else 1
+    moves = []
+    for i, code in enumerate(codes):
+        if code // 6 != side:
+            continue
+        frm = squares[i]
+        if code % 6 == PAWN:
+            # Пешка бьет только фигуры соперника, а ходит вперед на пустые клетки
+            targets = piece_attacks(code, frm, occ) & occ & ~own
+            step = -8 if side == WHITE else 8
+            if not (occ >> (frm + step)) & 1:
+                targets |= 1 << (frm + step)
+                start_row = 6 if side == WHITE else 1
+                if frm >> 3 == start_row and not (occ >> (frm + 2 * step)) & 1:
+                    targets |= 1 << (frm + 2 * step)
+        else:
+            targets = piece_attacks(code, frm, occ) & ~own
+        for to in iter_bits(targets):
+            captured = -1
+            if (occ >> to) & 1:
+                captured = squares.index(to)
+            new_occ = (occ ^ (1 << frm)) | (1 << to)
+            king_sq = to if i == king else squares[king]
+            moved = squares[:]
+            moved[i] = to
+            if _attacked(king_sq, them, codes, moved, new_occ, captured):
+                continue
+            if code % 6 == PAWN and to >> 3 in (0, 7):
+                for promotion in PROMOTIONS:
+                    moves.append((i, to, captured, promotion))
+            else:
+                moves.append((i, to, captured, 0))
+    return moves
+
+
+def _valid(codes, squares, side):
+    """Позиция возможна: клетки разные, пешки не на крайних горизонталях,
+    короли не рядом, ходящая сторона не может взять короля"""
+    if len(set(squares)) != len(squares):
+        return False
+    for code, sq in zip(codes, squares):
+        if code % 6 == PAWN and sq >> 3 in (0, 7):
+            return False
+    occ = 0
+    for sq in squares:
+        occ |= 1 << sq
+    other_king = squares[1] if side == WHITE else squares[0]
+    return not _attacked(other_king, side, codes, squares, occ)
+
+
+def build_table(name, tablebases, log=None):
+    """Строит таблицу name; таблицы для взятий должны быть в tablebases"""
+    table = Table(name, None)
+    codes = table.codes
+    size = table.size
+    values = bytearray(size)
+    counters = array('h', bytes(2 * size))
+    loss_floor = bytearray(size)
+    buckets = [[] for _ in range(INVALID)]
+
+    for index in range(size):
+        side, squares = table.decode(index)
+        # Зеркальные двойники позиций с королем на диагонали не хранятся
+        if table.index(side, squares) != index or not _valid(codes, squares, side):
+            values[index] = INVALID
+            continue
+        moves = _legal_moves(codes, squares, side)
+        if not moves:
+            king = squares[0] if side == WHITE else squares[1]
+            occ = 0
+            for sq in squares:
+                occ |= 1 << sq
+            if _attacked(king, side ^ 1, codes, squares, occ):
+                buckets[0].append(index)
+            # Пат остается ничьей
+            counters[index] = -1
+            continue
+        children = set()
+        can_lose = True
+        win_at = None
+        loss_at = 0
+        for i, to, captured, promotion in moves:
+            moved = squares[:]
+            moved[i] = to
+            if captured < 0 and not promotion:
+                children.add(table.index(side ^ 1, moved))
+                continue
+            # Взятие или превращение: позиция из другой таблицы
+            rest = codes[:]
+            if promotion:
+                rest[i] = side * 6 + promotion
+            rest = [c for j, c in enumerate(rest) if j != captured]
+            rest_squares = [sq for j, sq in enumerate(moved) if j != captured]
+            value = tablebases._lookup(rest, rest_squares, side ^ 1)
+            if value is None:
+                raise ValueError(f"Для {name} нужна таблица {material_name(rest)}")
+            if value == DRAW_VALUE:
+                can_lose = False
+                continue
+            dtm = value - 1
+            if dtm % 2 == 0:
+                win_at = dtm + 1 if win_at is None else min(win_at, dtm + 1)
+            else:
+                loss_at = max(loss_at, dtm + 1)
+        if win_at is not None:
+            buckets[win_at].append(index)
+        if can_lose:
+            counters[index] = len(children)
+            loss_floor[index] = loss_at
+            if not children:
+                buckets[loss_at].append(index)
+        else:
+            counters[index] = -1
+
+    # От матов назад: уровень - число полуходов до мата
+    for level in range(INVALID - 1):
+        if not any(buckets[level:]):
+            break
+        resolved = []
+        for index in buckets[level]:
+            if not values[index]:
+                values[index] = level + 1
+                resolved.append(index)
+        buckets[level] = None
+        for index in resolved:
+            side, squares = table.decode(index)
+            mover = side ^ 1
+            occ = 0
+            for sq in squares:
+                occ |= 1 << sq
+            parents = set()
+            for i, code in enumerate(codes):
+                if code // 6 != mover:
+                    continue
+                # Ход назад - на пустую клетку, откуда фигура могла прийти
+                if code % 6 == PAWN:
+                    origins = _pawn_origins(squares[i], mover, occ)
+                else:
+                    origins = piece_attacks(code, squares[i], occ) & ~occ
+                for frm in iter_bits(origins):
+                    moved = squares[:]
+                    moved[i] = frm
+                    parents.add(table.index(mover, moved))
+            for parent in parents:
+                if values[parent]:
+                    continue
+                if level % 2 == 0:
+                    buckets[level + 1].append(parent)
+                elif counters[parent] > 0:
+                    counters[parent] -= 1
+                    if not counters[parent]:
+                        buckets[max(level + 1, loss_floor[parent])].append(parent)
+        if log and resolved:
+            log(f"{name}: {level} полуходов до мата - {len(resolved)} позиций")
+
+    table.data = values
+    table.decisive = any(0 < v < INVALID for v in values)
+    return table
+
+
+def _pawn_origins(sq, color, occ):
+    """Пустые клетки, откуда пешка могла прийти на sq ходом без взятия"""
+    step = 8 if color == WHITE else -8
+    back = sq + step
+    if not 1 <= back >> 3 <= 6 or (occ >> back) & 1:
+        return 0
+    origins = 1 << back
+    # Двойной ход с начальной горизонтали
+    start_row = 6 if color == WHITE else 1
+    if (back + step) >> 3 == start_row and not (occ >> (back + step)) & 1:
+        origins |= 1 << (back + step)
+    return origins
+
+
+def _oriented(codes):
+    """Название таблицы для фигур codes в той ориентации, в которой она хранится"""
+    return max(material_name(codes), material_name(_flip(codes, [], 0)[0]), key=_strength)
+
+
+def _required(name):
+    """Таблицы, в которые ведут взятия и превращения, и сама таблица - в
+    порядке построения"""
+    codes = parse_name(name)
+    subsets = []
+    for j in range(2, len(codes)):
+        rest = codes[:j] + codes[j + 1:]
+        if len(rest) > 2:
+            subsets.append(rest)
+        if codes[j] % 6 == PAWN:
+            for promotion in PROMOTIONS:
+                subsets.append(codes[:j] + [codes[j] - PAWN + promotion] + codes[j + 1:])
+    order = []
+    for rest in subsets:
+        # Таблица хранится в ориентации, где у белых больше материала
+        for item in _required(_oriented(rest)):
+            if item not in order:
+                order.append(item)
+    order.append(name)
+    return order
+
+
+def _strength(name):
+    """Ключ выбора ориентации: белые сильнее, при равенстве - первое название"""
+    codes = parse_name(name)
+    values = (1, 3, 3, 5, 9, 0)
+    white = sum(values[c % 6] for c in codes if c // 6 == WHITE)
+    black = sum(values[c % 6] for c in codes if c // 6 == BLACK)
+    return (white - black, name)
+
+
+def write_table(table, directory):
+    path = os.path.join(directory, table.name + EXTENSION)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, table.name.encode(), len(table.codes), int(table.decisive), 0).ljust(HEADER_SIZE, b'\0'))
+        f.write(table.data)
+    return path
+
+
+def build(names, directory, log=print):
+    """Строит таблицы names со всеми нужными для взятий и пишет в каталог"""
+    os.makedirs(directory, exist_ok=True)
+    tablebases = Tablebases()
+    order = []
+    for name in names:
+        for item in _required(name.upper()):
+            if item not in order:
+                order.append(item)
+    for name in order:
+        start = time.perf_counter()
+        table = build_table(name, tablebases)
+        tablebases.add(table)
+        path = write_table(table, directory)
+        longest = max((v - 1 for v in table.data if 0 < v < INVALID), default=0)
+        log(f"{name}: {table.size} записей, самый длинный мат {longest} полуходов, "
+            f"{time.perf_counter() - start:.1f} с -> {path}")
+    return tablebases
+
+
+def _position_from_pieces(pieces, side):
+    """Позиция из списка вида Ke1 Qd1 ke8: заглавные - белые, строчные - черные"""
+    board = [[None] * 8 for _ in range(8)]
+    for text in pieces:
+        if len(text) != 3 or text[0].upper() not in _LETTERS:
+            raise ValueError(f"Неверная фигура {text}")
+        col = ord(text[1]) - ord('a')
+        row = 8 - int(text[2])
+        color = 'white' if text[0].isupper() else 'black'
+        kind = ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king')[_LETTERS.index(text[0].upper())]
+        board[row][col] = f"{color}_{kind}"
+    # Рокировок в таблицах нет, даже если король и ладья на начальных клетках
+    return Position(board, COLOR_CODES[side], castling=0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Эндшпильные таблицы")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_cmd = commands.add_parser("build", help="построить таблицы вместе с нужными для взятий")
+    build_cmd.add_argument("tables", nargs="*", default=list(DEFAULT_TABLES))
+    build_cmd.add_argument("-o", "--output", default="tablebases")
+    probe_cmd = commands.add_parser("probe", help="исход позиции, заданной фигурами вида Ke1 Qd1 ke8")
+    probe_cmd.add_argument("directory")
+    probe_cmd.add_argument("pieces", nargs="+")
+    probe_cmd.add_argument("--side", choices=("white", "black"), default="white")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        build(args.tables, args.output)
+        return True
+
+    tablebases = Tablebases(args.directory)
+    position = _position_from_pieces(args.pieces, args.side)
+    result = tablebases.probe(position)
+    if result is None:
+        print("Таблицы для этой позиции нет")
+        return False
+    outcome, dtm = result
+    if outcome == DRAW:
+        print("Ничья")
+    else:
+        print(f"{'Выигрыш' if outcome == WIN else 'Проигрыш'} стороны хода, мат через {dtm} полуходов")
+        best = tablebases.best_move(position)
+        if best is not None:
+            print(f"Лучший ход: {move_name(best[0])}")
+    repeats = 10000
+    start = time.perf_counter()
+    for _ in range(repeats):
+        tablebases.probe(position)
+    elapsed = time.perf_counter() - start
+    print(f"Поиск: {elapsed / repeats * 1e6:.1f} мкс")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,404 @@
+"""Матч бота против бота на пуле процессов: стал ли бот сильнее или быстрее.
+
+    python -m engine.tournament [--games 200] [--workers 4] [--tc 5+0.05]
+        [--movetime S] [--nodes N] [--depth N] [--openings файл]
+        [--seed 1] [--results results.jsonl] [--sprt 0 10]
+        [--engine-a "lmr=0"] [--engine-b ""]
+
+Играют две настройки поиска: A (проверяемая) и B (базовая). Настройка - это
+список name=value через запятую: hash (МБ), ordering, null_move, lmr,
+aspiration (0 или 1). Каждое дебютное начало играется дважды со сменой
+цветов. Начала берутся из файла (по строке: FEN или ходы вида e2e4 e7e5;
+строки с # пропускаются) или, без файла, из случайных ходов от начальной
+позиции. Случайность задается seed и номером пары партий, а не процессом,
+который ее играет, поэтому матч с тем же seed повторяется в точности.
+
+Контроль времени: --tc база+добавка (секунды на партию и за ход), время на
+ход выбирается так же, как в UCI; либо фиксированно --movetime, --nodes или
+--depth. Партия заканчивается матом, патом, троекратным повторением,
+правилом 50 ходов, недостатком материала, падением флажка или по лимиту
+полуходов (ничья).
+
+Результат каждой партии сразу дописывается строкой JSON в файл результатов.
+В конце - счет, разница в Elo с 95% интервалом, LOS, SPRT (если задан
+--sprt elo0 elo1; матч останавливается, как только SPRT принял решение)
+и средняя скорость поиска.
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import signal
+import sys
+import time
+
+from engine.bitboard import (BISHOP, KNIGHT, PAWN, QUEEN, ROOK, WHITE, Position, START_BOARD,
+                             move_name, popcount)
+from engine.search import MAX_PLY, Searcher
+from engine.uci import allocate_time
+
+RANDOM_OPENING_PLIES = 6
+MAX_GAME_PLIES = 400
+PROGRESS_EVERY = 10
+
+# Настройки поиска, которые можно менять в матче: имя -> атрибут Searcher
+ENGINE_OPTIONS = {
+    'ordering': 'use_ordering',
+    'null_move': 'use_null_move',
+    'lmr': 'use_lmr',
+    'aspiration': 'use_aspiration',
+}
+
+
+def parse_engine(spec):
+    """'lmr=0,hash=32' -> словарь настроек"""
+    options = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, value = item.partition('=')
+        name = name.strip()
+        if name != 'hash' and name not in ENGINE_OPTIONS:
+            raise ValueError(f"Неизвестная настройка {name}")
+        options[name] = int(value)
+    return options
+
+
+def make_searcher(options):
+    searcher = Searcher(options.get('hash', 16))
+    for name, attribute in ENGINE_OPTIONS.items():
+        if name in options:
+            setattr(searcher, attribute, bool(options[name]))
+    return searcher
+
+
+def load_openings(path):
+    """Начальные позиции из файла: FEN или ходы через пробел. Каждая строка
+    проверяется здесь, а не в процессе пула: неверная пропускается с
+    сообщением, а не обрывает матч"""
+    openings = []
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                position = opening_position(line)
+            except (ValueError, IndexError) as e:
+                print(f"{path}:{number}: начало пропущено - {e}")
+                continue
+            if not position.legal_moves():
+                print(f"{path}:{number}: начало пропущено - в позиции нет ходов")
+                continue
+            openings.append(line)
+    if not openings:
+        raise ValueError(f"В {path} нет ни одного верного начала")
+    return openings
+
+
+def opening_position(opening):
+    """Позиция по строке файла начал; для EPD берутся первые четыре поля"""
+    if '/' in opening:
+        fields = opening.split()
+        position = Position.from_fen(' '.join(fields[:4]))
+        position.validate()
+        return position
+    position = Position(START_BOARD)
+    for text in opening.split():
+        move = position.parse_move(text) or position.parse_san(text)
+        if move is None:
+            raise ValueError(f"Нелегальный ход {text} в начале {opening}")
+        position.make_move(move)
+    return position
+
+
+def random_opening(rng, plies=RANDOM_OPENING_PLIES):
+    """Случайные ходы от начальной позиции, записанные как строка ходов"""
+    position = Position(START_BOARD)
+    moves = []
+    for _ in range(plies):
+        legal = position.legal_moves()
+        if not legal:
+            break
+        move = rng.choice(legal)
+        moves.append(move_name(move))
+        position.make_move(move)
+    return ' '.join(moves)
+
+
+def insufficient_material(position):
+    """Голые короли или король с одной легкой фигурой против короля"""
+    pieces = position.pieces
+    for color in (0, 1):
+        base = color * 6
+        if pieces[base + PAWN] or pieces[base + ROOK] or pieces[base + QUEEN]:
+            return False
+    minors = 0
+    for color in (0, 1):
+        minors += popcount(pieces[color * 6 + KNIGHT] | pieces[color * 6 + BISHOP])
+    return minors <= 1
+
+
+# Состояние процесса пула: настройки и движки живут между партиями
+_engines = None
+_limits = None
+
+
+def _init_worker(engine_a, engine_b, limits):
+    global _engines, _limits
+    # Ctrl+C обрабатывает главный процесс, он и останавливает пул
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _engines = {'A': make_searcher(engine_a), 'B': make_searcher(engine_b)}
+    _limits = limits
+
+
+def _move_limits(limits, clock):
+    """Бюджет на ход: фиксированный или из остатка на часах"""
+    result = {'depth': limits.get('depth') or MAX_PLY}
+    if limits.get('nodes'):
+        result['nodes'] = limits['nodes']
+    if limits.get('movetime'):
+        result['movetime'] = limits['movetime']
+    elif clock is not None:
+        result['movetime'] = allocate_time(clock, limits.get('increment', 0.0))
+    return result
+
+
+def play_game(task):
+    """Одна партия в процессе пула. task - (номер, начало, кто играет белыми)"""
+    index, opening, white = task
+    names = (white, 'B' if white == 'A' else 'A')
+    for searcher in _engines.values():
+        searcher.tt.clear()
+        searcher.ordering.clear()
+    limits = _limits
+    position = opening_position(opening)
+    base_time = limits.get('time')
+    clocks = [base_time, base_time]
+    stats = {name: {'nodes': 0, 'time': 0.0, 'moves': 0} for name in names}
+    seen = {position.hash: 1}
+    halfmove = 0
+    plies = 0
+    result = reason = None
+
+    while result is None:
+        side = position.side
+        name = names[side]
+        moves = position.legal_moves()
+        if not moves:
+            if position.check_square is not None:
+                result, reason = ('0-1' if side == WHITE else '1-0'), 'мат'
+            else:
+                result, reason = '1/2-1/2', 'пат'
+            break
+        if seen[position.hash] >= 3:
+            result, reason = '1/2-1/2', 'повторение'
+            break
+        if halfmove >= 100:
+            result, reason = '1/2-1/2', 'правило 50 ходов'
+            break
+        if insufficient_material(position):
+            result, reason = '1/2-1/2', 'недостаток материала'
+            break
+        if plies >= limits.get('max_plies', MAX_GAME_PLIES):
+            result, reason = '1/2-1/2', 'лимит ходов'
+            break
+
+        searcher = _engines[name]
+        start = time.perf_counter()
+        found = searcher.search(position, **_move_limits(limits, clocks[side]))
+        elapsed = time.perf_counter() - start
+        stats[name]['nodes'] += found['nodes']
+        stats[name]['time'] += found['time']
+        stats[name]['moves'] += 1
+        if clocks[side] is not None:
+            clocks[side] -= elapsed
+            if clocks[side] < 0:
+                result, reason = ('0-1' if side == WHITE else '1-0'), 'время'
+                break
+            clocks[side] += limits.get('increment', 0.0)
+
+        move = found['move'] if found['move'] is not None else moves[0]
+        frm = move & 63
+        if position.squares[frm] % 6 == PAWN or position.is_capture(move):
+            halfmove = 0
+            seen = {}
+        else:
+            halfmove += 1
+        position.make_move(move)
+        seen[position.hash] = seen.get(position.hash, 0) + 1
+        plies += 1
+
+    # Очки проверяемой настройки A
+    points = {'1-0': 1.0, '0-1': 0.0, '1/2-1/2': 0.5}[result]
+    if white != 'A':
+        points = 1.0 - points
+    return {
+        'game': index, 'opening': opening, 'white': names[0], 'black': names[1],
+        'result': result, 'reason': reason, 'plies': plies, 'score_a': points,
+        'stats': stats,
+    }
+
+
+# Статистика матча
+
+
+def _elo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return 400 * math.log10(score / (1 - score))
+
+
+def elo_summary(wins, draws, losses):
+    """Разница в Elo, половина 95% интервала и LOS (вероятность, что A сильнее)"""
+    games = wins + draws + losses
+    if not games:
+        return 0.0, 0.0, 0.5
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    error = 1.96 * math.sqrt(variance / games)
+    elo = _elo(score)
+    margin = (_elo(score + error) - _elo(score - error)) / 2
+    decisive = wins + losses
+    los = 0.5 * (1 + math.erf((wins - losses) / math.sqrt(2 * decisive))) if decisive else 0.5
+    return elo, margin, los
+
+
+def sprt(wins, draws, losses, elo0, elo1, alpha=0.05, beta=0.05):
+    """SPRT для гипотез elo0 против elo1 (нормальное приближение по счету
+    партий): (LLR, нижняя граница, верхняя граница)"""
+    lower = math.log(beta / (1 - alpha))
+    upper = math.log((1 - beta) / alpha)
+    games = wins + draws + losses
+    if not games:
+        return 0.0, lower, upper
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    if variance <= 0:
+        return 0.0, lower, upper
+    s0 = 1 / (1 + 10 ** (-elo0 / 400))
+    s1 = 1 / (1 + 10 ** (-elo1 / 400))
+    llr = games * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
+    return llr, lower, upper
+
+
+def _tasks(games, openings, seed):
+    """Задания партий: каждое начало дважды со сменой цветов"""
+    rng = random.Random(seed)
+    if openings:
+        openings = openings[:]
+        rng.shuffle(openings)
+    for index in range(games):
+        pair = index // 2
+        if openings:
+            opening = openings[pair % len(openings)]
+        else:
+            opening = random_opening(random.Random(seed * 1000003 + pair))
+        yield index, opening, 'A' if index % 2 == 0 else 'B'
+
+
+def _summary_line(wins, draws, losses, sprt_bounds):
+    elo, margin, los = elo_summary(wins, draws, losses)
+    line = f"+{wins} ={draws} -{losses}, Elo {elo:+.1f} ± {margin:.1f}, LOS {los:.1%}"
+    if sprt_bounds:
+        llr, lower, upper = sprt(wins, draws, losses, *sprt_bounds)
+        line += f", LLR {llr:.2f} [{lower:.2f}, {upper:.2f}]"
+    return line
+
+
+def run_match(games=200, workers=None, limits=None, openings=None, seed=1, results_path=None,
+              engine_a=None, engine_b=None, sprt_bounds=None):
+    """Играет матч и печатает итог. Возвращает (победы, ничьи, поражения) A"""
+    workers = workers or multiprocessing.cpu_count()
+    limits = limits or {}
+    wins = draws = losses = 0
+    nodes = 0
+    search_time = 0.0
+    reasons = {}
+    out = open(results_path, 'a', encoding='utf-8') if results_path else None
+    start = time.perf_counter()
+    pool = multiprocessing.Pool(workers, initializer=_init_worker,
+                                initargs=(engine_a or {}, engine_b or {}, limits))
+    try:
+        for played, game in enumerate(pool.imap_unordered(play_game, _tasks(games, openings, seed)), 1):
+            if out:
+                out.write(json.dumps(game, ensure_ascii=False) + '\n')
+                out.flush()
+            if game['score_a'] == 1.0:
+                wins += 1
+            elif game['score_a'] == 0.0:
+                losses += 1
+            else:
+                draws += 1
+            reasons[game['reason']] = reasons.get(game['reason'], 0) + 1
+            for stat in game['stats'].values():
+                nodes += stat['nodes']
+                search_time += stat['time']
+            if played % PROGRESS_EVERY == 0 or played == games:
+                print(f"Партий {played}/{games}: {_summary_line(wins, draws, losses, sprt_bounds)}")
+            if sprt_bounds:
+                llr, lower, upper = sprt(wins, draws, losses, *sprt_bounds)
+                if llr <= lower or llr >= upper:
+                    print(f"SPRT: {'H1 принята (A сильнее)' if llr >= upper else 'H0 принята'} после {played} партий")
+                    break
+    except KeyboardInterrupt:
+        print("Матч прерван")
+    finally:
+        pool.terminate()
+        pool.join()
+        if out:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Итог A против B: {_summary_line(wins, draws, losses, sprt_bounds)}")
+    print("Окончания: " + ", ".join(f"{reason} {count}" for reason, count in sorted(reasons.items())))
+    if search_time > 0:
+        print(f"Скорость поиска: {int(nodes / search_time)} узлов/с на процесс, "
+              f"{nodes} узлов за {elapsed:.1f} с на {workers} процессах")
+    return wins, draws, losses
+
+
+def parse_tc(text):
+    """'5+0.05' -> (5.0, 0.05)"""
+    base, _, increment = text.partition('+')
+    return float(base), float(increment or 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Матч бота против бота")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=None, help="процессов пула, по умолчанию - по числу ядер")
+    parser.add_argument("--tc", default="5+0.05", help="секунд на партию + добавка за ход")
+    parser.add_argument("--movetime", type=float, help="фиксированное время на ход, секунды (вместо --tc)")
+    parser.add_argument("--nodes", type=int, help="узлов на ход")
+    parser.add_argument("--depth", type=int, help="глубина на ход")
+    parser.add_argument("--max-plies", type=int, default=MAX_GAME_PLIES)
+    parser.add_argument("--openings", help="файл начал: FEN/EPD или ходы e2e4 e7e5 по строке")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--results", default="results.jsonl", help="файл результатов, дописывается по партии")
+    parser.add_argument("--engine-a", default="", help="настройки проверяемого бота, например lmr=0")
+    parser.add_argument("--engine-b", default="", help="настройки базового бота")
+    parser.add_argument("--sprt", nargs=2, type=float, metavar=("ELO0", "ELO1"))
+    args = parser.parse_args(argv)
+
+    limits = {'max_plies': args.max_plies, 'depth': args.depth, 'nodes': args.nodes}
+    if args.movetime:
+        limits['movetime'] = args.movetime
+    elif not args.nodes and not args.depth:
+        limits['time'], limits['increment'] = parse_tc(args.tc)
+    openings = None
+    if args.openings:
+        try:
+            openings = load_openings(args.openings)
+        except ValueError as e:
+            print(e)
+            return False
+    run_match(args.games, args.workers, limits, openings, args.seed, args.results,
+              parse_engine(args.engine_a), parse_engine(args.engine_b), args.sprt)
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
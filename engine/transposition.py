@@ -0,0 +1,127 @@
+"""Таблица транспозиций фиксированного размера.
+
+Записи лежат в двух массивах 64-битных чисел (ключ и упакованные данные),
+поэтому объем памяти задается заранее и не растет во время поиска:
+16 байт на запись.
+
+Упаковка данных записи:
+    биты 0-15   лучший ход
+    биты 16-17  тип оценки (EXACT, LOWER, UPPER)
+    биты 18-24  глубина
+    биты 25-30  поколение (номер поиска)
+    биты 31-48  оценка со смещением SCORE_OFFSET
+"""
+
+from array import array
+
+EXACT, LOWER, UPPER = 1, 2, 3
+ENTRY_BYTES = 16
+SCORE_OFFSET = 1 << 17
+NO_MOVE = 0xFFFF
+
+
+class TranspositionTable:
+    """Кэш результатов поиска по ключу Zobrist с заменой по глубине.
+
+    Запись текущего поиска заменяется только результатом не меньшей глубины;
+    записи прошлых поисков (другое поколение) всегда можно затереть.
+    """
+
+    def __init__(self, megabytes=16):
+        self.resize(megabytes)
+
+    def resize(self, megabytes):
+        entries = max(1, int(megabytes * 1024 * 1024) // ENTRY_BYTES)
+        # Размер - степень двойки, чтобы индекс брался маской
+        size = 1 << (entries.bit_length() - 1)
+        self.size = size
+        self.mask = size - 1
+        self.keys = array('Q', bytes(8 * size))
+        self.data = array('Q', bytes(8 * size))
+        self.generation = 0
+        self.reset_stats()
+
+    @property
+    def megabytes(self):
+        return self.size * ENTRY_BYTES / (1024 * 1024)
+
+    def clear(self):
+        self.keys = array('Q', bytes(8 * self.size))
+        self.data = array('Q', bytes(8 * self.size))
+        self.generation = 0
+
+    def new_search(self):
+        """Начало нового поиска: старые записи становятся кандидатами на замену"""
+        self.generation = (self.generation + 1) & 63
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0
+        self.stores = 0
+        self.replaced = 0
+        self.rejected = 0
+
+    def probe(self, key):
+        """(глубина, оценка, тип, ход) или None; ход None, если его нет"""
+        index = key & self.mask
+        self.probes += 1
+        stored = self.keys[index]
+        if stored != key:
+            if stored:
+                # Клетка занята другой позицией
+                self.collisions += 1
+            return None
+        self.hits += 1
+        data = self.data[index]
+        move = data & 0xFFFF
+        return ((data >> 18) & 127,
+                ((data >> 31) & 0x3FFFF) - SCORE_OFFSET,
+                (data >> 16) & 3,
+                None if move == NO_MOVE else move)
+
+    def store(self, key, depth, score, flag, move):
+        index = key & self.mask
+        stored = self.keys[index]
+        if stored and stored != key:
+            old = self.data[index]
+            if (old >> 25) & 63 == self.generation and (old >> 18) & 127 > depth:
+                # Глубокий результат текущего поиска ценнее
+                self.rejected += 1
+                return
+            self.replaced += 1
+        elif stored == key and move is None:
+            # Не теряем лучший ход, найденный раньше для этой же позиции
+            old_move = self.data[index] & 0xFFFF
+            if old_move != NO_MOVE:
+                move = old_move
+        self.stores += 1
+        self.keys[index] = key
+        self.data[index] = ((NO_MOVE if move is None else move)
+                            | (flag << 16)
+                            | (min(depth, 127) << 18)
+                            | (self.generation << 25)
+                            | ((score + SCORE_OFFSET) << 31))
+
+    def best_move(self, key):
+        entry = self.probe(key)
+        return entry[3] if entry else None
+
+    def hashfull(self):
+        """Заполненность в промилле по первой тысяче записей"""
+        sample = min(1000, self.size)
+        used = sum(1 for i in range(sample) if self.keys[i] and (self.data[i] >> 25) & 63 == self.generation)
+        return used * 1000 // sample
+
+    def stats(self):
+        probes = self.probes or 1
+        return {
+            'probes': self.probes,
+            'hits': self.hits,
+            'collisions': self.collisions,
+            'stores': self.stores,
+            'replaced': self.replaced,
+            'rejected': self.rejected,
+            'hit_rate': self.hits / probes,
+            'collision_rate': self.collisions / probes,
+        }
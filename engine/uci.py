@@ -0,0 +1,268 @@
+"""Интерфейс UCI: движок для шахматных оболочек и матчей движков.
+
+    python -m engine.uci
+
+Команды читаются из stdin в главном потоке, а поиск идет в отдельном, так
+что stop, ponderhit и isready обрабатываются сразу, даже посреди поиска.
+Поддерживаются uci, isready, ucinewgame, setoption (Hash, Threads),
+position startpos|fen ... moves ..., go (wtime, btime, winc, binc,
+movestogo, movetime, depth, nodes, infinite, ponder), stop, ponderhit, quit.
+После каждой итерации поиска выводится строка info с глубиной, оценкой,
+узлами, скоростью и главным вариантом.
+"""
+
+import sys
+import threading
+
+from engine.bitboard import Position, START_BOARD, WHITE, move_name
+from engine.parallel import ParallelSearcher, get_pool, shutdown_pool
+from engine.search import MATE, MAX_PLY, Searcher
+
+ENGINE_NAME = 'Chess by Vanya'
+ENGINE_AUTHOR = 'Ivan2812446'
+
+DEFAULT_HASH = 16
+MAX_HASH = 1024
+MAX_THREADS = 64
+# Запас на задержки оболочки и вывода, секунды
+MOVE_OVERHEAD = 0.05
+# Сколько ходов еще впереди, если оболочка не сказала (movestogo)
+DEFAULT_MOVES_TO_GO = 30
+
+
+def allocate_time(time_left, increment=0.0, moves_to_go=None):
+    """Время на ход в секундах по остатку на часах и добавке за ход"""
+    moves = moves_to_go or DEFAULT_MOVES_TO_GO
+    budget = time_left / moves + increment * 0.75
+    # Ход не должен съедать больше половины оставшегося времени
+    return max(0.01, min(budget, time_left / 2) - MOVE_OVERHEAD)
+
+
+def format_score(score):
+    """Оценка в записи UCI: 'cp 35' или 'mate 3' (в ходах, со знаком)"""
+    if abs(score) >= MATE - MAX_PLY:
+        plies = MATE - abs(score)
+        moves = (plies + 1) // 2
+        return f"mate {moves if score > 0 else -moves}"
+    return f"cp {score}"
+
+
+def parse_go(tokens):
+    """Параметры команды go: числа - числами, флаги - True"""
+    params = {}
+    flags = ('infinite', 'ponder')
+    i = 0
+    while i < len(tokens):
+        name = tokens[i]
+        if name in flags:
+            params[name] = True
+            i += 1
+        elif name == 'searchmoves':
+            # Ограничение корневых ходов не поддерживается
+            break
+        elif i + 1 < len(tokens):
+            try:
+                params[name] = int(tokens[i + 1])
+            except ValueError:
+                pass
+            i += 2
+        else:
+            i += 1
+    return params
+
+
+class UCIEngine:
+    """Состояние движка между командами и поиск в фоновом потоке"""
+
+    def __init__(self, out=None):
+        self.out = out or sys.stdout
+        self.hash_mb = DEFAULT_HASH
+        self.threads = 1
+        self.searcher = Searcher(self.hash_mb)
+        self.position = Position(START_BOARD)
+        self._output = threading.Lock()
+        self._thread = None
+        self._stop = None
+        # Поиск в режимах ponder и infinite не отдает ход, пока его не отпустят
+        self._release = None
+        self._pending_limits = None
+
+    def send(self, line):
+        with self._output:
+            self.out.write(line + '\n')
+            self.out.flush()
+
+    def handle(self, line):
+        """Выполняет одну команду; False - пора выходить"""
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == 'uci':
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH} min 1 max {MAX_HASH}")
+            self.send(f"option name Threads type spin default 1 min 1 max {MAX_THREADS}")
+            self.send("uciok")
+        elif command == 'isready':
+            self.send("readyok")
+        elif command == 'ucinewgame':
+            self.stop()
+            self.searcher.tt.clear()
+            self.searcher.ordering.clear()
+        elif command == 'setoption':
+            self.stop()
+            self.set_option(args)
+        elif command == 'position':
+            self.stop()
+            self.set_position(args)
+        elif command == 'go':
+            self.stop()
+            self.go(parse_go(args))
+        elif command == 'stop':
+            self.stop()
+        elif command == 'ponderhit':
+            self.ponderhit()
+        elif command == 'quit':
+            self.stop()
+            return False
+        return True
+
+    def set_option(self, args):
+        """setoption name <имя> value <значение>"""
+        text = ' '.join(args)
+        if not text.startswith('name '):
+            return
+        name, _, value = text[5:].partition(' value ')
+        name = name.strip().lower()
+        try:
+            if name == 'hash':
+                self.hash_mb = max(1, min(MAX_HASH, int(value)))
+                self.searcher = self._new_searcher()
+            elif name == 'threads':
+                self.threads = max(1, min(MAX_THREADS, int(value)))
+                self.searcher = self._new_searcher()
+        except ValueError:
+            self.send(f"info string неверное значение {value} для {name}")
+
+    def _new_searcher(self):
+        # Пул создается здесь, в главном потоке, а не при первом поиске: fork
+        # из потока поиска, пока главный поток ждет stdin, оставлял процессам
+        # занятую блокировку stdin, и они зависали при старте
+        shutdown_pool()
+        if self.threads > 1:
+            get_pool(self.threads, self.hash_mb)
+            return ParallelSearcher(self.threads, self.hash_mb)
+        return Searcher(self.hash_mb)
+
+    def set_position(self, args):
+        """position startpos|fen <FEN> [moves ...]"""
+        if 'moves' in args:
+            index = args.index('moves')
+            setup, moves = args[:index], args[index + 1:]
+        else:
+            setup, moves = args, []
+        if setup[:1] == ['fen']:
+            try:
+                position = Position.from_fen(' '.join(setup[1:]))
+                position.validate()
+            except ValueError as e:
+                self.send(f"info string {e}")
+                return
+        else:
+            position = Position(START_BOARD)
+        for text in moves:
+            move = position.parse_move(text)
+            if move is None:
+                self.send(f"info string нелегальный ход {text}")
+                break
+            position.make_move(move)
+        self.position = position
+
+    def _limits(self, params):
+        """Бюджет поиска из параметров go"""
+        limits = {'depth': min(params.get('depth', MAX_PLY), MAX_PLY)}
+        if 'nodes' in params:
+            limits['nodes'] = params['nodes']
+        if 'movetime' in params:
+            limits['movetime'] = max(0.01, params['movetime'] / 1000 - MOVE_OVERHEAD)
+        else:
+            white = self.position.side == WHITE
+            clock = params.get('wtime' if white else 'btime')
+            if clock is not None:
+                increment = params.get('winc' if white else 'binc', 0)
+                limits['movetime'] = allocate_time(clock / 1000, increment / 1000, params.get('movestogo'))
+        return limits
+
+    def go(self, params):
+        limits = self._limits(params)
+        waiting = params.get('ponder') or params.get('infinite')
+        self._stop = threading.Event()
+        self._release = threading.Event()
+        if waiting:
+            # Ищем без бюджета, он вступит в силу на ponderhit
+            self._pending_limits = limits if params.get('ponder') else None
+            limits = {'depth': limits['depth']}
+        else:
+            self._release.set()
+        position = self.position.copy()
+        self._thread = threading.Thread(target=self._search, args=(position, limits), daemon=True)
+        self._thread.start()
+
+    def _search(self, position, limits):
+        result = self.searcher.search(position, info=self._info, stop=self._stop, **limits)
+        # В ponder и infinite ход отдается только после stop или ponderhit
+        self._release.wait()
+        move = result['move']
+        if move is None:
+            # Поиск остановили до конца первой итерации
+            moves = position.legal_moves()
+            move = moves[0] if moves else None
+        if move is None:
+            self.send("bestmove 0000")
+        elif len(result['pv']) > 1 and result['pv'][0] == move:
+            self.send(f"bestmove {move_name(move)} ponder {move_name(result['pv'][1])}")
+        else:
+            self.send(f"bestmove {move_name(move)}")
+
+    def _info(self, result):
+        time_ms = int(result['time'] * 1000)
+        pv = ' '.join(move_name(move) for move in result['pv'])
+        self.send(f"info depth {result['depth']} score {format_score(result['score'])} "
+                  f"nodes {result['nodes']} nps {result['nps']} time {time_ms} "
+                  f"hashfull {self.searcher.tt.hashfull()} pv {pv}")
+
+    def ponderhit(self):
+        """Соперник сыграл ожидаемый ход: поиск получает бюджет и отдаст ход
+        по его окончании"""
+        if self._thread is None or self._release.is_set():
+            return
+        limits = self._pending_limits or {}
+        self.searcher.ponderhit(limits.get('nodes'), limits.get('movetime'))
+        self._release.set()
+
+    def stop(self):
+        """Останавливает поиск и ждет, пока он выведет bestmove"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._release.set()
+        self._thread.join()
+        self._thread = None
+
+
+def main(stream=None):
+    engine = UCIEngine()
+    stream = stream or sys.stdin
+    try:
+        for line in stream:
+            if not engine.handle(line.strip()):
+                break
+    finally:
+        engine.stop()
+        shutdown_pool()
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
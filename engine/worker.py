@@ -0,0 +1,101 @@
+"""Поиск хода в фоновом потоке, чтобы окно не замирало, пока бот думает."""
+
+import threading
+import time
+
+from engine.search import MAX_PLY
+
+
+class SearchJob:
+    """Задание на поиск с возможностью отмены.
+
+    Поиск идет на копии позиции, поэтому игра может спокойно рисовать
+    доску. min_time - минимальное время "раздумья" бота: результат
+    отдается не раньше, чем оно пройдет, но поиск этим не тормозится.
+
+    С ponder_move задание думает за бота в ходе соперника: ожидаемый ответ
+    делается на копии, и поиск идет без бюджета узлов и времени. Если
+    соперник сыграл этот ход, ponderhit() превращает поиск в обычный, и
+    таблица и дерево уже посчитанных итераций не пропадают; иначе задание
+    отменяют через cancel().
+    """
+
+    def __init__(self, searcher, position, limits, min_time=0.0, ponder_move=None):
+        self.searcher = searcher
+        self.position = position.copy()
+        self.ponder_move = ponder_move
+        self.ponder_hit = False
+        if ponder_move is not None:
+            self.position.make_move(ponder_move)
+            limits = {'depth': limits.get('depth', MAX_PLY)}
+        self.limits = limits
+        self.min_time = min_time
+        self.result = None
+        self.started = time.perf_counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        self.result = self.searcher.search(self.position, stop=self._stop, **self.limits)
+
+    @property
+    def cancelled(self):
+        return self._stop.is_set()
+
+    def running(self):
+        return self._thread.is_alive()
+
+    def poll(self):
+        """Результат поиска, если он готов и минимальное время вышло, иначе None"""
+        if self._thread.is_alive() or self.cancelled:
+            return None
+        if time.perf_counter() - self.started < self.min_time:
+            return None
+        return self.result
+
+    def pondering(self):
+        return self.ponder_move is not None
+
+    def ponderhit(self, limits):
+        """Соперник сыграл ожидаемый ход: дальше это обычный поиск с бюджетом
+        limits, отсчитанным от начала раздумий, - сила та же, а ответ раньше"""
+        self.searcher.ponderhit(limits.get('nodes'), limits.get('movetime'), self.started)
+        self.ponder_move = None
+        self.ponder_hit = True
+        self.limits = limits
+        # Минимальное время раздумья отсчитывается от хода соперника
+        self.started = time.perf_counter()
+
+    def cancel(self, wait=True):
+        """Останавливает поиск; с wait=True дожидается завершения потока"""
+        self._stop.set()
+        if wait:
+            self._thread.join()
+
+
+class ReadyJob:
+    """Уже известный ход (например, из дебютной книги) с интерфейсом
+    SearchJob: главный цикл забирает его так же, после min_time"""
+
+    def __init__(self, result, min_time=0.0):
+        self.result = result
+        self.min_time = min_time
+        self.started = time.perf_counter()
+        self.ponder_move = None
+        self.ponder_hit = False
+        self.cancelled = False
+
+    def running(self):
+        return False
+
+    def pondering(self):
+        return False
+
+    def poll(self):
+        if self.cancelled or time.perf_counter() - self.started < self.min_time:
+            return None
+        return self.result
+
+    def cancel(self, wait=True):
+        self.cancelled = True
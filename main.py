@@ -1,20 +1,42 @@
 import pygame
 import sys
 import time
-import random
 import json
 import os
+from collections import OrderedDict
 from datetime import datetime
 
-# Инициализация Pygame
-pygame.init()
-pygame.font.init()
+from engine.bitboard import QUEEN, move_from, move_name, move_promotion, move_to
+from engine.book import get_book
+from engine.game import Game
+from engine.parallel import ParallelSearcher
+from engine.search import DIFFICULTY_LEVELS, Searcher
+from engine.tablebase import get_tablebases
+from engine.worker import ReadyJob, SearchJob
 
 # Константы
 WIDTH, HEIGHT = 800, 600
 BOARD_SIZE = 480
 SQUARE_SIZE = BOARD_SIZE // 8
-FPS = 60
+FPS = 60  # Частота кадров во время анимации хода
+# Главный цикл спит в ожидании событий, пока на экране ничего не меняется;
+# False - прежний цикл с постоянными FPS кадрами в секунду
+IDLE_WAIT = True
+IDLE_TIMEOUT_MS = 1000  # Самое долгое ожидание без событий
+ENGINE_POLL_FPS = 20  # Как часто проверять, закончил ли бот поиск
+TEXT_CACHE_SIZE = 512  # Готовых надписей в кэше; хватает на все экраны
+BOT_MIN_THINK_TIME = 0.5  # Бот не отвечает быстрее, чем за полсекунды
+# Число процессов для поиска бота; 1 - поиск в одном потоке без пула.
+# Окно создается только в main(), поэтому воркеры, запущенные и через spawn,
+# импортируют модуль без SDL
+BOT_WORKERS = 1
+# Бот думает в ходе игрока над ожидаемым ответом
+BOT_PONDER = True
+# Дебютная книга бота (python -m engine.book build); без файла бот считает сам
+BOOK_PATH = '_internal/book.bin'
+# Эндшпильные таблицы (python -m engine.tablebase build -o _internal/tablebases):
+# бот играет по ним без поиска, а партия без материала для мата - ничья
+TABLEBASE_DIR = '_internal/tablebases'
 
 # Цвета
 WHITE = (255, 255, 255)
@@ -30,58 +52,174 @@ GREEN = (0, 200, 0)
 GOLD = (255, 215, 0)
 DARK_RED = (180, 0, 0)
 
-# Шрифты
-font_small = pygame.font.SysFont('arial', 16)
-font_medium = pygame.font.SysFont('arial', 24)
-font_large = pygame.font.SysFont('arial', 32)
-font_title = pygame.font.SysFont('arial', 48, bold=True)
+# Шрифты, экран и часы создает init_display() при запуске игры, а не импорт
+# модуля: так процессы-воркеры и тесты не поднимают SDL
+font_small = font_medium = font_large = font_title = None
+screen = None
+clock = None
 
-# Создаем экран
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Шахматы")
-clock = pygame.time.Clock()
 
-# Загрузка изображений фигур из файлов
-def load_pieces_from_files():
-    pieces = {}
-    try:
-        # Создаем папку для фигур, если её нет
-        if not os.path.exists('pieces'):
-            os.makedirs('pieces')
-            print("Создана папка 'pieces'. Пожалуйста, поместите туда файлы фигур:")
-            print("wK.png, wQ.png, wR.png, wB.png, wN.png, wP.png (белые)")
-            print("bK.png, bQ.png, bR.png, bB.png, bN.png, bP.png (черные)")
-        
-        # Белые фигуры
-        pieces['white_king'] = pygame.transform.scale(pygame.image.load('_internal/pieces/wK.png'), (SQUARE_SIZE - 10, SQUARE_SIZE - 10))
-        pieces['white_queen'] = pygame.transform.scale(pygame.image.load('_internal/pieces/wQ.png'), (SQUARE_SIZE - 10, SQUARE_SIZE - 10))
-        pieces['white_rook'] = pygame.transform.scale(pygame.image.load('_internal/pieces/wR.png'), (SQUARE_SIZE - 10, SQUARE_SIZE - 10))
-        pieces['white_bishop'] = pygame.transform.scale(pygame.image.load('_internal/pieces/wB.png'), (SQUARE_SIZE - 10, SQUARE_SIZE - 10))
-        pieces['white_knight'] = pygame.transform.scale(pygame.image.load('_internal/pieces/wN.png'), (SQUARE_SIZE - 10, SQUARE_SIZE - 10))
-        pieces['white_pawn'] = pygame.transform.scale(pygame.image.load('_internal/pieces/wP.png'), (SQUARE_SIZE - 10, SQUARE_SIZE - 10))
-        
-        # Черные фигуры
-        pieces['black_king'] = pygame.transform.scale(pygame.image.load('_internal/pieces/bK.png'), (SQUARE_SIZE - 10, SQUARE_SIZE - 10))
-        pieces['black_queen'] = pygame.transform.scale(pygame.image.load('_internal/pieces/bQ.png'), (SQUARE_SIZE - 10, SQUARE_SIZE - 10))
-        pieces['black_rook'] = pygame.transform.scale(pygame.image.load('_internal/pieces/bR.png'), (SQUARE_SIZE - 10, SQUARE_SIZE - 10))
-        pieces['black_bishop'] = pygame.transform.scale(pygame.image.load('_internal/pieces/bB.png'), (SQUARE_SIZE - 10, SQUARE_SIZE - 10))
-        pieces['black_knight'] = pygame.transform.scale(pygame.image.load('_internal/pieces/bN.png'), (SQUARE_SIZE - 10, SQUARE_SIZE - 10))
-        pieces['black_pawn'] = pygame.transform.scale(pygame.image.load('_internal/pieces/bP.png'), (SQUARE_SIZE - 10, SQUARE_SIZE - 10))
+def init_display():
+    global font_small, font_medium, font_large, font_title, screen, clock
+    if screen is not None:
+        return
+    pygame.init()
+    pygame.font.init()
+    
+    # Шрифты
+    font_small = pygame.font.SysFont('arial', 16)
+    font_medium = pygame.font.SysFont('arial', 24)
+    font_large = pygame.font.SysFont('arial', 32)
+    font_title = pygame.font.SysFont('arial', 48, bold=True)
+    
+    # Создаем экран
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Шахматы")
+    clock = pygame.time.Clock()
+
+
+class TextCache:
+    """Готовые надписи по ключу (шрифт, текст, цвет). Одни и те же строки
+    рисуются каждый кадр, а font.render - самая дорогая часть кадра; при
+    переполнении вытесняется надпись, которую дольше всех не просили"""
+
+    def __init__(self, size=TEXT_CACHE_SIZE):
+        self.size = size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.size:
+            self.surfaces.popitem(last=False)
+        return surface
+    
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits, 'misses': self.misses, 'size': len(self.surfaces),
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+text_cache = TextCache()
+# Полупрозрачные заливки (подсветка клеток, фоны, затемнение) - по размеру и цвету
+_overlays = {}
+overlay_hits = 0
+
+
+def render_text(font, text, color):
+    return text_cache.render(font, text, color)
+
+
+def overlay_surface(size, color):
+    """Готовая поверхность size, залитая цветом с альфа-каналом; общая для
+    всех кадров, поэтому менять ее нельзя"""
+    global overlay_hits
+    key = (size, color)
+    surface = _overlays.get(key)
+    if surface is None:
+        surface = pygame.Surface(size, pygame.SRCALPHA)
+        surface.fill(color)
+        _overlays[key] = surface
+    else:
+        overlay_hits += 1
+    return surface
+
+# Файлы фигур: wK.png ... bP.png
+PIECES_DIR = '_internal/pieces'
+PIECE_LETTERS = {
+    'king': 'K', 'queen': 'Q', 'rook': 'R',
+    'bishop': 'B', 'knight': 'N', 'pawn': 'P'
+}
+
+
+class PieceAssets:
+    """Изображения фигур на весь процесс. PNG декодируются один раз в общий
+    атлас в формате экрана (convert_alpha), а фигуры нужного размера
+    масштабируются из него при первом запросе и дальше берутся из кэша.
+    Без файлов в том же кэше лежат фигуры, нарисованные программно"""
+
+    def __init__(self, directory=PIECES_DIR):
+        self.directory = directory
+        self.atlas = None
+        self.cells = {}  # Имя фигуры -> ее прямоугольник в атласе
+        self.fallback = False
+        self.sizes = {}  # Размер -> {имя фигуры: поверхность}
+        self.hits = 0
+    
+    def load(self):
+        if self.atlas is not None or self.fallback:
+            return
+        try:
+            # Создаем папку для фигур, если её нет
+            if not os.path.exists('pieces'):
+                os.makedirs('pieces')
+                print("Создана папка 'pieces'. Пожалуйста, поместите туда файлы фигур:")
+                print("wK.png, wQ.png, wR.png, wB.png, wN.png, wP.png (белые)")
+                print("bK.png, bQ.png, bR.png, bB.png, bN.png, bP.png (черные)")
+            
+            images = {}
+            for color in ('white', 'black'):
+                for piece, letter in PIECE_LETTERS.items():
+                    path = os.path.join(self.directory, f"{color[0]}{letter}.png")
+                    images[f"{color}_{piece}"] = pygame.image.load(path)
+        except Exception as e:
+            print(f"Ошибка загрузки изображений: {e}")
+            print("Создаем фигуры программно...")
+            self.fallback = True
+            return
         
+        # Атлас: белые фигуры в первой строке, черные во второй
+        cell_w = max(image.get_width() for image in images.values())
+        cell_h = max(image.get_height() for image in images.values())
+        atlas = pygame.Surface((cell_w * 6, cell_h * 2), pygame.SRCALPHA)
+        for i, (name, image) in enumerate(images.items()):
+            rect = image.get_rect(topleft=((i % 6) * cell_w, (i // 6) * cell_h))
+            atlas.blit(image, rect)
+            self.cells[name] = rect
+        self.atlas = atlas.convert_alpha()
         print("Фигуры успешно загружены из файлов")
-    except Exception as e:
-        print(f"Ошибка загрузки изображений: {e}")
-        print("Создаем фигуры программно...")
-        pieces = create_fallback_pieces()
     
-    return pieces
+    def pieces(self, size):
+        """Словарь имя фигуры -> поверхность size x size"""
+        pieces = self.sizes.get(size)
+        if pieces is not None:
+            self.hits += 1
+            return pieces
+        self.load()
+        if self.fallback:
+            pieces = create_fallback_pieces(size)
+        else:
+            pieces = {name: pygame.transform.scale(self.atlas.subsurface(rect), (size, size))
+                      for name, rect in self.cells.items()}
+        self.sizes[size] = pieces
+        return pieces
+
+
+piece_assets = PieceAssets()
+
+
+# Загрузка изображений фигур из файлов
+def load_pieces_from_files():
+    return piece_assets.pieces(SQUARE_SIZE - 10)
 
 # Создание фигур программно (запасной вариант)
-def create_fallback_pieces():
+def create_fallback_pieces(size=SQUARE_SIZE - 10):
     pieces = {}
+    font = pygame.font.SysFont('arial', size // 2)
     for color in ['white', 'black']:
         for piece in ['pawn', 'rook', 'knight', 'bishop', 'queen', 'king']:
-            surf = pygame.Surface((SQUARE_SIZE - 10, SQUARE_SIZE - 10), pygame.SRCALPHA)
+            surf = pygame.Surface((size, size), pygame.SRCALPHA)
             
             if color == 'white':
                 fill_color = WHITE
@@ -91,182 +229,278 @@ def create_fallback_pieces():
                 outline_color = (20, 20, 20)
             
             # Рисуем основу фигуры
-            pygame.draw.circle(surf, fill_color, ((SQUARE_SIZE-10)//2, (SQUARE_SIZE-10)//2), (SQUARE_SIZE-10)//2 - 5)
-            pygame.draw.circle(surf, outline_color, ((SQUARE_SIZE-10)//2, (SQUARE_SIZE-10)//2), (SQUARE_SIZE-10)//2 - 5, 2)
+            pygame.draw.circle(surf, fill_color, (size // 2, size // 2), size // 2 - 5)
+            pygame.draw.circle(surf, outline_color, (size // 2, size // 2), size // 2 - 5, 2)
             
             # Добавляем букву для обозначения фигуры
-            piece_letters = {
-                'king': 'K', 'queen': 'Q', 'rook': 'R', 
-                'bishop': 'B', 'knight': 'N', 'pawn': 'P'
-            }
-            
-            font = pygame.font.SysFont('arial', (SQUARE_SIZE-10)//2)
-            text = font.render(piece_letters[piece], True, outline_color)
-            text_rect = text.get_rect(center=((SQUARE_SIZE-10)//2, (SQUARE_SIZE-10)//2))
+            text = font.render(PIECE_LETTERS[piece], True, outline_color)
+            text_rect = text.get_rect(center=(size // 2, size // 2))
             surf.blit(text, text_rect)
             
             pieces[f"{color}_{piece}"] = surf
     
     return pieces
 
-# Класс для управления игрой
-class ChessGame:
-    def __init__(self, mode="friend", difficulty="easy", timer_enabled=False):
-        self.board = [
-            ['black_rook', 'black_knight', 'black_bishop', 'black_queen', 'black_king', 'black_bishop', 'black_knight', 'black_rook'],
-            ['black_pawn'] * 8,
-            [None] * 8,
-            [None] * 8,
-            [None] * 8,
-            [None] * 8,
-            ['white_pawn'] * 8,
-            ['white_rook', 'white_knight', 'white_bishop', 'white_queen', 'white_king', 'white_bishop', 'white_knight', 'white_rook']
-        ]
-        self.current_player = 'white'
-        self.selected_piece = None
-        self.valid_moves = []
-        self.mode = mode  # 'friend' или 'bot'
-        self.difficulty = difficulty
+# Области экрана партии, которые перерисовываются по отдельности
+TIMER_RECTS = (pygame.Rect(35, 15, 80, 30), pygame.Rect(35, 535, 80, 30))
+TIMER_TEXT_POS = ((40, 20), (40, 540))
+HISTORY_RECT = pygame.Rect(530, 60, 250, 480)
+CHECK_RECT = pygame.Rect(WIDTH//2 - 50, 15, 100, 40)
+BOARD_RECT = pygame.Rect(40, 60, BOARD_SIZE, BOARD_SIZE)
+
+# Пустая доска с координатами и фоном панели истории; рисуется один раз
+_board_background = None
+
+
+def board_background():
+    global _board_background
+    if _board_background is None:
+        surface = pygame.Surface((WIDTH, HEIGHT)).convert()
+        surface.fill(LIGHT_BROWN)
+        for row in range(8):
+            for col in range(8):
+                color = LIGHT_BROWN if (row + col) % 2 == 0 else DARK_BROWN
+                pygame.draw.rect(surface, color, square_rect(row, col))
+                
+                # Добавляем координаты для удобства
+                if row == 7:
+                    coord_text = font_small.render(chr(97 + col), True, BLACK if color == LIGHT_BROWN else WHITE)
+                    surface.blit(coord_text, (40 + col * SQUARE_SIZE + SQUARE_SIZE - 15, 60 + row * SQUARE_SIZE + SQUARE_SIZE - 15))
+                if col == 0:
+                    coord_text = font_small.render(str(8 - row), True, BLACK if color == LIGHT_BROWN else WHITE)
+                    surface.blit(coord_text, (40 + col * SQUARE_SIZE + 5, 60 + row * SQUARE_SIZE + 5))
+        
+        surface.blit(overlay_surface(HISTORY_RECT.size, (255, 255, 255, 200)), HISTORY_RECT)
+        history_title = font_medium.render("История ходов:", True, BLACK)
+        surface.blit(history_title, (540, 70))
+        _board_background = surface
+    return _board_background
+
+
+def square_rect(row, col):
+    return pygame.Rect(40 + col * SQUARE_SIZE, 60 + row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+
+
+def squares_under(rect):
+    """Клетки доски, которые задевает прямоугольник"""
+    rect = rect.clip(BOARD_RECT)
+    if not rect.width or not rect.height:
+        return []
+    cols = range((rect.left - 40) // SQUARE_SIZE, (rect.right - 1 - 40) // SQUARE_SIZE + 1)
+    rows = range((rect.top - 60) // SQUARE_SIZE, (rect.bottom - 1 - 60) // SQUARE_SIZE + 1)
+    return [row * 8 + col for row in rows for col in cols]
+
+
+class BoardRenderer:
+    """Отрисовка партии по измененным областям. Пустая доска берется из
+    готового фона, а кадр перерисовывает только клетки, у которых поменялись
+    фигура или подсветка, клетки под анимацией, таймеры, надпись о шахе и
+    историю - если они изменились. draw() возвращает прямоугольники для
+    pygame.display.update; кадр без изменений стоит почти ничего"""
+
+    def __init__(self, game):
+        self.game = game
+        square = (SQUARE_SIZE, SQUARE_SIZE)
+        self.highlights = {
+            'check': overlay_surface(square, (255, 0, 0, 100)),
+            'selected': overlay_surface(square, HIGHLIGHT),
+            'move': overlay_surface(square, MOVE_HIGHLIGHT),
+        }
+        self.check_bg = overlay_surface(CHECK_RECT.size, (255, 255, 255, 200))
+        self.invalidate()
+    
+    def invalidate(self):
+        """Следующий кадр рисуется целиком (новый экран, окно было закрыто)"""
+        self.squares = [None] * 64
+        self.timers = None
+        self.timer_rects = list(TIMER_RECTS)
+        self.history_size = None
+        self.check_shown = None
+        self.anim_rect = None
         self.game_over = False
-        self.winner = None
-        self.move_history = []
-        self.animation = None
-        self.timer_enabled = timer_enabled
-        self.white_time = 600  # 10 минут в секундах
-        self.black_time = 600
-        self.last_time_update = time.time()
-        self.pieces = load_pieces_from_files()
-        self.check_position = None  # Позиция короля под шахом
+        self.full = True
     
-    def get_piece(self, row, col):
-        if 0 <= row < 8 and 0 <= col < 8:
-            return self.board[row][col]
-        return None
+    def square_state(self, row, col, moves):
+        game = self.game
+        piece = game.board[row][col]
+        if piece and game.animation and game.animation['piece'] == piece and (row, col) == game.selected_piece:
+            piece = None
+        if (row, col) == game.selected_piece:
+            highlight = 'selected'
+        elif (row, col) in moves:
+            highlight = 'move'
+        else:
+            highlight = None
+        return piece, (row, col) == game.check_position, highlight
+    
+    def draw_square(self, screen, row, col, state):
+        rect = square_rect(row, col)
+        screen.blit(board_background(), rect, rect)
+        piece, check, highlight = state
+        # Подсвечиваем клетку под шахом и возможные ходы
+        if check:
+            screen.blit(self.highlights['check'], rect)
+        if highlight:
+            screen.blit(self.highlights[highlight], rect)
+        if piece:
+            screen.blit(self.game.pieces[piece], (rect.x + 5, rect.y + 5))
+        return rect
     
-    def find_king(self, color):
-        """Находит позицию короля указанного цвета"""
+    def draw(self, screen):
+        game = self.game
+        background = board_background()
+        if game.game_over != self.game_over:
+            self.invalidate()
+            self.game_over = game.game_over
+        full = self.full
+        self.full = False
+        dirty = []
+        if full:
+            screen.blit(background, (0, 0))
+        
+        # Положение анимируемой фигуры
+        anim_rect = None
+        if game.animation:
+            elapsed = time.time() - game.animation['start_time']
+            progress = min(elapsed / game.animation['duration'], 1.0)
+            
+            if progress < 1.0:
+                # Интерполяция позиции
+                x = game.animation['from_pos'][0] + (game.animation['to_pos'][0] - game.animation['from_pos'][0]) * progress
+                y = game.animation['from_pos'][1] + (game.animation['to_pos'][1] - game.animation['from_pos'][1]) * progress
+                anim_rect = pygame.Rect(int(x) + 5, int(y) + 5, SQUARE_SIZE - 10, SQUARE_SIZE - 10)
+            else:
+                game.animation = None
+        
+        # Клетки: изменившиеся и те, по которым прошла анимация
+        covered = set()
+        for rect in (self.anim_rect, anim_rect):
+            if rect:
+                covered.update(squares_under(rect))
+        moves = set(game.valid_moves) if game.selected_piece else ()
+        redrawn = []
         for row in range(8):
             for col in range(8):
-                piece = self.get_piece(row, col)
-                if piece and piece == f"{color}_king":
-                    return (row, col)
-        return None
+                index = row * 8 + col
+                state = self.square_state(row, col, moves)
+                if full or state != self.squares[index] or index in covered:
+                    self.squares[index] = state
+                    redrawn.append(self.draw_square(screen, row, col, state))
+        if anim_rect:
+            screen.blit(game.pieces[game.animation['piece']], anim_rect)
+        self.anim_rect = anim_rect
+        dirty.extend(redrawn)
+        
+        # Таймеры (если включены): только когда сменилась секунда. Нижний
+        # заходит на край доски, поэтому рисуется и после ее клеток
+        if game.timer_enabled:
+            timers = (self.clock_text(game.white_time), self.clock_text(game.black_time))
+            if any(rect.collidelist(redrawn) != -1 for rect in self.timer_rects):
+                self.timers = None
+            if timers != self.timers:
+                self.timers = timers
+                for i, (text, color) in enumerate(timers):
+                    # Используем контрастные цвета для лучшей видимости
+                    surface = render_text(font_medium, text, color)
+                    area = self.timer_rects[i]
+                    screen.blit(background, area, area)
+                    # Фон для таймеров для лучшей читаемости
+                    pygame.draw.rect(screen, LIGHT_BROWN, TIMER_RECTS[i])
+                    screen.blit(surface, TIMER_TEXT_POS[i])
+                    self.timer_rects[i] = TIMER_RECTS[i].union(surface.get_rect(topleft=TIMER_TEXT_POS[i]))
+                    dirty.append(area.union(self.timer_rects[i]))
+        
+        # Историю ходов - только после нового хода
+        if len(game.move_history) != self.history_size:
+            self.history_size = len(game.move_history)
+            screen.blit(background, HISTORY_RECT, HISTORY_RECT)
+            self.draw_history(screen)
+            dirty.append(HISTORY_RECT)
+        
+        # Показываем предупреждение о шахе только если есть текущий шах
+        check_shown = bool(game.check_position) and not game.game_over
+        if check_shown != self.check_shown:
+            self.check_shown = check_shown
+            screen.blit(background, CHECK_RECT, CHECK_RECT)
+            if check_shown:
+                # Фон для лучшей видимости текста
+                screen.blit(self.check_bg, CHECK_RECT)
+                check_text = render_text(font_medium, "ШАХ!", RED)
+                screen.blit(check_text, (WIDTH//2 - check_text.get_width()//2, 20))
+            dirty.append(CHECK_RECT)
+        
+        # Если игра окончена, затемнение лежит на всем экране: любое
+        # изменение под ним - полный кадр
+        if game.game_over:
+            if dirty and not full:
+                self.invalidate()
+                return self.draw(screen)
+            if full:
+                self.draw_game_over(screen)
+        
+        if full:
+            return [screen.get_rect()]
+        return dirty
     
-    def is_square_attacked(self, row, col, attacker_color):
-        """Проверяет, атакована ли клетка фигурами указанного цвета"""
-        # Проверяем атаки пешками
-        direction = 1 if attacker_color == 'white' else -1
-        for dc in [-1, 1]:
-            r, c = row - direction, col + dc
-            if 0 <= r < 8 and 0 <= c < 8:
-                piece = self.get_piece(r, c)
-                if piece and piece.startswith(attacker_color) and piece.endswith('pawn'):
-                    return True
-        
-        # Проверяем атаки конями
-        knight_moves = [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
-        for dr, dc in knight_moves:
-            r, c = row + dr, col + dc
-            if 0 <= r < 8 and 0 <= c < 8:
-                piece = self.get_piece(r, c)
-                if piece and piece.startswith(attacker_color) and piece.endswith('knight'):
-                    return True
-        
-        # Проверяем атаки по прямым линиям (ладьи, ферзи)
-        for dr, dc in [(1, 0), (-1, 0), (0, 1), (0, -1)]:
-            for i in range(1, 8):
-                r, c = row + i*dr, col + i*dc
-                if not (0 <= r < 8 and 0 <= c < 8):
-                    break
-                piece = self.get_piece(r, c)
-                if piece:
-                    if piece.startswith(attacker_color) and (piece.endswith('rook') or piece.endswith('queen')):
-                        return True
-                    break
-        
-        # Проверяем атаки по диагоналям (слоны, ферзи)
-        for dr, dc in [(1, 1), (1, -1), (-1, 1), (-1, -1)]:
-            for i in range(1, 8):
-                r, c = row + i*dr, col + i*dc
-                if not (0 <= r < 8 and 0 <= c < 8):
-                    break
-                piece = self.get_piece(r, c)
-                if piece:
-                    if piece.startswith(attacker_color) and (piece.endswith('bishop') or piece.endswith('queen')):
-                        return True
-                    break
-        
-        # Проверяем атаки королем
-        for dr in [-1, 0, 1]:
-            for dc in [-1, 0, 1]:
-                if dr == 0 and dc == 0:
-                    continue
-                r, c = row + dr, col + dc
-                if 0 <= r < 8 and 0 <= c < 8:
-                    piece = self.get_piece(r, c)
-                    if piece and piece.startswith(attacker_color) and piece.endswith('king'):
-                        return True
-        
-        return False
+    @staticmethod
+    def clock_text(seconds):
+        color = DARK_RED if seconds < 60 else BLACK
+        return f"{int(seconds // 60):02d}:{int(seconds % 60):02d}", color
     
-    def is_in_check(self, color):
-        """Проверяет, находится ли король указанного цвета под шахом"""
-        king_pos = self.find_king(color)
-        if not king_pos:
-            return False
-        attacker_color = 'black' if color == 'white' else 'white'
-        return self.is_square_attacked(king_pos[0], king_pos[1], attacker_color)
+    def draw_history(self, screen):
+        # Показываем последние 10 ходов
+        move_history = self.game.move_history
+        start_idx = max(0, len(move_history) - 10)
+        for i, move in enumerate(move_history[start_idx:]):
+            piece_name = move['piece'].split('_')[1]
+            piece_names = {
+                'pawn': 'П', 'rook': 'Л', 'knight': 'К',
+                'bishop': 'С', 'queen': 'Ф', 'king': 'Кр'
+            }
+            move_text = f"{i+1+start_idx}. {piece_names.get(piece_name, piece_name)} {chr(97+move['from'][1])}{8-move['from'][0]}→{chr(97+move['to'][1])}{8-move['to'][0]}"
+            if move['captured']:
+                move_text += " ×"
+            move_surface = render_text(font_small, move_text, BLACK)
+            screen.blit(move_surface, (540, 110 + i * 25))
     
-    def is_checkmate(self, color):
-        """Проверяет, является ли позиция матом для указанного цвета"""
-        # Если король не под шахом, это не мат
-        if not self.is_in_check(color):
-            return False
+    def draw_game_over(self, screen):
+        game = self.game
+        screen.blit(overlay_surface((WIDTH, HEIGHT), (0, 0, 0, 150)), (0, 0))
         
-        # Проверяем, есть ли хоть один ход, который убирает шах
-        for row in range(8):
-            for col in range(8):
-                piece = self.get_piece(row, col)
-                if piece and piece.startswith(color):
-                    # Получаем все возможные ходы для этой фигуры
-                    moves = self.calculate_valid_moves(row, col)
-                    for move_row, move_col in moves:
-                        # Пробуем сделать ход
-                        original_piece = self.get_piece(move_row, move_col)
-                        self.board[move_row][move_col] = piece
-                        self.board[row][col] = None
-                        
-                        # Проверяем, ушел ли король из-под шаха
-                        still_in_check = self.is_in_check(color)
-                        
-                        # Возвращаем доску в исходное состояние
-                        self.board[row][col] = piece
-                        self.board[move_row][move_col] = original_piece
-                        
-                        # Если нашелся ход, убирающий шах, это не мат
-                        if not still_in_check:
-                            return False
-        
-        # Если ни один ход не убирает шах, это мат
-        return True
-    
-    def is_stalemate(self, color):
-        """Проверяет, является ли позиция патом для указанного цвета"""
-        # Если король под шахом, это не пат
-        if self.is_in_check(color):
-            return False
+        if game.winner:
+            winner_text = render_text(font_large, f"Мат! Победили {'белые' if game.winner == 'white' else 'черные'}", WHITE)
+        else:
+            winner_text = render_text(font_large, "Пат! Ничья" if game.draw_reason == 'пат' else "Ничья: недостаточно материала", WHITE)
         
-        # Проверяем, есть ли хоть один возможный ход
-        for row in range(8):
-            for col in range(8):
-                piece = self.get_piece(row, col)
-                if piece and piece.startswith(color):
-                    moves = self.calculate_valid_moves(row, col)
-                    if moves:
-                        return False
+        screen.blit(winner_text, (WIDTH//2 - winner_text.get_width()//2, HEIGHT//2 - 50))
         
-        # Если нет возможных ходов и король не под шахом, это пат
-        return True
+        restart_text = render_text(font_medium, "Нажмите ESC для возврата в меню", WHITE)
+        screen.blit(restart_text, (WIDTH//2 - restart_text.get_width()//2, HEIGHT//2 + 20))
+
+# Класс для управления игрой: правила - в engine.game.Game, здесь выбор
+# фигуры, анимация, таймер и бот
+class ChessGame(Game):
+    def __init__(self, mode="friend", difficulty="easy", timer_enabled=False, debug=False, fen=None):
+        super().__init__(debug=debug, tablebases=get_tablebases(TABLEBASE_DIR), fen=fen)
+        self.selected_piece = None
+        self.valid_moves = []
+        self.mode = mode  # 'friend' или 'bot'
+        self.difficulty = difficulty
+        self.animation = None
+        self.timer_enabled = timer_enabled
+        self.white_time = 600  # 10 минут в секундах
+        self.black_time = 600
+        self.last_time_update = time.time()
+        self.pieces = load_pieces_from_files()
+        self.engine = ParallelSearcher(BOT_WORKERS) if BOT_WORKERS > 1 else Searcher()
+        self.bot_job = None  # Фоновый поиск хода бота
+        self.ponder_job = None  # Раздумья бота в ходе игрока
+        self.book = get_book(BOOK_PATH) if mode == 'bot' else None
+        self.engine.tablebases = self.tablebases
+        self.renderer = BoardRenderer(self)
+        # Из позиции FEN бот может ходить первым
+        if mode == 'bot' and self.current_player == 'black' and not self.game_over:
+            self.bot_move()
     
     def select_piece(self, row, col):
         piece = self.get_piece(row, col)
@@ -276,148 +510,13 @@ class ChessGame:
             return True
         return False
     
-    def calculate_valid_moves(self, row, col):
-        moves = []
-        piece = self.get_piece(row, col)
-        if not piece:
-            return moves
-        
-        piece_type = piece.split('_')[1]
-        
-        # Пешка
-        if piece_type == 'pawn':
-            direction = -1 if self.current_player == 'white' else 1
-            # Ход вперед
-            if self.get_piece(row + direction, col) is None:
-                moves.append((row + direction, col))
-                # Двойной ход с начальной позиции
-                if (self.current_player == 'white' and row == 6) or (self.current_player == 'black' and row == 1):
-                    if self.get_piece(row + 2*direction, col) is None:
-                        moves.append((row + 2*direction, col))
-            # Взятие по диагонали
-            for dc in [-1, 1]:
-                r, c = row + direction, col + dc
-                if 0 <= r < 8 and 0 <= c < 8:
-                    target = self.get_piece(r, c)
-                    if target and not target.startswith(self.current_player):
-                        moves.append((r, c))
-        
-        # Ладья
-        elif piece_type == 'rook':
-            for dr, dc in [(1, 0), (-1, 0), (0, 1), (0, -1)]:
-                for i in range(1, 8):
-                    r, c = row + i*dr, col + i*dc
-                    if not (0 <= r < 8 and 0 <= c < 8):
-                        break
-                    target = self.get_piece(r, c)
-                    if target is None:
-                        moves.append((r, c))
-                    elif not target.startswith(self.current_player):
-                        moves.append((r, c))
-                        break
-                    else:
-                        break
-        
-        # Конь
-        elif piece_type == 'knight':
-            for dr, dc in [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]:
-                r, c = row + dr, col + dc
-                if 0 <= r < 8 and 0 <= c < 8:
-                    target = self.get_piece(r, c)
-                    if target is None or not target.startswith(self.current_player):
-                        moves.append((r, c))
-        
-        # Слон
-        elif piece_type == 'bishop':
-            for dr, dc in [(1, 1), (1, -1), (-1, 1), (-1, -1)]:
-                for i in range(1, 8):
-                    r, c = row + i*dr, col + i*dc
-                    if not (0 <= r < 8 and 0 <= c < 8):
-                        break
-                    target = self.get_piece(r, c)
-                    if target is None:
-                        moves.append((r, c))
-                    elif not target.startswith(self.current_player):
-                        moves.append((r, c))
-                        break
-                    else:
-                        break
-        
-        # Ферзь
-        elif piece_type == 'queen':
-            # Комбинация ладьи и слона
-            for dr, dc in [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)]:
-                for i in range(1, 8):
-                    r, c = row + i*dr, col + i*dc
-                    if not (0 <= r < 8 and 0 <= c < 8):
-                        break
-                    target = self.get_piece(r, c)
-                    if target is None:
-                        moves.append((r, c))
-                    elif not target.startswith(self.current_player):
-                        moves.append((r, c))
-                        break
-                    else:
-                        break
-        
-        # Король
-        elif piece_type == 'king':
-            for dr in [-1, 0, 1]:
-                for dc in [-1, 0, 1]:
-                    if dr == 0 and dc == 0:
-                        continue
-                    r, c = row + dr, col + dc
-                    if 0 <= r < 8 and 0 <= c < 8:
-                        target = self.get_piece(r, c)
-                        if target is None or not target.startswith(self.current_player):
-                            # Проверяем, не будет ли король под шахом после хода
-                            original_piece = self.get_piece(r, c)
-                            self.board[r][c] = piece
-                            self.board[row][col] = None
-                            
-                            # Если король не под шахом, добавляем ход
-                            if not self.is_in_check(self.current_player):
-                                moves.append((r, c))
-                            
-                            # Возвращаем доску в исходное состояние
-                            self.board[row][col] = piece
-                            self.board[r][c] = original_piece
-        
-        # Фильтруем ходы, которые оставляют короля под шахом
-        valid_moves = []
-        for move_row, move_col in moves:
-            # Сохраняем исходное состояние
-            original_piece = self.get_piece(move_row, move_col)
-            self.board[move_row][move_col] = piece
-            self.board[row][col] = None
-            
-            # Проверяем, не остался ли король под шахом
-            if not self.is_in_check(self.current_player):
-                valid_moves.append((move_row, move_col))
-            
-            # Возвращаем доску в исходное состояние
-            self.board[row][col] = piece
-            self.board[move_row][move_col] = original_piece
-        
-        return valid_moves
-    
-    def move_piece(self, from_row, from_col, to_row, to_col):
+    def move_piece(self, from_row, from_col, to_row, to_col, promotion=QUEEN):
+        """Ход с клетки на клетку; пешка на последней горизонтали превращается
+        в promotion (тип фигуры, по умолчанию ферзь)"""
         piece = self.get_piece(from_row, from_col)
-        if not piece or (to_row, to_col) not in self.valid_moves:
+        if not self.play(from_row, from_col, to_row, to_col, promotion):
             return False
         
-        # Запись хода в историю
-        captured_piece = self.get_piece(to_row, to_col)
-        move_info = {
-            'piece': piece,
-            'from': (from_row, from_col),
-            'to': (to_row, to_col),
-            'captured': captured_piece,
-            'player': self.current_player,
-            'time': datetime.now().strftime("%H:%M:%S")
-        }
-        self.move_history.append(move_info)
-        
         # Анимация перемещения
         self.animation = {
             'piece': piece,
@@ -427,62 +526,108 @@ class ChessGame:
             'duration': 0.3  # секунды
         }
         
-        # Фактическое перемещение фигуры
-        self.board[to_row][to_col] = piece
-        self.board[from_row][from_col] = None
-        
-        # Проверка на шах и мат
-        opponent = 'black' if self.current_player == 'white' else 'white'
-        
-        # Сначала сбрасываем состояние шаха
-        self.check_position = None
-        
-        # Проверяем, находится ли противник под шахом
-        if self.is_in_check(opponent):
-            self.check_position = self.find_king(opponent)
-        
-        # Проверяем мат
-        if self.is_checkmate(opponent):
-            self.game_over = True
-            self.winner = self.current_player
-        # Проверяем пат
-        elif self.is_stalemate(opponent):
-            self.game_over = True
-            self.winner = None  # Ничья
-        
-        # Смена игрока
-        self.current_player = opponent
         self.selected_piece = None
         self.valid_moves = []
         
         # Если игра с ботом и сейчас ход бота
-        if self.mode == 'bot' and self.current_player == 'black' and not self.game_over:
+        if self.game_over:
+            self.cancel_bot()
+        elif self.mode == 'bot' and self.current_player == 'black':
             self.bot_move()
         
         return True
     
     def bot_move(self):
-        # Простой ИИ: случайный ход из доступных
-        time.sleep(0.5)  # Задержка для реалистичности
-        
-        # Находим все фигуры бота
-        bot_pieces = []
-        for row in range(8):
-            for col in range(8):
-                piece = self.get_piece(row, col)
-                if piece and piece.startswith('black'):
-                    bot_pieces.append((row, col))
-        
-        if not bot_pieces:
+        # Бот ищет ход альфа-бета поиском в фоновом потоке с бюджетом по уровню
+        # сложности, а главный цикл забирает результат через update_bot()
+        limits = DIFFICULTY_LEVELS.get(self.difficulty, DIFFICULTY_LEVELS['medium'])
+        ponder = self.ponder_job
+        self.ponder_job = None
+        found = self.tablebases.best_move(self.position) if self.tablebases else None
+        if found is not None:
+            # Позиция есть в таблицах: лучший ход известен точно
+            if ponder:
+                ponder.cancel()
+            move, outcome, dtm = found
+            self.bot_job = ReadyJob({'move': move, 'pv': [move], 'tablebase': (outcome, dtm)},
+                                    min_time=BOT_MIN_THINK_TIME)
             return
-        
-        # Пытаемся сделать ход
-        for _ in range(100):  # Максимум 100 попыток
-            row, col = random.choice(bot_pieces)
-            if self.select_piece(row, col) and self.valid_moves:
-                to_row, to_col = random.choice(self.valid_moves)
-                self.move_piece(row, col, to_row, to_col)
-                break
+        book_move = self.book.choose(self.position) if self.book else None
+        if book_move is not None:
+            # Ход из книги: считать нечего
+            if ponder:
+                ponder.cancel()
+            self.bot_job = ReadyJob({'move': book_move, 'pv': [book_move], 'book': True},
+                                    min_time=BOT_MIN_THINK_TIME)
+            return
+        if ponder and ponder.ponder_move == self.position.history[-1][0]:
+            # Игрок сыграл ожидаемый ход: поиск уже идет в нужной позиции
+            ponder.ponderhit(limits)
+            self.bot_job = ponder
+            return
+        if ponder:
+            ponder.cancel()
+        self.bot_job = SearchJob(self.engine, self.position, limits, min_time=BOT_MIN_THINK_TIME)
+    
+    def start_ponder(self, pv):
+        """После хода бота думаем над позицией после ожидаемого ответа игрока
+        (второй ход главного варианта)"""
+        if not BOT_PONDER or self.game_over or len(pv) < 2:
+            return
+        if pv[1] not in self.position.legal_moves():
+            return
+        limits = DIFFICULTY_LEVELS.get(self.difficulty, DIFFICULTY_LEVELS['medium'])
+        self.ponder_job = SearchJob(self.engine, self.position, limits,
+                                    min_time=BOT_MIN_THINK_TIME, ponder_move=pv[1])
+    
+    def bot_thinking(self):
+        return self.bot_job is not None
+    
+    def cancel_bot(self):
+        if self.bot_job:
+            self.bot_job.cancel()
+            self.bot_job = None
+        if self.ponder_job:
+            self.ponder_job.cancel()
+            self.ponder_job = None
+    
+    def update_bot(self):
+        """Вызывается каждый кадр: делает ход бота, когда поиск закончился.
+        Возвращает True, если бот походил"""
+        if self.game_over:
+            self.cancel_bot()
+            return False
+        if not self.bot_job:
+            return False
+        result = self.bot_job.poll()
+        if result is None:
+            return False
+        pondered = " (ход игрока угадан)" if self.bot_job.ponder_hit else ""
+        self.bot_job = None
+        if result['move'] is None:
+            return False
+        if result.get('book'):
+            print(f"Бот: {move_name(result['move'])} (из книги)")
+        elif result.get('tablebase'):
+            outcome, dtm = result['tablebase']
+            if dtm is None:
+                verdict = "ничья"
+            else:
+                verdict = f"{'выигрыш' if outcome > 0 else 'проигрыш'}, мат через {dtm} полуходов"
+            print(f"Бот: {move_name(result['move'])} (по таблицам: {verdict})")
+        else:
+            print(f"Бот{pondered}: {move_name(result['move'])}, оценка {result['score']}, глубина {result['depth']}, "
+                  f"узлов {result['nodes']}, {result['nps']} узлов/с, "
+                  f"попаданий в таблицу {result['tt']['hit_rate']:.0%}, коллизий {result['tt']['collision_rate']:.1%}, "
+                  f"отсечений первым ходом {result['ordering']['first_cutoff_rate']:.0%}")
+        
+        from_row, from_col = divmod(move_from(result['move']), 8)
+        to_row, to_col = divmod(move_to(result['move']), 8)
+        promotion = move_promotion(result['move']) or QUEEN
+        if self.select_piece(from_row, from_col) and self.move_piece(from_row, from_col, to_row, to_col, promotion):
+            self.start_ponder(result['pv'])
+            return True
+        return False
     
     def update_timer(self):
         if not self.timer_enabled or self.game_over:
@@ -506,127 +651,9 @@ class ChessGame:
                 self.winner = 'white'
     
     def draw(self, screen):
-        # Рисуем доску
-        for row in range(8):
-            for col in range(8):
-                color = LIGHT_BROWN if (row + col) % 2 == 0 else DARK_BROWN
-                pygame.draw.rect(screen, color, (40 + col * SQUARE_SIZE, 60 + row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
-                
-                # Добавляем координаты для удобства
-                if row == 7:
-                    coord_text = font_small.render(chr(97 + col), True, BLACK if color == LIGHT_BROWN else WHITE)
-                    screen.blit(coord_text, (40 + col * SQUARE_SIZE + SQUARE_SIZE - 15, 60 + row * SQUARE_SIZE + SQUARE_SIZE - 15))
-                if col == 0:
-                    coord_text = font_small.render(str(8 - row), True, BLACK if color == LIGHT_BROWN else WHITE)
-                    screen.blit(coord_text, (40 + col * SQUARE_SIZE + 5, 60 + row * SQUARE_SIZE + 5))
-        
-        # Подсвечиваем клетку под шахом (используем Surface с альфа-каналом)
-        if self.check_position:
-            row, col = self.check_position
-            highlight_surface = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
-            highlight_surface.fill((255, 0, 0, 100))  # Красный с прозрачностью
-            screen.blit(highlight_surface, (40 + col * SQUARE_SIZE, 60 + row * SQUARE_SIZE))
-        
-        # Подсвечиваем возможные ходы
-        if self.selected_piece:
-            row, col = self.selected_piece
-            highlight_surface = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
-            highlight_surface.fill((100, 249, 83, 150))  # Зеленый с прозрачностью
-            screen.blit(highlight_surface, (40 + col * SQUARE_SIZE, 60 + row * SQUARE_SIZE))
-            
-            for move_row, move_col in self.valid_moves:
-                highlight_surface = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
-                highlight_surface.fill((249, 166, 83, 150))  # Оранжевый с прозрачностью
-                screen.blit(highlight_surface, (40 + move_col * SQUARE_SIZE, 60 + move_row * SQUARE_SIZE))
-        
-        # Рисуем фигуры
-        for row in range(8):
-            for col in range(8):
-                piece = self.get_piece(row, col)
-                if piece and (not self.animation or self.animation['piece'] != piece or (row, col) != self.selected_piece):
-                    piece_surface = self.pieces[piece]
-                    screen.blit(piece_surface, (40 + col * SQUARE_SIZE + 5, 60 + row * SQUARE_SIZE + 5))
-        
-        # Рисуем анимацию
-        if self.animation:
-            current_time = time.time()
-            elapsed = current_time - self.animation['start_time']
-            progress = min(elapsed / self.animation['duration'], 1.0)
-            
-            if progress < 1.0:
-                # Интерполяция позиции
-                x = self.animation['from_pos'][0] + (self.animation['to_pos'][0] - self.animation['from_pos'][0]) * progress
-                y = self.animation['from_pos'][1] + (self.animation['to_pos'][1] - self.animation['from_pos'][1]) * progress
-                screen.blit(self.pieces[self.animation['piece']], (x + 5, y + 5))
-            else:
-                self.animation = None
-        
-        # Рисуем таймеры (если включены)
-        if self.timer_enabled:
-            white_time_str = f"{int(self.white_time // 60):02d}:{int(self.white_time % 60):02d}"
-            black_time_str = f"{int(self.black_time // 60):02d}:{int(self.black_time % 60):02d}"
-            
-            # Используем контрастные цвета для лучшей видимости
-            white_time_color = DARK_RED if self.white_time < 60 else BLACK
-            black_time_color = DARK_RED if self.black_time < 60 else BLACK
-            
-            white_time_text = font_medium.render(white_time_str, True, white_time_color)
-            black_time_text = font_medium.render(black_time_str, True, black_time_color)
-            
-            # Фон для таймеров для лучшей читаемости
-            pygame.draw.rect(screen, LIGHT_BROWN, (35, 15, 80, 30))
-            pygame.draw.rect(screen, LIGHT_BROWN, (35, 535, 80, 30))
-            
-            screen.blit(white_time_text, (40, 20))
-            screen.blit(black_time_text, (40, 540))
-        
-        # Рисуем историю ходов
-        history_bg = pygame.Surface((250, 480), pygame.SRCALPHA)
-        history_bg.fill((255, 255, 255, 200))
-        screen.blit(history_bg, (530, 60))
-        
-        history_title = font_medium.render("История ходов:", True, BLACK)
-        screen.blit(history_title, (540, 70))
-        
-        # Показываем последние 10 ходов
-        start_idx = max(0, len(self.move_history) - 10)
-        for i, move in enumerate(self.move_history[start_idx:]):
-            piece_name = move['piece'].split('_')[1]
-            piece_names = {
-                'pawn': 'П', 'rook': 'Л', 'knight': 'К',
-                'bishop': 'С', 'queen': 'Ф', 'king': 'Кр'
-            }
-            move_text = f"{i+1+start_idx}. {piece_names.get(piece_name, piece_name)} {chr(97+move['from'][1])}{8-move['from'][0]}→{chr(97+move['to'][1])}{8-move['to'][0]}"
-            if move['captured']:
-                move_text += " ×"
-            move_surface = font_small.render(move_text, True, BLACK)
-            screen.blit(move_surface, (540, 110 + i * 25))
-        
-        # Если игра окончена, показываем результат
-        if self.game_over:
-            overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 150))
-            screen.blit(overlay, (0, 0))
-            
-            if self.winner:
-                winner_text = font_large.render(f"Мат! Победили {'белые' if self.winner == 'white' else 'черные'}", True, WHITE)
-            else:
-                winner_text = font_large.render("Пат! Ничья", True, WHITE)
-            
-            screen.blit(winner_text, (WIDTH//2 - winner_text.get_width()//2, HEIGHT//2 - 50))
-            
-            restart_text = font_medium.render("Нажмите ESC для возврата в меню", True, WHITE)
-            screen.blit(restart_text, (WIDTH//2 - restart_text.get_width()//2, HEIGHT//2 + 20))
-        
-        # Показываем предупреждение о шаге только если есть текущий шах
-        if self.check_position and not self.game_over:
-            # Создаем фон для лучшей видимости текста
-            text_bg = pygame.Surface((100, 40), pygame.SRCALPHA)
-            text_bg.fill((255, 255, 255, 200))
-            screen.blit(text_bg, (WIDTH//2 - 50, 15))
-            
-            check_text = font_medium.render("ШАХ!", True, RED)
-            screen.blit(check_text, (WIDTH//2 - check_text.get_width()//2, 20))
+        """Рисует изменившиеся части партии; возвращает прямоугольники для
+        pygame.display.update"""
+        return self.renderer.draw(screen)
 
 # Остальной код остается без изменений...
 # [Остальная часть кода без изменений - классы MainMenu, AboutScreen, AchievementsScreen, HistoryScreen и функция main]
@@ -645,6 +672,7 @@ class MainMenu:
         self.difficulty_menu = False
         self.timer_menu = False
         self.game_mode = None
+        self.difficulty = "medium"
         self.difficulty_buttons = [
             {"text": "Легкий", "rect": pygame.Rect(300, 200, 200, 50)},
             {"text": "Средний", "rect": pygame.Rect(300, 270, 200, 50)},
@@ -662,21 +690,18 @@ class MainMenu:
         screen.fill(LIGHT_BROWN)
         
         # Заголовок с тенью
-        title = font_title.render("Шахматы", True, DARK_BROWN)
-        title_shadow = font_title.render("Шахматы", True, (100, 70, 50))
+        title = render_text(font_title, "Шахматы", DARK_BROWN)
+        title_shadow = render_text(font_title, "Шахматы", (100, 70, 50))
         screen.blit(title_shadow, (WIDTH//2 - title.get_width()//2 + 3, 83))
         screen.blit(title, (WIDTH//2 - title.get_width()//2, 80))
         
         # Декоративные фигуры по бокам
         piece_size = 40
-        try:
-            white_king = pygame.transform.scale(pygame.image.load('_internal/pieces/wK.png'), (piece_size, piece_size))
-            black_king = pygame.transform.scale(pygame.image.load('_internal/pieces/bK.png'), (piece_size, piece_size))
-            screen.blit(white_king, (200, 90))
-            screen.blit(black_king, (560, 90))
-        except:
-            # Если файлы не найдены, просто пропускаем
-            pass
+        pieces = piece_assets.pieces(piece_size)
+        # Если файлы не найдены, просто пропускаем
+        if not piece_assets.fallback:
+            screen.blit(pieces['white_king'], (200, 90))
+            screen.blit(pieces['black_king'], (560, 90))
         
         if not self.difficulty_menu and not self.timer_menu:
             # Кнопки главного меню
@@ -685,13 +710,13 @@ class MainMenu:
                 pygame.draw.rect(screen, color, button["rect"], border_radius=10)
                 pygame.draw.rect(screen, BLACK, button["rect"], 2, border_radius=10)
                 
-                text = font_medium.render(button["text"], True, WHITE)
+                text = render_text(font_medium, button["text"], WHITE)
                 screen.blit(text, (button["rect"].centerx - text.get_width()//2, 
                                   button["rect"].centery - text.get_height()//2))
         
         elif self.difficulty_menu:
             # Меню выбора сложности
-            difficulty_title = font_large.render("Выберите сложность", True, DARK_BROWN)
+            difficulty_title = render_text(font_large, "Выберите сложность", DARK_BROWN)
             screen.blit(difficulty_title, (WIDTH//2 - difficulty_title.get_width()//2, 150))
             
             for button in self.difficulty_buttons:
@@ -699,13 +724,13 @@ class MainMenu:
                 pygame.draw.rect(screen, color, button["rect"], border_radius=10)
                 pygame.draw.rect(screen, BLACK, button["rect"], 2, border_radius=10)
                 
-                text = font_medium.render(button["text"], True, WHITE)
+                text = render_text(font_medium, button["text"], WHITE)
                 screen.blit(text, (button["rect"].centerx - text.get_width()//2, 
                                   button["rect"].centery - text.get_height()//2))
         
         elif self.timer_menu:
             # Меню выбора таймера
-            timer_title = font_large.render("Таймер", True, DARK_BROWN)
+            timer_title = render_text(font_large, "Таймер", DARK_BROWN)
             screen.blit(timer_title, (WIDTH//2 - timer_title.get_width()//2, 150))
             
             for button in self.timer_buttons:
@@ -713,7 +738,7 @@ class MainMenu:
                 pygame.draw.rect(screen, color, button["rect"], border_radius=10)
                 pygame.draw.rect(screen, BLACK, button["rect"], 2, border_radius=10)
                 
-                text = font_medium.render(button["text"], True, WHITE)
+                text = render_text(font_medium, button["text"], WHITE)
                 screen.blit(text, (button["rect"].centerx - text.get_width()//2, 
                                   button["rect"].centery - text.get_height()//2))
     
@@ -740,14 +765,17 @@ class MainMenu:
             for i, button in enumerate(self.difficulty_buttons):
                 if button["rect"].collidepoint(pos):
                     if i == 0:  # Легкий
+                        self.difficulty = "easy"
                         self.difficulty_menu = False
                         self.timer_menu = True
                         return None
                     elif i == 1:  # Средний
+                        self.difficulty = "medium"
                         self.difficulty_menu = False
                         self.timer_menu = True
                         return None
                     elif i == 2:  # Сложный
+                        self.difficulty = "hard"
                         self.difficulty_menu = False
                         self.timer_menu = True
                         return None
@@ -763,13 +791,13 @@ class MainMenu:
                         if self.game_mode == "friend":
                             return "game", "friend", True
                         else:
-                            return "game", "medium", True  # По умолчанию средняя сложность для бота
+                            return "game", self.difficulty, True
                     elif i == 1:  # Без таймера
                         self.timer_menu = False
                         if self.game_mode == "friend":
                             return "game", "friend", False
                         else:
-                            return "game", "medium", False  # По умолчанию средняя сложность для бота
+                            return "game", self.difficulty, False
                     elif i == 2:  # Назад
                         self.timer_menu = False
                         return None
@@ -784,7 +812,7 @@ class AboutScreen:
     def draw(self, screen):
         screen.fill(LIGHT_BROWN)
         
-        title = font_large.render("О игре", True, DARK_BROWN)
+        title = render_text(font_large, "О игре", DARK_BROWN)
         screen.blit(title, (WIDTH//2 - title.get_width()//2, 50))
         
         # Информация об игре
@@ -810,13 +838,13 @@ class AboutScreen:
         ]
         
         for i, line in enumerate(lines):
-            text = font_small.render(line, True, BLACK)
+            text = render_text(font_small, line, BLACK)
             screen.blit(text, (WIDTH//2 - text.get_width()//2, 120 + i * 25))
         
         # Кнопка назад
         pygame.draw.rect(screen, DARK_BROWN, self.back_button, border_radius=5)
         pygame.draw.rect(screen, BLACK, self.back_button, 2, border_radius=5)
-        back_text = font_medium.render("Назад", True, WHITE)
+        back_text = render_text(font_medium, "Назад", WHITE)
         screen.blit(back_text, (self.back_button.centerx - back_text.get_width()//2, 
                                self.back_button.centery - back_text.get_height()//2))
     
@@ -861,11 +889,11 @@ class AchievementsScreen:
     def draw(self, screen):
         screen.fill(LIGHT_BROWN)
         
-        title = font_large.render("Достижения", True, DARK_BROWN)
+        title = render_text(font_large, "Достижения", DARK_BROWN)
         screen.blit(title, (WIDTH//2 - title.get_width()//2, 50))
         
         # Статистика
-        stats_title = font_medium.render("Статистика", True, BLACK)
+        stats_title = render_text(font_medium, "Статистика", BLACK)
         screen.blit(stats_title, (100, 120))
         
         win_percentage = (self.achievements["games_won"] / self.achievements["games_played"] * 100) if self.achievements["games_played"] > 0 else 0
@@ -880,11 +908,11 @@ class AchievementsScreen:
         ]
         
         for i, stat in enumerate(stats):
-            text = font_small.render(stat, True, BLACK)
+            text = render_text(font_small, stat, BLACK)
             screen.blit(text, (100, 160 + i * 30))
         
         # Достижения
-        achievements_title = font_medium.render("Достижения", True, BLACK)
+        achievements_title = render_text(font_medium, "Достижения", BLACK)
         screen.blit(achievements_title, (450, 120))
         
         achievements = [
@@ -898,17 +926,17 @@ class AchievementsScreen:
         
         for i, (achievement, unlocked) in enumerate(achievements):
             color = GREEN if unlocked else GRAY
-            text = font_small.render(achievement, True, color)
+            text = render_text(font_small, achievement, color)
             screen.blit(text, (450, 160 + i * 30))
             
             status = "Разблокировано" if unlocked else "Заблокировано"
-            status_text = font_small.render(status, True, color)
+            status_text = render_text(font_small, status, color)
             screen.blit(status_text, (650, 160 + i * 30))
         
         # Кнопка назад
         pygame.draw.rect(screen, DARK_BROWN, self.back_button, border_radius=5)
         pygame.draw.rect(screen, BLACK, self.back_button, 2, border_radius=5)
-        back_text = font_medium.render("Назад", True, WHITE)
+        back_text = render_text(font_medium, "Назад", WHITE)
         screen.blit(back_text, (self.back_button.centerx - back_text.get_width()//2, 
                                self.back_button.centery - back_text.get_height()//2))
     
@@ -933,24 +961,24 @@ class HistoryScreen:
     def draw(self, screen):
         screen.fill(LIGHT_BROWN)
         
-        title = font_large.render("История игр", True, DARK_BROWN)
+        title = render_text(font_large, "История игр", DARK_BROWN)
         screen.blit(title, (WIDTH//2 - title.get_width()//2, 50))
         
         if not self.games:
-            no_games = font_medium.render("Пока нет сохраненных игр", True, BLACK)
+            no_games = render_text(font_medium, "Пока нет сохраненных игр", BLACK)
             screen.blit(no_games, (WIDTH//2 - no_games.get_width()//2, 200))
         else:
             # Показываем последние 5 игр
             recent_games = self.games[-5:]
             for i, game in enumerate(reversed(recent_games)):
                 game_text = f"Игра {len(self.games) - i}: {game['result']} ({game['date']})"
-                text = font_small.render(game_text, True, BLACK)
+                text = render_text(font_small, game_text, BLACK)
                 screen.blit(text, (100, 120 + i * 40))
         
         # Кнопка назад
         pygame.draw.rect(screen, DARK_BROWN, self.back_button, border_radius=5)
         pygame.draw.rect(screen, BLACK, self.back_button, 2, border_radius=5)
-        back_text = font_medium.render("Назад", True, WHITE)
+        back_text = render_text(font_medium, "Назад", WHITE)
         screen.blit(back_text, (self.back_button.centerx - back_text.get_width()//2, 
                                self.back_button.centery - back_text.get_height()//2))
     
@@ -959,8 +987,26 @@ class HistoryScreen:
             return "menu"
         return None
 
-# Основная функция игры
-def main():
+def frame_timeout(current_screen, game):
+    """Сколько миллисекунд главный цикл может ждать событий до следующего
+    кадра; 0 - кадры нужны с полной частотой FPS"""
+    if current_screen != "game" or not game:
+        return IDLE_TIMEOUT_MS
+    if game.animation:
+        return 0
+    timeout = IDLE_TIMEOUT_MS
+    if game.bot_thinking():
+        timeout = 1000 // ENGINE_POLL_FPS
+    if game.timer_enabled and not game.game_over:
+        # Цифры на часах меняются на целой секунде, к ней и просыпаемся
+        left = game.white_time if game.current_player == 'white' else game.black_time
+        left -= time.time() - game.last_time_update
+        timeout = min(timeout, int(max(left, 0) % 1.0 * 1000) + 1)
+    return timeout
+
+# Основная функция игры; fen - начальная позиция новых партий
+def main(fen=None):
+    init_display()
     menu = MainMenu()
     about_screen = AboutScreen()
     achievements_screen = AchievementsScreen()
@@ -973,13 +1019,34 @@ def main():
     
     running = True
     while running:
-        for event in pygame.event.get():
+        # Без анимации ждем события или момента, когда изменится картинка:
+        # часы, ход бота. Таймер считает настоящее прошедшее время, поэтому
+        # от частоты кадров не зависит
+        timeout = frame_timeout(current_screen, game) if IDLE_WAIT else 0
+        if timeout:
+            event = pygame.event.wait(timeout)
+            events = pygame.event.get()
+            if event.type != pygame.NOEVENT:
+                events.insert(0, event)
+        else:
+            clock.tick(FPS)
+            events = pygame.event.get()
+        
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
             
+            # Окно перекрыли или свернули: картинку партии нужно нарисовать заново
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED) and game:
+                game.renderer.invalidate()
+            
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     if current_screen == "game":
+                        # Останавливаем поиск бота, если он еще думает
+                        if game:
+                            game.cancel_bot()
+                        
                         # Сохраняем игру при выходе
                         if game and game.move_history:
                             result = "Не завершена"
@@ -987,12 +1054,13 @@ def main():
                                 if game.winner:
                                     result = f"Мат - победили {'белые' if game.winner == 'white' else 'черные'}"
                                 else:
-                                    result = "Пат - ничья"
+                                    result = "Пат - ничья" if game.draw_reason == 'пат' else "Ничья - недостаточно материала"
                             
                             history_screen.games.append({
                                 "result": result,
                                 "date": datetime.now().strftime("%d.%m.%Y %H:%M"),
-                                "moves": game.move_history
+                                "moves": game.move_history,
+                                "fen": game.to_fen()
                             })
                             with open('games_history.json', 'w') as f:
                                 json.dump(history_screen.games, f)
@@ -1022,9 +1090,9 @@ def main():
                             game_mode = result[1]
                             timer_enabled = result[2]
                             if result[1] == "friend":
-                                game = ChessGame("friend", timer_enabled=timer_enabled)
+                                game = ChessGame("friend", timer_enabled=timer_enabled, fen=fen)
                             else:
-                                game = ChessGame("bot", result[1], timer_enabled)
+                                game = ChessGame("bot", result[1], timer_enabled, fen=fen)
                             
                             # Обновляем достижения
                             achievements_screen.achievements["games_played"] += 1
@@ -1046,7 +1114,7 @@ def main():
                         elif result[0] == "about":
                             current_screen = "about"
                 
-                elif current_screen == "game" and game and not game.animation:
+                elif current_screen == "game" and game and not game.animation and not game.bot_thinking():
                     # Обрабатываем клик в игре
                     x, y = pos
                     if 40 <= x <= 40 + BOARD_SIZE and 60 <= y <= 60 + BOARD_SIZE:
@@ -1092,7 +1160,13 @@ def main():
             menu.draw(screen)
         elif current_screen == "game" and game:
             game.update_timer()
-            game.draw(screen)
+            # Ход бота приходит из фонового поиска, поражение засчитываем здесь
+            if game.update_bot() and game.game_over:
+                achievements_screen.achievements["games_lost"] += 1
+            # Экран партии обновляется только в измененных прямоугольниках
+            dirty = game.draw(screen)
+            if dirty:
+                pygame.display.update(dirty)
         elif current_screen == "about":
             about_screen.draw(screen)
         elif current_screen == "achievements":
@@ -1100,8 +1174,8 @@ def main():
         elif current_screen == "history":
             history_screen.draw(screen)
         
-        pygame.display.flip()
-        clock.tick(FPS)
+        if current_screen != "game" or not game:
+            pygame.display.flip()
     
     # Сохраняем достижения при выходе
     achievements_screen.save_achievements()
@@ -1109,5 +1183,13 @@ def main():
     sys.exit()
 
 if __name__ == "__main__":
-
-    main()
+    # python main.py [--fen "FEN"] - партии начинаются с заданной позиции
+    fen = None
+    if '--fen' in sys.argv[1:-1]:
+        fen = sys.argv[sys.argv.index('--fen') + 1]
+        try:
+            Game(fen=fen)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+    main(fen)